@@ -0,0 +1,156 @@
+"""
+Archival of old attendance into one packed row per member and month.
+
+Archived records leave the hot AttendanceRecord table without going through its
+per-row signals, so the derived tables (rollups, streaks, last visits) keep their
+history. Everything that recomputes those tables reads the archive alongside the
+hot rows, including the attendance_changed refresh sent for each archived month.
+"""
+import calendar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import AttendanceRecord, AttendanceArchive
+
+# Member stats, the dashboard and the heatmap read the last few months record by record
+MIN_HORIZON_DAYS = 180
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def month_end(month):
+    return month.replace(day=calendar.monthrange(month.year, month.month)[1])
+
+
+def archive_cutoff(today=None, horizon_days=None):
+    """First day that stays in the hot table: whole months older than the horizon are archived"""
+    today = today or timezone.now().date()
+    horizon_days = settings.ATTENDANCE_ARCHIVE_AFTER_DAYS if horizon_days is None else horizon_days
+    if horizon_days < MIN_HORIZON_DAYS:
+        raise ValueError(f'The archive horizon must be at least {MIN_HORIZON_DAYS} days')
+    return month_start(today - timedelta(days=horizon_days))
+
+
+def archived_through():
+    """
+    Last day covered by the archive, or None. Read from the DB every time (a MAX over the
+    month index): archive_attendance runs in its own process, and a stale answer here
+    would make the derived-table rebuilds drop the archived history.
+    """
+    latest = AttendanceArchive.objects.aggregate(month=Max('month'))['month']
+    return month_end(latest) if latest else None
+
+
+def _expand(month, days):
+    """The dates packed into a month's day bitmask, in order"""
+    for day in range(1, month_end(month).day + 1):
+        if days & (1 << (day - 1)):
+            yield month.replace(day=day)
+
+
+def archived_days(member_ids=None, until=None):
+    """(member_id, date) of every archived visit, ordered by member and date"""
+    through = archived_through()
+    if through is None:
+        return
+    rows = AttendanceArchive.objects.all()
+    if member_ids is not None:
+        rows = rows.filter(member_id__in=member_ids)
+    if until is not None:
+        rows = rows.filter(month__lte=until)
+    rows = rows.order_by('member_id', 'month').values_list('member_id', 'month', 'days')
+    for member_id, month, days in rows.iterator(chunk_size=2000):
+        for day in _expand(month, days):
+            if until is None or day <= until:
+                yield member_id, day
+
+
+def archived_visits(start, end):
+    """
+    (member_id, date) of archived visits between start and end. A member-day that also
+    has a hot record (marked after its month was archived, until the next run merges it)
+    is left to the hot table, so callers adding the two never count it twice.
+    """
+    through = archived_through()
+    if through is None or start > through:
+        return
+    end = min(end, through)
+    hot = set(AttendanceRecord.objects.filter(date__gte=start, date__lte=end).values_list('member_id', 'date'))
+    rows = AttendanceArchive.objects.filter(month__gte=month_start(start), month__lte=end)
+    for member_id, month, days in rows.values_list('member_id', 'month', 'days').iterator(chunk_size=2000):
+        for day in _expand(month, days):
+            if start <= day <= end and (member_id, day) not in hot:
+                yield member_id, day
+
+
+def archived_daily_counts(start, end):
+    """{date: archived visits} for days between start and end, without those the hot table also has"""
+    counts = {}
+    for _, day in archived_visits(start, end):
+        counts[day] = counts.get(day, 0) + 1
+    return counts
+
+
+def _archive_month(month):
+    """Pack one month of hot records into archive rows and remove them. Returns the records moved"""
+    records = AttendanceRecord.objects.filter(date__gte=month, date__lte=month_end(month))
+    packed = {}
+    dates = set()
+    last_id = 0
+    for record_id, member_id, day in records.values_list('id', 'member_id', 'date').iterator(chunk_size=2000):
+        days, latest = packed.get(member_id, (0, day))
+        packed[member_id] = (days | 1 << (day.day - 1), max(latest, day))
+        dates.add(day)
+        last_id = max(last_id, record_id)
+    if not packed:
+        return 0
+
+    # Records of an already archived month (e.g. marked late) are merged into its rows
+    existing = AttendanceArchive.objects.filter(month=month, member_id__in=packed.keys())
+    for member_id, days, latest in existing.values_list('member_id', 'days', 'last_visit'):
+        new_days, new_latest = packed[member_id]
+        packed[member_id] = (days | new_days, max(latest, new_latest) if latest else new_latest)
+
+    AttendanceArchive.objects.bulk_create(
+        [
+            AttendanceArchive(member_id=member_id, month=month, days=days, visits=days.bit_count(), last_visit=latest)
+            for member_id, (days, latest) in packed.items()
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['member', 'month'],
+        update_fields=['days', 'visits', 'last_visit', 'updated_at'],
+    )
+    # Imported here: attendance.signals imports the derived-table modules, which import this one
+    from .signals import attendance_changed, bulk_change
+
+    # Rows created after the read above have higher ids and wait for the next run.
+    # The per-row delete handlers are skipped on purpose: they would forget each visit.
+    # attendance_changed rebuilds the derived tables from the archive and hot rows
+    # instead, so they keep counting the archived visits.
+    with bulk_change():
+        moved, _ = records.filter(id__lte=last_id).delete()
+    attendance_changed.send(sender=AttendanceRecord, member_ids=set(packed), dates=dates)
+    return moved
+
+
+def archive_attendance(cutoff, dry_run=False):
+    """
+    Move every hot record dated before cutoff into the archive, one transaction per month.
+    Returns [(month, records)] for the months processed.
+    """
+    months = AttendanceRecord.objects.filter(date__lt=cutoff).dates('date', 'month')
+    result = []
+    for month in months:
+        if dry_run:
+            result.append((month, AttendanceRecord.objects.filter(date__gte=month, date__lte=month_end(month)).count()))
+            continue
+        with transaction.atomic():
+            result.append((month, _archive_month(month)))
+    return result
@@ -0,0 +1,197 @@
+"""
+Per-member, per-year attendance bitmaps.
+
+Bit n of a year's bitmap is set when the member visited on day n + 1 of that
+year, so a whole year fits in 46 bytes. Counts over any window are popcounts
+of a shifted mask, and runs of consecutive days are read off the bits without
+touching AttendanceRecord. The attendance and archive tables stay the source
+of truth: attendance.signals keeps the bitmaps current on every write and
+rebuild_attendance_bitmaps regenerates them.
+"""
+import heapq
+from datetime import date, timedelta
+
+from django.db import connection, transaction, IntegrityError
+from django.db.models import F, Func, Value, BinaryField, IntegerField
+from django.utils import timezone
+
+from .archive import archived_days
+from .models import AttendanceRecord, AttendanceYear
+
+YEAR_BYTES = 46  # 366 bits
+
+
+def _index(day):
+    return day.timetuple().tm_yday - 1
+
+
+def _to_int(bits):
+    return int.from_bytes(bytes(bits), 'little')
+
+
+def _to_bytes(value):
+    return value.to_bytes(YEAR_BYTES, 'little')
+
+
+def _update_day(member_id, day, present):
+    with transaction.atomic():
+        row = AttendanceYear.objects.select_for_update().filter(member_id=member_id, year=day.year).first()
+        if row is None:
+            if not present:
+                return
+            try:
+                with transaction.atomic():
+                    AttendanceYear.objects.create(
+                        member_id=member_id, year=day.year, days=_to_bytes(1 << _index(day)), visits=1
+                    )
+                return
+            except IntegrityError:
+                # A concurrent first visit of the year created the row; update it instead
+                row = AttendanceYear.objects.select_for_update().get(member_id=member_id, year=day.year)
+        value = _to_int(row.days)
+        value = value | (1 << _index(day)) if present else value & ~(1 << _index(day))
+        if not value:
+            row.delete()
+            return
+        row.days = _to_bytes(value)
+        row.visits = value.bit_count()
+        row.save(update_fields=['days', 'visits', 'updated_at'])
+
+
+def record_day(member_id, day):
+    """Set the bit of a new visit"""
+    if connection.vendor == 'postgresql':
+        # set_bit numbers bits from the low end of each byte, matching the packed layout,
+        # so an existing row is updated in place by one statement without a row lock
+        index = _index(day)
+        updated = AttendanceYear.objects.filter(member_id=member_id, year=day.year).update(
+            days=Func(F('days'), Value(index), Value(1), function='set_bit', output_field=BinaryField()),
+            visits=F('visits') + 1 - Func(F('days'), Value(index), function='get_bit', output_field=IntegerField()),
+            updated_at=timezone.now()
+        )
+        if updated:
+            return
+    _update_day(member_id, day, True)
+
+
+def forget_day(member_id, day):
+    """Clear the bit of a removed visit"""
+    _update_day(member_id, day, False)
+
+
+def refresh_bitmaps(member_ids=None):
+    """Regenerate bitmaps from the attendance and archive tables (all members when None)"""
+    records = AttendanceRecord.objects.all()
+    if member_ids is not None:
+        member_ids = set(member_ids)
+        records = records.filter(member_id__in=member_ids)
+    days = records.values_list('member_id', 'date').order_by('member_id', 'date')
+
+    years = {}
+    for member_id, day in heapq.merge(days.iterator(chunk_size=2000), archived_days(member_ids)):
+        key = (member_id, day.year)
+        years[key] = years.get(key, 0) | (1 << _index(day))
+
+    with transaction.atomic():
+        existing = AttendanceYear.objects.all()
+        if member_ids is not None:
+            existing = existing.filter(member_id__in=member_ids)
+        stale = [
+            pk for pk, member_id, year in existing.values_list('pk', 'member_id', 'year')
+            if (member_id, year) not in years
+        ]
+        AttendanceYear.objects.filter(pk__in=stale).delete()
+        AttendanceYear.objects.bulk_create(
+            [
+                AttendanceYear(member_id=member_id, year=year, days=_to_bytes(value), visits=value.bit_count())
+                for (member_id, year), value in years.items()
+            ],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['member', 'year'],
+            update_fields=['days', 'visits', 'updated_at'],
+        )
+    return len(years)
+
+
+class AttendanceBitmap:
+    """A member's attended days across years, loaded with one query"""
+
+    def __init__(self, years):
+        self.years = years  # {year: int}
+
+    @classmethod
+    def for_member(cls, member_id, years=None):
+        rows = AttendanceYear.objects.filter(member_id=member_id)
+        if years is not None:
+            rows = rows.filter(year__in=years)
+        return cls({year: _to_int(days) for year, days in rows.values_list('year', 'days')})
+
+    @classmethod
+    def for_members(cls, member_ids):
+        bitmaps = {member_id: cls({}) for member_id in member_ids}
+        rows = AttendanceYear.objects.filter(member_id__in=member_ids).values_list('member_id', 'year', 'days')
+        for member_id, year, days in rows.iterator(chunk_size=2000):
+            bitmaps[member_id].years[year] = _to_int(days)
+        return bitmaps
+
+    @property
+    def total(self):
+        return sum(value.bit_count() for value in self.years.values())
+
+    def _year_ranges(self, start, end):
+        """(year, value, first index, last index) for each year overlapping [start, end]"""
+        if not self.years:
+            return
+        start = start or date(min(self.years), 1, 1)
+        end = end or date(max(self.years), 12, 31)
+        for year in range(start.year, end.year + 1):
+            value = self.years.get(year, 0)
+            if value:
+                first = _index(start) if year == start.year else 0
+                last = _index(end) if year == end.year else _index(date(year, 12, 31))
+                yield year, value, first, last
+
+    def count(self, start=None, end=None):
+        """Visits between start and end, inclusive (open-ended when omitted)"""
+        total = 0
+        for _, value, first, last in self._year_ranges(start, end):
+            total += ((value >> first) & ((1 << (last - first + 1)) - 1)).bit_count()
+        return total
+
+    def days(self, start=None, end=None):
+        """Visited days between start and end in order (all of them by default)"""
+        for year, value, first, last in self._year_ranges(start, end):
+            value = (value >> first) & ((1 << (last - first + 1)) - 1)
+            while value:
+                # Step from lowest set bit to lowest set bit, skipping empty days
+                lowest = value & -value
+                yield date(year, 1, 1) + timedelta(days=first + lowest.bit_length() - 1)
+                value ^= lowest
+
+    def monthly_counts(self, start=None, end=None):
+        """{first day of month: visits} for months with visits between start and end"""
+        counts = {}
+        for day in self.days(start, end):
+            month = day.replace(day=1)
+            counts[month] = counts.get(month, 0) + 1
+        return counts
+
+    def weekday_counts(self, start=None, end=None):
+        """{weekday (0 = Monday): visits} between start and end"""
+        counts = {}
+        for day in self.days(start, end):
+            counts[day.weekday()] = counts.get(day.weekday(), 0) + 1
+        return counts
+
+    def runs(self, until=None):
+        """(run_start, run_end, longest) of the latest run of consecutive days up to until"""
+        start = end = None
+        longest = 0
+        for day in self.days(end=until):
+            if end is not None and day == end + timedelta(days=1):
+                end = day
+            else:
+                start = end = day
+            longest = max(longest, (end - start).days + 1)
+        return start, end, longest
@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from core.models import Member
+
+TOKEN_SALT = 'attendance.kiosk'
+KIOSK_METHODS = ('qr', 'id')
+
+
+def member_token(member_id):
+    """QR/ID card payload: the member id with an HMAC signature (keyed by SECRET_KEY)"""
+    return signing.Signer(salt=TOKEN_SALT).sign(str(member_id))
+
+
+def verify_token(token):
+    """Member id of a token from member_token, without a DB lookup. Raises signing.BadSignature"""
+    value = signing.Signer(salt=TOKEN_SALT).unsign(token)
+    try:
+        return int(value)
+    except ValueError:
+        raise signing.BadSignature('Malformed member id')
+
+
+def _eligibility_key(member_id):
+    return f'kiosk:member:{member_id}'
+
+
+def _load_eligibilities(member_ids):
+    rows = Member.objects.filter(pk__in=member_ids).annotate(
+        paid_through=Max('subscriptions__end_date', filter=Q(subscriptions__status='active'))
+    ).values('id', 'status', 'paid_through', 'user__first_name', 'user__last_name')
+    entries = {
+        row['id']: {
+            'status': row['status'],
+            'paid_through': row['paid_through'],
+            'name': f"{row['user__first_name']} {row['user__last_name']}",
+        } for row in rows
+    }
+    # Unknown members are cached too, so a scanned stale card cannot hammer the DB
+    cache.set_many(
+        {_eligibility_key(member_id): entries.get(member_id) or {} for member_id in member_ids},
+        timeout=settings.KIOSK_CACHE_TTL
+    )
+    return entries
+
+
+def load_eligibility(member_id):
+    """Read a member's check-in eligibility from the DB (one query) and cache it"""
+    return _load_eligibilities([member_id]).get(member_id)
+
+
+def get_eligibility(member_id):
+    """
+    Cached {'status', 'paid_through', 'name'} for a member, or None if there is no such member.
+    attendance.signals refreshes an entry when the member or their subscriptions change, but
+    only in the cache of the process that wrote; KIOSK_CACHE_TTL bounds how long any other
+    process can keep the old entry. A regular member's scan still needs at most one query
+    per TTL to decide eligibility.
+    """
+    entry = cache.get(_eligibility_key(member_id))
+    if entry is None:
+        return load_eligibility(member_id)
+    return entry or None
+
+
+def get_eligibilities(member_ids):
+    """get_eligibility for many members, loading all cache misses with one query"""
+    member_ids = set(member_ids)
+    cached = cache.get_many([_eligibility_key(member_id) for member_id in member_ids])
+    entries = {member_id: cached.get(_eligibility_key(member_id)) for member_id in member_ids}
+    missing = [member_id for member_id, entry in entries.items() if entry is None]
+    if missing:
+        entries.update(_load_eligibilities(missing))
+    return {member_id: entry or None for member_id, entry in entries.items()}
+
+
+def ineligibility_reason(entry, today=None):
+    """None when the member may check in, otherwise a message for the front desk"""
+    today = today or timezone.localdate()
+    if entry is None:
+        return 'Unknown member'
+    if entry['status'] != 'active':
+        return 'Membership is not active'
+    if entry['paid_through'] is None or entry['paid_through'] < today:
+        return 'No active subscription'
+    return None
@@ -0,0 +1,46 @@
+from django.db.models import Q, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from core.models import Member
+from .models import AttendanceRecord, AttendanceArchive
+
+
+def _latest_visit_subquery():
+    hot = Subquery(
+        AttendanceRecord.objects.filter(member=OuterRef('pk'))
+        .order_by().values('member').annotate(last=Max('date')).values('last')[:1]
+    )
+    archived = Subquery(
+        AttendanceArchive.objects.filter(member=OuterRef('pk')).order_by('-month').values('last_visit')[:1]
+    )
+    # Greatest is NULL on any NULL argument on some backends, so feed it both sides non-null
+    return Greatest(Coalesce(hot, archived), Coalesce(archived, hot))
+
+
+def record_visit(member_id, day):
+    """Move a member's last_attended_on forward if day is newer (single UPDATE)"""
+    Member.objects.filter(pk=member_id).filter(
+        Q(last_attended_on__isnull=True) | Q(last_attended_on__lt=day)
+    ).update(last_attended_on=day)
+
+
+def forget_visit(member_id, day):
+    """Recompute last_attended_on only if the removed visit was the latest one"""
+    Member.objects.filter(pk=member_id, last_attended_on=day).update(
+        last_attended_on=_latest_visit_subquery()
+    )
+
+
+def refresh_last_attended(member_ids=None):
+    """Recompute last_attended_on from the attendance and archive tables in one UPDATE"""
+    members = Member.objects.all()
+    if member_ids is not None:
+        members = members.filter(pk__in=member_ids)
+    return members.update(last_attended_on=_latest_visit_subquery())
+
+
+def dropped_out_members(cutoff):
+    """Active members with no visit on or after cutoff, served by member_status_last_visit_idx"""
+    return Member.objects.filter(status='active').filter(
+        Q(last_attended_on__lt=cutoff) | Q(last_attended_on__isnull=True)
+    )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from attendance.archive import archive_cutoff, archive_attendance
+
+
+class Command(BaseCommand):
+    help = 'Moves attendance records older than the archive horizon into monthly archive rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, help='Horizon in days (default: ATTENDANCE_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+
+    def handle(self, *args, **options):
+        try:
+            cutoff = archive_cutoff(horizon_days=options['older_than'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        months = archive_attendance(cutoff, dry_run=options['dry_run'])
+        for month, records in months:
+            self.stdout.write(f'{month:%Y-%m}: {records} records')
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        total = sum(records for _, records in months)
+        self.stdout.write(self.style.SUCCESS(f'{verb} {total} records dated before {cutoff} ({len(months)} months)'))
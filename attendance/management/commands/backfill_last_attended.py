@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from attendance.last_visit import refresh_last_attended
+
+
+class Command(BaseCommand):
+    help = 'Backfills Member.last_attended_on from existing attendance records'
+
+    def handle(self, *args, **kwargs):
+        updated = refresh_last_attended()
+        self.stdout.write(self.style.SUCCESS(f'Updated last visit date for {updated} members'))
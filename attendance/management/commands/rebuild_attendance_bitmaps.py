@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from attendance.bitmaps import refresh_bitmaps
+
+
+class Command(BaseCommand):
+    help = 'Regenerates the yearly attendance bitmaps of every member from the attendance and archive tables'
+
+    def handle(self, *args, **kwargs):
+        written = refresh_bitmaps()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} member-year attendance bitmaps'))
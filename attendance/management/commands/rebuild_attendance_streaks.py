@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from attendance.streaks import refresh_streaks
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored attendance streak of every member'
+
+    def handle(self, *args, **kwargs):
+        updated = refresh_streaks()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt attendance streaks for {updated} members'))
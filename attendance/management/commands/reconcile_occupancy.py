@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+from attendance.occupancy import reconcile_occupancy
+
+
+class Command(BaseCommand):
+    help = "Resets today's live occupancy counter from open attendance records"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=int, help='Keep running and reconcile every N seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            counted, previous = reconcile_occupancy()
+            drift = '' if previous is None or previous == counted else f' (counter was {previous})'
+            self.stdout.write(self.style.SUCCESS(f'Occupancy reconciled to {counted}{drift}'))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from attendance.pending import sync_pending_check_ins, SYNC_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Updates last visits, bitmaps, streaks and rollups for kiosk check-ins whose process stopped before syncing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=int, help='Keep running and sync every N seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            synced = 0
+            while True:
+                batch = sync_pending_check_ins()
+                synced += batch
+                if batch < SYNC_BATCH_SIZE:
+                    break
+            self.stdout.write(self.style.SUCCESS(f'Synced {synced} kiosk check-ins'))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-17 00:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_alter_attendancerecord_date'),
+        ('core', '0003_member_last_attended_on'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberStreak',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True)),
+                ('run_start', models.DateField(blank=True, null=True)),
+                ('run_end', models.DateField(blank=True, null=True)),
+                ('longest_streak', models.IntegerField(db_index=True, default=0)),
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='streak', to='core.member')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-17 12:05
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_records(apps, schema_editor):
+    # Keep the first record of each member and day. Derived tables still count the
+    # removed rows until `rebuild_gym_rollups` runs.
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    duplicates = AttendanceRecord.objects.values('member_id', 'date').annotate(
+        records=Count('id'), keep=Min('id')
+    ).filter(records__gt=1).order_by()
+    for duplicate in duplicates.iterator():
+        AttendanceRecord.objects.filter(
+            member_id=duplicate['member_id'], date=duplicate['date']
+        ).exclude(id=duplicate['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_attendancerecord_attendance_date_id_idx_and_more'),
+        ('core', '0003_member_last_attended_on'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_records, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendancerecord',
+            constraint=models.UniqueConstraint(fields=('member', 'date'), name='unique_attendance_member_date'),
+        ),
+    ]
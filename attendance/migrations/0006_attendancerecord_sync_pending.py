@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-17 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_unique_attendance_member_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='sync_pending',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(condition=models.Q(('sync_pending', True)), fields=['id'], name='attendance_sync_pending_idx'),
+        ),
+    ]
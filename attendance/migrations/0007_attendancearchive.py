@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-17 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_attendancerecord_sync_pending'),
+        ('core', '0004_trainerclient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceArchive',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True)),
+                ('month', models.DateField()),
+                ('days', models.IntegerField(default=0)),
+                ('visits', models.IntegerField(default=0)),
+                ('last_visit', models.DateField(blank=True, null=True)),
+                ('member', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_attendance', to='core.member')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month'], name='attendance_archive_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('member', 'month'), name='unique_attendance_archive_member_month')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-17 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_attendancearchive'),
+        ('core', '0004_trainerclient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='client_ref',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='attendancerecord',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_ref__isnull', False)), fields=('client_ref',), name='unique_attendance_client_ref'),
+        ),
+    ]
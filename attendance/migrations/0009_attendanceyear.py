@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-17 15:40
+
+import attendance.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_attendance_years(apps, schema_editor):
+    # Same bitmaps as attendance.bitmaps.refresh_bitmaps, built from the historical models
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    AttendanceArchive = apps.get_model('attendance', 'AttendanceArchive')
+    AttendanceYear = apps.get_model('attendance', 'AttendanceYear')
+    years = {}
+
+    def add(member_id, day):
+        key = (member_id, day.year)
+        years[key] = years.get(key, 0) | (1 << (day.timetuple().tm_yday - 1))
+
+    for member_id, day in AttendanceRecord.objects.values_list('member_id', 'date').iterator(chunk_size=2000):
+        add(member_id, day)
+    for member_id, month, days in AttendanceArchive.objects.values_list('member_id', 'month', 'days').iterator(chunk_size=2000):
+        for bit in range(31):
+            if days & (1 << bit):
+                add(member_id, month.replace(day=bit + 1))
+    AttendanceYear.objects.bulk_create([
+        AttendanceYear(member_id=member_id, year=year, days=value.to_bytes(46, 'little'), visits=value.bit_count())
+        for (member_id, year), value in years.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_attendancerecord_client_ref'),
+        ('core', '0004_trainerclient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceYear',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True)),
+                ('year', models.IntegerField()),
+                ('days', models.BinaryField(default=attendance.models.empty_year_bitmap)),
+                ('visits', models.IntegerField(default=0)),
+                ('member', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_years', to='core.member')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('member', 'year'), name='unique_attendance_year_member_year')],
+            },
+        ),
+        migrations.RunPython(populate_attendance_years, migrations.RunPython.noop),
+    ]
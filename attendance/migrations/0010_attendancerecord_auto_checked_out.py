@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_attendanceyear'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='auto_checked_out',
+            field=models.BooleanField(default=False),
+        ),
+    ]
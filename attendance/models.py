@@ -7,3 +7,64 @@ class AttendanceRecord(BaseModel):
     check_out_time = models.DateTimeField(null=True, blank=True)
     date = models.DateField(db_index=True)
     method = models.CharField(max_length=20)  # manual, qr, id
+    client_ref = models.CharField(max_length=64, null=True, blank=True)  # Offline kiosk's id for the check-in
+    auto_checked_out = models.BooleanField(default=False)  # check_out_time was set by auto_check_out, not the member
+    sync_pending = models.BooleanField(default=False)  # Kiosk check-in whose derived tables attendance.pending has not updated yet
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['member', 'date'], name='unique_attendance_member_date'),
+            models.UniqueConstraint(
+                fields=['client_ref'], condition=models.Q(client_ref__isnull=False), name='unique_attendance_client_ref'
+            ),
+        ]
+        indexes = [
+            # Keyset pagination of the attendance list, optionally per member
+            models.Index(fields=['-date', '-id'], name='attendance_date_id_idx'),
+            models.Index(fields=['member', '-date', '-id'], name='attendance_member_date_idx'),
+            models.Index(fields=['id'], condition=models.Q(sync_pending=True), name='attendance_sync_pending_idx'),
+        ]
+
+class AttendanceArchive(BaseModel):
+    """One member's visits in one archived month, packed into a single row by attendance.archive"""
+    member = models.ForeignKey('core.Member', on_delete=models.CASCADE, related_name='archived_attendance', db_index=False)
+    month = models.DateField()  # First day of the month
+    days = models.IntegerField(default=0)  # Bit n-1 is set when the member visited on day n
+    visits = models.IntegerField(default=0)
+    last_visit = models.DateField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['member', 'month'], name='unique_attendance_archive_member_month'),
+        ]
+        indexes = [
+            models.Index(fields=['month'], name='attendance_archive_month_idx'),
+        ]
+
+def empty_year_bitmap():
+    return bytes(46)  # 366 bits
+
+class AttendanceYear(BaseModel):
+    """One member's attended days in one year as a 366-bit bitmap, maintained by attendance.bitmaps"""
+    member = models.ForeignKey('core.Member', on_delete=models.CASCADE, related_name='attendance_years', db_index=False)
+    year = models.IntegerField()
+    days = models.BinaryField(default=empty_year_bitmap)  # Bit n is set when the member visited on day n + 1
+    visits = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['member', 'year'], name='unique_attendance_year_member_year'),
+        ]
+
+class MemberStreak(BaseModel):
+    """Latest run of consecutive attendance days per member, maintained by attendance.streaks"""
+    member = models.OneToOneField('core.Member', on_delete=models.CASCADE, related_name='streak')
+    run_start = models.DateField(null=True, blank=True)
+    run_end = models.DateField(null=True, blank=True)
+    longest_streak = models.IntegerField(default=0, db_index=True)
+
+    @property
+    def run_length(self):
+        if not self.run_end:
+            return 0
+        return (self.run_end - self.run_start).days + 1
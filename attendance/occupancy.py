@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AttendanceRecord
+
+# Counters are per day, so yesterday's unclosed visits drop out at midnight
+COUNTER_TIMEOUT = 2 * 24 * 60 * 60
+
+
+def _counter_key(day):
+    return f'attendance:occupancy:{day.isoformat()}'
+
+
+def count_open_visits(day):
+    """People checked in on day without a check-out, straight from the attendance table"""
+    return AttendanceRecord.objects.filter(date=day, check_out_time__isnull=True).count()
+
+
+def _seed(day):
+    """Start a missing counter from the DB; cache.add leaves a counter another process created alone"""
+    counted = count_open_visits(day)
+    cache.add(_counter_key(day), counted, timeout=COUNTER_TIMEOUT)
+    return counted
+
+
+def reconcile_occupancy(day=None):
+    """
+    Correct the counter from the DB. Returns (counted, previous counter value or None).
+    The drift is applied with incr rather than set, so check-ins and check-outs that
+    land between the read and the write are not overwritten. An event that commits
+    during the COUNT can still be off by one until the next reconcile.
+    """
+    day = day or timezone.localdate()
+    key = _counter_key(day)
+    previous = cache.get(key)
+    if previous is None:
+        return _seed(day), None
+    counted = count_open_visits(day)
+    if counted != previous:
+        try:
+            cache.incr(key, counted - previous)
+        except ValueError:
+            # Evicted meanwhile
+            cache.add(key, counted, timeout=COUNTER_TIMEOUT)
+    return counted, previous
+
+
+def current_occupancy(day=None):
+    """Live occupancy from the cache; only a missing counter touches the DB"""
+    day = day or timezone.localdate()
+    value = cache.get(_counter_key(day))
+    if value is None:
+        _seed(day)
+        value = cache.get(_counter_key(day), 0)
+    # Missed events can drift the counter below zero until the next reconcile
+    return max(value, 0)
+
+
+def _adjust(day, delta):
+    if day != timezone.localdate():
+        return
+    key = _counter_key(day)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # No counter yet (first event of the day, eviction): the count includes this event
+        _seed(day)
+
+
+def track_visit_change(day, delta):
+    """Apply a +1 check-in / -1 check-out to the day's counter once the write commits"""
+    transaction.on_commit(lambda: _adjust(day, delta))
+
+
+def close_stale_visits(after_hours, now=None):
+    """
+    Check out every visit still open after_hours after its check-in, in one UPDATE.
+    The check-out is set to check-in + after_hours and flagged as automatic, so dwell
+    statistics can leave it out. Returns (visits closed, days they were on).
+    """
+    now = now or timezone.now()
+    stale = AttendanceRecord.objects.filter(
+        check_out_time__isnull=True,
+        check_in_time__lt=now - timedelta(hours=after_hours)
+    )
+    days = set(stale.dates('date', 'day'))
+    if not days:
+        return 0, days
+    closed = stale.update(
+        check_out_time=F('check_in_time') + timedelta(hours=after_hours),
+        auto_checked_out=True,
+        updated_at=now
+    )
+    # The UPDATE skips the per-row signals that move the live counter
+    today = timezone.localdate()
+    if today in days:
+        reconcile_occupancy(today)
+    return closed, days
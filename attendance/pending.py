@@ -0,0 +1,45 @@
+"""
+Upkeep of kiosk check-ins.
+
+A kiosk check-in is inserted with sync_pending=True through bulk_create, so the
+check-in transaction is one INSERT and none of the per-row post_save handlers run.
+The derived tables (last visit, bitmaps, streaks, rollups, heatmap, stats cache) are
+brought up to date once it commits, still within the request, and the flag is cleared
+in the same transaction. Check-ins whose process stopped in between keep the flag;
+`sync_check_ins`, run on a schedule, catches them up.
+"""
+from django.db import transaction
+
+from .models import AttendanceRecord
+from .signals import attendance_changed
+
+SYNC_BATCH_SIZE = 5000
+
+
+def sync_pending_check_ins(ids=None, limit=SYNC_BATCH_SIZE):
+    """
+    Clear up to limit pending check-ins (only those in ids, when given) and send
+    attendance_changed for them, in one transaction. Rows locked by a concurrent sync
+    are skipped. Returns the number synced.
+    """
+    with transaction.atomic():
+        pending = AttendanceRecord.objects.select_for_update(skip_locked=True).filter(sync_pending=True)
+        if ids is not None:
+            pending = pending.filter(id__in=ids)
+        rows = list(pending.order_by('id').values_list('id', 'member_id', 'date')[:limit])
+        if not rows:
+            return 0
+        AttendanceRecord.objects.filter(id__in=[row[0] for row in rows]).update(sync_pending=False)
+        attendance_changed.send(
+            sender=AttendanceRecord,
+            member_ids={member_id for _, member_id, _ in rows},
+            dates={day for _, _, day in rows},
+            # The check-in already moved the live occupancy counter
+            occupancy_tracked=True
+        )
+    return len(rows)
+
+
+def sync_after_commit(record):
+    """Sync a just-inserted check-in once the current transaction commits"""
+    transaction.on_commit(lambda: sync_pending_check_ins(ids=[record.id]))
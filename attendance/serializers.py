@@ -8,3 +8,20 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
     class Meta:
         model = AttendanceRecord
         fields = '__all__'
+
+class AttendanceRecordListSerializer(serializers.ModelSerializer):
+    """List rows carry the member's id and name; full details are opt-in via ?expand=member"""
+    member_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AttendanceRecord
+        fields = ['id', 'member', 'member_name', 'date', 'check_in_time', 'check_out_time', 'method']
+
+    def get_member_name(self, obj):
+        return f"{obj.member.user.first_name} {obj.member.user.last_name}"
+
+class AttendanceRecordExpandedSerializer(AttendanceRecordListSerializer):
+    member_details = MemberSerializer(source='member', read_only=True)
+
+    class Meta(AttendanceRecordListSerializer.Meta):
+        fields = AttendanceRecordListSerializer.Meta.fields + ['member_details']
@@ -0,0 +1,133 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver, Signal
+from django.utils import timezone
+
+from core.models import Member
+from subscriptions.models import MemberSubscription
+from .models import AttendanceRecord
+from .kiosk import load_eligibility
+from .last_visit import record_visit, forget_visit, refresh_last_attended
+from .bitmaps import record_day, forget_day, refresh_bitmaps
+from .streaks import record_streak_visit, forget_streak_visit, refresh_streaks
+from .occupancy import track_visit_change, reconcile_occupancy
+
+TRACKED_FIELDS = ('member_id', 'date', 'check_out_time')
+# Marks a field that was deferred when the record was loaded
+NOT_LOADED = object()
+
+# Sent by bulk writes that bypass the per-row signals (bulk_create, bulk_change deletes)
+# with the member_ids and dates whose attendance changed, and occupancy_tracked=True
+# when the writer already moved the live occupancy counter
+attendance_changed = Signal()
+
+_bulk = threading.local()
+
+
+@contextmanager
+def bulk_change():
+    """
+    Skip the per-row AttendanceRecord delete handlers (here and in gym.signals) for
+    deletes inside the block. The caller sends attendance_changed for what it removed,
+    so a bulk delete costs one refresh instead of per-row upkeep.
+    """
+    _bulk.depth = getattr(_bulk, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _bulk.depth -= 1
+
+
+def in_bulk_change():
+    return getattr(_bulk, 'depth', 0) > 0
+
+
+def _snapshot(instance):
+    # Read from __dict__ so deferred fields are never fetched just for the snapshot
+    return {field: instance.__dict__.get(field, NOT_LOADED) for field in TRACKED_FIELDS}
+
+
+def _open_visit_day(values):
+    """The day a visit counts towards occupancy on, or None once checked out"""
+    return values['date'] if values['check_out_time'] is None else None
+
+
+def _deleted_directly(origin):
+    # Records removed by a member/user cascade have no member state left to maintain
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is AttendanceRecord
+
+
+@receiver(post_init, sender=AttendanceRecord)
+def remember_loaded_values(sender, instance, **kwargs):
+    instance._loaded_values = _snapshot(instance)
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def sync_member_attendance_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance._loaded_values
+    if created:
+        record_visit(instance.member_id, instance.date)
+        # Bitmaps first: streak recomputes read them
+        record_day(instance.member_id, instance.date)
+        record_streak_visit(instance.member_id, instance.date)
+    elif (previous['member_id'], previous['date']) != (instance.member_id, instance.date):
+        member_ids = {previous['member_id'], instance.member_id}
+        refresh_last_attended(member_ids)
+        refresh_bitmaps(member_ids)
+        refresh_streaks(member_ids)
+
+    current = _snapshot(instance)
+    # Partially loaded records can't tell what changed; the periodic reconcile covers them
+    if created or NOT_LOADED not in previous.values():
+        was_open = None if created else _open_visit_day(previous)
+        is_open = _open_visit_day(current)
+        if was_open != is_open:
+            if was_open:
+                track_visit_change(was_open, -1)
+            if is_open:
+                track_visit_change(is_open, 1)
+    instance._loaded_values = current
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def sync_member_attendance_on_delete(sender, instance, origin=None, **kwargs):
+    if not _deleted_directly(origin) or in_bulk_change():
+        return
+    forget_visit(instance.member_id, instance.date)
+    forget_day(instance.member_id, instance.date)
+    forget_streak_visit(instance.member_id, instance.date)
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def track_occupancy_on_delete(sender, instance, **kwargs):
+    # Also on cascades: a deleted member's open visit leaves the gym count
+    if not in_bulk_change() and instance.__dict__.get('check_out_time', NOT_LOADED) is None:
+        track_visit_change(instance.date, -1)
+
+
+@receiver(attendance_changed)
+def sync_member_attendance_on_bulk_change(sender, member_ids, dates, occupancy_tracked=False, **kwargs):
+    refresh_last_attended(member_ids)
+    refresh_bitmaps(member_ids)
+    refresh_streaks(member_ids)
+    today = timezone.localdate()
+    if today in dates and not occupancy_tracked:
+        transaction.on_commit(lambda: reconcile_occupancy(today))
+
+
+@receiver(post_save, sender=Member)
+@receiver(post_delete, sender=Member)
+@receiver(post_save, sender=MemberSubscription)
+@receiver(post_delete, sender=MemberSubscription)
+def refresh_kiosk_eligibility(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    member_id = instance.pk if sender is Member else instance.member_id
+    transaction.on_commit(lambda: load_eligibility(member_id))
@@ -0,0 +1,166 @@
+import heapq
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .archive import archived_days
+from .bitmaps import AttendanceBitmap
+from .models import AttendanceRecord, AttendanceArchive, MemberStreak
+
+# Gaps-and-islands: consecutive days share the same (date - row_number) value,
+# so grouping on it yields one row per run of consecutive visits.
+RUNS_SQL = """
+WITH days AS (
+    SELECT member_id, date FROM {table} WHERE {where}
+    UNION
+    SELECT member_id, date FROM (
+        SELECT member_id, month + (bit - 1) AS date
+        FROM {archive_table} CROSS JOIN generate_series(1, 31) AS bit
+        WHERE days & (1 << (bit - 1)) <> 0
+    ) archived WHERE {where}
+), islands AS (
+    SELECT member_id, date,
+           date - CAST(ROW_NUMBER() OVER (PARTITION BY member_id ORDER BY date) AS integer) AS grp
+    FROM days
+), runs AS (
+    SELECT member_id, MIN(date) AS run_start, MAX(date) AS run_end, COUNT(*) AS length
+    FROM islands GROUP BY member_id, grp
+), ranked AS (
+    SELECT member_id, run_start, run_end,
+           MAX(length) OVER (PARTITION BY member_id) AS longest,
+           ROW_NUMBER() OVER (PARTITION BY member_id ORDER BY run_end DESC) AS recency
+    FROM runs
+)
+SELECT member_id, run_start, run_end, longest FROM ranked WHERE recency = 1
+"""
+
+
+def _runs_sql(member_ids, until):
+    where, params = ['TRUE'], []
+    if member_ids is not None:
+        where.append('member_id = ANY(%s)')
+        params.append(list(member_ids))
+    if until is not None:
+        where.append('date <= %s')
+        params.append(until)
+    sql = RUNS_SQL.format(
+        table=AttendanceRecord._meta.db_table,
+        archive_table=AttendanceArchive._meta.db_table,
+        where=' AND '.join(where)
+    )
+    with connection.cursor() as cursor:
+        # The filter appears once for hot and once for archived days
+        cursor.execute(sql, params * 2)
+        return {member_id: (start, end, longest) for member_id, start, end, longest in cursor.fetchall()}
+
+
+def _runs_python(member_ids, until):
+    records = AttendanceRecord.objects.all()
+    if member_ids is not None:
+        records = records.filter(member_id__in=member_ids)
+    if until is not None:
+        records = records.filter(date__lte=until)
+    days = records.values_list('member_id', 'date').distinct().order_by('member_id', 'date')
+
+    runs = {}
+    current_member = start = end = None
+    longest = 0
+    for member_id, day in heapq.merge(days.iterator(chunk_size=2000), archived_days(member_ids, until)):
+        if member_id != current_member:
+            if current_member is not None:
+                runs[current_member] = (start, end, longest)
+            current_member, start, end, longest = member_id, day, day, 1
+            continue
+        if day <= end:
+            # Late records of an archived month can repeat an archived day
+            continue
+        if day == end + timedelta(days=1):
+            end = day
+        else:
+            start = end = day
+        longest = max(longest, (end - start).days + 1)
+    if current_member is not None:
+        runs[current_member] = (start, end, longest)
+    return runs
+
+
+def compute_runs(member_ids=None, until=None):
+    """
+    Return {member_id: (run_start, run_end, longest)} where run_start/run_end
+    bound each member's most recent run of consecutive attendance days.
+    Given members are read from their attendance bitmaps; a full recompute uses
+    a single window-function query on PostgreSQL and one ordered scan elsewhere.
+    """
+    if member_ids is not None:
+        bitmaps = AttendanceBitmap.for_members(member_ids)
+        runs = {member_id: bitmap.runs(until) for member_id, bitmap in bitmaps.items()}
+        return {member_id: run for member_id, run in runs.items() if run[1] is not None}
+    if connection.vendor == 'postgresql':
+        return _runs_sql(member_ids, until)
+    return _runs_python(member_ids, until)
+
+
+def refresh_streaks(member_ids=None):
+    """Recompute and store streak state for the given members (all members when None)"""
+    runs = compute_runs(member_ids)
+    if member_ids is None:
+        # Members whose attendance was wiped keep no stale run around
+        MemberStreak.objects.exclude(run_end=None).update(run_start=None, run_end=None, longest_streak=0)
+        member_ids = runs.keys()
+    rows = []
+    for member_id in member_ids:
+        start, end, longest = runs.get(member_id, (None, None, 0))
+        rows.append(MemberStreak(member_id=member_id, run_start=start, run_end=end, longest_streak=longest))
+    MemberStreak.objects.bulk_create(
+        rows,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['member'],
+        update_fields=['run_start', 'run_end', 'longest_streak', 'updated_at'],
+    )
+    return len(rows)
+
+
+def record_streak_visit(member_id, day):
+    """Extend the stored run for a new visit, falling back to a recompute when runs may merge"""
+    with transaction.atomic():
+        state = MemberStreak.objects.select_for_update().filter(member_id=member_id).first()
+        if state is None or state.run_end is None or day < state.run_start:
+            refresh_streaks([member_id])
+            return
+        if day <= state.run_end:
+            return
+        if day == state.run_end + timedelta(days=1):
+            state.run_end = day
+        else:
+            state.run_start = state.run_end = day
+        state.longest_streak = max(state.longest_streak, state.run_length)
+        state.save(update_fields=['run_start', 'run_end', 'longest_streak', 'updated_at'])
+
+
+def forget_streak_visit(member_id, day):
+    """Removing a visit can split a run or shorten the longest one, so recompute"""
+    refresh_streaks([member_id])
+
+
+def get_streak(member, today=None):
+    """Current and longest attendance streak for a member"""
+    today = today or timezone.now().date()
+    state = MemberStreak.objects.filter(member=member).first()
+    if state is None:
+        # Not stored yet (no attendance since streaks were introduced): compute without
+        # writing, so reading a dashboard never changes the rows its ETag is built from
+        start, end, longest = compute_runs([member.id]).get(member.id, (None, None, 0))
+        state = MemberStreak(member=member, run_start=start, run_end=end, longest_streak=longest)
+
+    start, end = state.run_start, state.run_end
+    if end and end > today:
+        # Future-dated records: evaluate the run as of today instead
+        start, end, _ = compute_runs([member.id], until=today).get(member.id, (None, None, 0))
+
+    current = 0
+    # A run that ended yesterday is still alive until today is over
+    if end and end >= today - timedelta(days=1):
+        current = (end - start).days + 1
+    return {'current': current, 'longest': state.longest_streak}
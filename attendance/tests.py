@@ -1,3 +1,635 @@
-from django.test import TestCase
+import csv
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Member
+from gym.models import DailyGymRollup
+from gym.rollups import rebuild_rollups, source_date_range
+from shared.export import streaming_export
+from shared.pagination import encode_cursor
+from subscriptions.models import SubscriptionPlan, MemberSubscription
+from .models import AttendanceRecord, AttendanceArchive, AttendanceYear, MemberStreak
+from .archive import archive_attendance, archive_cutoff, archived_through, month_end
+from .kiosk import member_token, verify_token, get_eligibility
+from .occupancy import current_occupancy, count_open_visits, reconcile_occupancy, _counter_key
+from .pending import sync_pending_check_ins
+from .bitmaps import refresh_bitmaps
+from .last_visit import refresh_last_attended
+from .streaks import refresh_streaks
+
+User = get_user_model()
+
+
+def make_user(name, role):
+    return User.objects.create_user(
+        email=f'{name}@example.com',
+        username=name,
+        password='password123',
+        first_name=name.title(),
+        last_name='Tester',
+        role=role
+    )
+
+
+def make_member(name, status='active', paid_through=None):
+    member = Member.objects.create(
+        user=make_user(name, 'member'),
+        date_of_birth=date(1990, 1, 1),
+        gender='female',
+        address='1 Test Street',
+        join_date=timezone.now().date(),
+        status=status
+    )
+    if paid_through is not None:
+        plan = SubscriptionPlan.objects.create(name='Monthly', duration=30, price=50)
+        MemberSubscription.objects.create(
+            member=member, plan=plan, start_date=paid_through - timedelta(days=30), end_date=paid_through,
+            status='active', payment_status='paid', amount=50
+        )
+    return member
+
+
+def derived_state():
+    """Everything maintained incrementally from attendance, for comparison with a full rebuild"""
+    return {
+        'last_attended': dict(Member.objects.values_list('id', 'last_attended_on')),
+        'bitmaps': {
+            (row.member_id, row.year): (bytes(row.days), row.visits)
+            for row in AttendanceYear.objects.all() if row.visits
+        },
+        'streaks': set(
+            MemberStreak.objects.exclude(run_end=None).values_list('member_id', 'run_start', 'run_end', 'longest_streak')
+        ),
+        'rollups': dict(DailyGymRollup.objects.exclude(attendance_count=0).values_list('date', 'attendance_count')),
+    }
+
+
+class DerivedStateTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+
+    def assertDerivedStateMatchesRebuild(self):
+        incremental = derived_state()
+        refresh_last_attended()
+        refresh_bitmaps()
+        refresh_streaks()
+        rebuild_rollups(*source_date_range())
+        self.assertEqual(incremental, derived_state())
+
+
+class BulkMarkTest(DerivedStateTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(make_user('admin', 'admin'))
+        self.members = [make_member(f'member{n}') for n in range(3)]
+        self.url = reverse('attendance-mark-bulk')
+
+    def mark(self, status_action, days, members=None):
+        records = [
+            {'member_id': member.id, 'date': day.isoformat(), 'status': status_action}
+            for member in members or self.members for day in days
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, {'records': records}, format='json')
+
+    def test_marking_present_keeps_derived_tables_current(self):
+        days = [self.today - timedelta(days=offset) for offset in (4, 2, 1, 0)]
+        response = self.mark('present', days)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['marked_present'], 12)
+        self.assertEqual(Member.objects.get(pk=self.members[0].pk).last_attended_on, self.today)
+        self.assertEqual(DailyGymRollup.objects.get(date=self.today).attendance_count, 3)
+        self.assertDerivedStateMatchesRebuild()
+
+    def test_marking_absent_keeps_derived_tables_current(self):
+        days = [self.today - timedelta(days=offset) for offset in range(4)]
+        self.mark('present', days)
+        response = self.mark('absent', [self.today - timedelta(days=1)], members=self.members[:2])
+        self.assertEqual(response.data['data']['marked_absent'], 2)
+        self.assertEqual(MemberStreak.objects.get(member=self.members[0]).run_length, 1)
+        self.assertEqual(MemberStreak.objects.get(member=self.members[2]).run_length, 4)
+        self.assertDerivedStateMatchesRebuild()
+
+    def test_already_present_rows_are_not_counted_as_created(self):
+        AttendanceRecord.objects.create(
+            member=self.members[0], date=self.today, check_in_time=timezone.now(), method='manual'
+        )
+        response = self.mark('present', [self.today])
+        self.assertEqual(response.data['data']['marked_present'], 2)
+        self.assertEqual(response.data['data']['already_present'], 1)
+        self.assertEqual(AttendanceRecord.objects.filter(date=self.today).count(), 3)
+
+    def test_rows_inserted_concurrently_are_kept(self):
+        bulk_create = QuerySet.bulk_create
+
+        def racing_bulk_create(queryset, objs, *args, **kwargs):
+            if queryset.model is AttendanceRecord and kwargs.get('ignore_conflicts'):
+                # Another request inserts one of the rows after the view read the existing ones
+                bulk_create(queryset, [AttendanceRecord(
+                    member=self.members[1], date=self.today, check_in_time=timezone.now(), method='qr'
+                )])
+            return bulk_create(queryset, objs, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'bulk_create', racing_bulk_create):
+            response = self.mark('present', [self.today])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['marked_present'], 3)
+        self.assertEqual(AttendanceRecord.objects.get(member=self.members[1], date=self.today).method, 'qr')
+        self.assertEqual(DailyGymRollup.objects.get(date=self.today).attendance_count, 3)
+        self.assertDerivedStateMatchesRebuild()
+
+    def test_contradicting_entries_are_rejected(self):
+        records = [
+            {'member_id': self.members[0].id, 'date': self.today.isoformat(), 'status': 'present'},
+            {'member_id': self.members[0].id, 'date': self.today.isoformat(), 'status': 'absent'},
+        ]
+        response = self.client.post(self.url, {'records': records}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+
+class ArchiveTest(DerivedStateTestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = make_member('member')
+        self.old_days = [self.today - timedelta(days=offset) for offset in (400, 399, 398, 300)]
+        self.recent_days = [self.today - timedelta(days=1), self.today]
+        with self.captureOnCommitCallbacks(execute=True):
+            for day in self.old_days + self.recent_days:
+                AttendanceRecord.objects.create(
+                    member=self.member, date=day, check_in_time=timezone.now(), method='manual'
+                )
+
+    def archive(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return archive_attendance(archive_cutoff(self.today, horizon_days=180))
+
+    def test_archiving_keeps_derived_tables(self):
+        before = derived_state()
+        moved = sum(records for _, records in self.archive())
+        self.assertEqual(moved, len(self.old_days))
+        self.assertEqual(
+            set(AttendanceRecord.objects.values_list('date', flat=True)),
+            {day for day in self.old_days + self.recent_days if day >= archive_cutoff(self.today, horizon_days=180)}
+        )
+        self.assertEqual(before, derived_state())
+        self.assertDerivedStateMatchesRebuild()
+
+    def test_archive_boundary_is_read_from_the_database(self):
+        self.assertIsNone(archived_through())
+        # As if archive_attendance had run in another process
+        AttendanceArchive.objects.create(member=self.member, month=date(2020, 3, 1), days=1, visits=1, last_visit=date(2020, 3, 1))
+        self.assertEqual(archived_through(), date(2020, 3, 31))
+
+    def test_rebuilds_after_archiving_keep_archived_visits(self):
+        self.archive()
+        before = derived_state()
+        refresh_bitmaps([self.member.id])
+        refresh_streaks([self.member.id])
+        refresh_last_attended([self.member.id])
+        self.assertEqual(before, derived_state())
+        self.assertEqual(
+            sum(row.visits for row in AttendanceYear.objects.filter(member=self.member)),
+            len(self.old_days + self.recent_days)
+        )
+
+    def test_late_records_of_an_archived_month_are_merged(self):
+        self.archive()
+        month = self.old_days[0].replace(day=1)
+        late_day = next(day for day in (month, month_end(month)) if day not in self.old_days)
+        AttendanceRecord.objects.create(member=self.member, date=late_day, check_in_time=timezone.now(), method='manual')
+        self.archive()
+        archive = AttendanceArchive.objects.get(member=self.member, month=late_day.replace(day=1))
+        self.assertTrue(archive.days & (1 << (late_day.day - 1)))
+        self.assertEqual(archived_through(), month_end(self.old_days[-1]))
+        self.assertDerivedStateMatchesRebuild()
+
+    def test_late_record_of_an_archived_day_is_counted_once(self):
+        self.archive()
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceRecord.objects.create(
+                member=self.member, date=self.old_days[0], check_in_time=timezone.now(), method='manual'
+            )
+        self.assertEqual(DailyGymRollup.objects.get(date=self.old_days[0]).attendance_count, 1)
+        self.assertDerivedStateMatchesRebuild()
+
+    def test_export_skips_archived_dates(self):
+        self.archive()
+        through = archived_through()
+        self.client.force_authenticate(make_user('admin', 'admin'))
+        response = self.client.get(reverse('attendance-export'), {'output': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Archived-Through'], through.isoformat())
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['date'] for row in rows], [day.isoformat() for day in self.recent_days])
+
+        for params in ({'from': through.isoformat()}, {'date': self.old_days[0].isoformat()}, {'to': through.isoformat()}):
+            response = self.client.get(reverse('attendance-export'), params)
+            self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY, params)
+
+
+class KioskCheckInTest(DerivedStateTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(make_user('frontdesk', 'admin'))
+        self.member = make_member('member', paid_through=self.today + timedelta(days=10))
+        self.url = reverse('kiosk-check-in')
+
+    def check_in(self, token):
+        return self.client.post(self.url, {'token': token}, format='json')
+
+    def test_token_round_trip(self):
+        self.assertEqual(verify_token(member_token(self.member.id)), self.member.id)
+
+    def test_tampered_token_is_rejected(self):
+        token = member_token(self.member.id)
+        forged = f'{self.member.id + 1}:{token.split(":", 1)[1]}'
+        with self.assertRaises(signing.BadSignature):
+            verify_token(forged)
+        response = self.check_in(forged)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_check_in_is_a_single_insert(self):
+        token = member_token(self.member.id)
+        get_eligibility(self.member.id)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.check_in(token)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statements = [query['sql'] for query in queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('INSERT'))
+        self.assertTrue(AttendanceRecord.objects.get(member=self.member).sync_pending)
+
+    def test_second_scan_on_the_same_day(self):
+        self.check_in(member_token(self.member.id))
+        response = self.check_in(member_token(self.member.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['data']['already_checked_in'])
+        self.assertEqual(AttendanceRecord.objects.filter(member=self.member).count(), 1)
+
+    def test_expired_subscription_is_refused(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            MemberSubscription.objects.filter(member=self.member).update(end_date=self.today - timedelta(days=1))
+            # The update skips signals; a save refreshes the cached eligibility on commit
+            MemberSubscription.objects.get(member=self.member).save()
+        response = self.check_in(member_token(self.member.id))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['message'], 'No active subscription')
+
+    def test_deactivated_member_is_refused(self):
+        get_eligibility(self.member.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.status = 'inactive'
+            self.member.save()
+        response = self.check_in(member_token(self.member.id))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_eligibility_entries_expire(self):
+        get_eligibility(self.member.id)
+        # Changed by another process: this cache is not refreshed, the entry just expires
+        Member.objects.filter(pk=self.member.pk).update(status='inactive')
+        with self.settings(KIOSK_CACHE_TTL=60):
+            self.assertEqual(get_eligibility(self.member.id)['status'], 'active')
+            cache.clear()
+            self.assertEqual(get_eligibility(self.member.id)['status'], 'inactive')
+
+    def test_unknown_member_is_refused(self):
+        response = self.check_in(member_token(self.member.id + 1000))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['message'], 'Unknown member')
+
+    def test_check_in_is_dated_in_the_local_time_zone(self):
+        # Noon UTC is already the next day at UTC+14
+        now = datetime(2026, 3, 10, 12, tzinfo=dt_timezone.utc)
+        with self.settings(TIME_ZONE='Pacific/Kiritimati'), mock.patch('django.utils.timezone.now', return_value=now):
+            response = self.check_in(member_token(self.member.id))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(AttendanceRecord.objects.get(member=self.member).date, date(2026, 3, 11))
+
+    def test_check_in_updates_derived_tables_on_commit(self):
+        before = current_occupancy()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.check_in(member_token(self.member.id))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(current_occupancy(), before + 1)
+        self.assertFalse(AttendanceRecord.objects.get(member=self.member).sync_pending)
+        self.assertEqual(Member.objects.get(pk=self.member.pk).last_attended_on, self.today)
+        self.assertEqual(DailyGymRollup.objects.get(date=self.today).attendance_count, 1)
+        self.assertDerivedStateMatchesRebuild()
+
+    def test_check_ins_left_pending_are_synced(self):
+        # The process stopped after the commit: the on-commit upkeep never ran
+        self.check_in(member_token(self.member.id))
+        self.assertIsNone(Member.objects.get(pk=self.member.pk).last_attended_on)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('sync_check_ins', stdout=StringIO())
+        self.assertEqual(sync_pending_check_ins(), 0)
+        self.assertFalse(AttendanceRecord.objects.get(member=self.member).sync_pending)
+        self.assertEqual(Member.objects.get(pk=self.member.pk).last_attended_on, self.today)
+        self.assertEqual(DailyGymRollup.objects.get(date=self.today).attendance_count, 1)
+        self.assertDerivedStateMatchesRebuild()
+
+
+class KioskBatchCheckInTest(DerivedStateTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(make_user('frontdesk', 'admin'))
+        self.members = [make_member(f'member{i}', paid_through=self.today + timedelta(days=10)) for i in range(3)]
+        self.url = reverse('kiosk-check-in-batch')
+        self.morning = timezone.now() - timedelta(days=1)
+
+    def entry(self, client_ref, member, checked_in_at=None):
+        return {
+            'client_ref': client_ref,
+            'token': member_token(member.id),
+            'checked_in_at': (checked_in_at or self.morning).isoformat(),
+        }
+
+    def upload(self, entries):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {'check_ins': entries}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['data']
+
+    def test_retried_batch_is_not_inserted_twice(self):
+        entries = [self.entry(f'kiosk-1-{i}', member) for i, member in enumerate(self.members)]
+        first = self.upload(entries)
+        self.assertEqual(first['summary'], {'created': 3})
+
+        retry = self.upload(entries)
+        self.assertEqual(retry['summary'], {'duplicate': 3})
+        self.assertEqual(
+            [result['attendance_id'] for result in retry['results']],
+            [result['attendance_id'] for result in first['results']]
+        )
+        self.assertEqual(AttendanceRecord.objects.count(), 3)
+        self.assertDerivedStateMatchesRebuild()
+
+    def test_partly_uploaded_batch_is_completed(self):
+        entries = [self.entry(f'kiosk-1-{i}', member) for i, member in enumerate(self.members)]
+        self.upload(entries[:1])
+        data = self.upload(entries)
+        self.assertEqual([result['status'] for result in data['results']], ['duplicate', 'created', 'created'])
+        self.assertEqual(AttendanceRecord.objects.count(), 3)
+        self.assertDerivedStateMatchesRebuild()
+
+    def test_repeated_client_ref_in_one_batch(self):
+        entry = self.entry('kiosk-1-0', self.members[0])
+        data = self.upload([entry, entry])
+        first, repeat = data['results']
+        self.assertEqual((first['status'], repeat['status']), ('created', 'duplicate'))
+        self.assertEqual(repeat['attendance_id'], first['attendance_id'])
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+    def test_second_scan_of_a_member_on_one_day(self):
+        member = self.members[0]
+        data = self.upload([
+            self.entry('kiosk-1-0', member),
+            self.entry('kiosk-1-1', member, self.morning + timedelta(minutes=5)),
+        ])
+        self.assertEqual([result['status'] for result in data['results']], ['created', 'already_checked_in'])
+        self.assertEqual(AttendanceRecord.objects.filter(member=member).count(), 1)
+
+        # Later batches also see the visit that is already stored
+        data = self.upload([self.entry('kiosk-2-0', member, self.morning + timedelta(minutes=10))])
+        self.assertEqual(data['results'][0]['status'], 'already_checked_in')
+
+    def test_invalid_entries_are_rejected_individually(self):
+        lapsed = make_member('lapsed', paid_through=self.today - timedelta(days=30))
+        tampered = self.entry('kiosk-1-1', self.members[1])
+        tampered['token'] = tampered['token'][:-1] + ('A' if tampered['token'][-1] != 'A' else 'B')
+        data = self.upload([
+            self.entry('kiosk-1-0', self.members[0]),
+            tampered,
+            self.entry('kiosk-1-2', self.members[2], timezone.now() + timedelta(days=1)),
+            self.entry('kiosk-1-3', lapsed),
+            {'token': member_token(self.members[2].id), 'checked_in_at': self.morning.isoformat()},
+        ])
+        self.assertEqual(
+            [result['status'] for result in data['results']],
+            ['created', 'rejected', 'rejected', 'rejected', 'rejected']
+        )
+        self.assertEqual(data['results'][1]['error'], 'Invalid card')
+        self.assertEqual(data['results'][2]['error'], 'checked_in_at is in the future')
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+    def test_empty_batch(self):
+        response = self.client.post(self.url, {'check_ins': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+
+class AttendanceListPaginationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(make_user('frontdesk', 'admin'))
+        self.url = reverse('attendance-list')
+        today = timezone.now().date()
+        self.members = [make_member(f'member{i}') for i in range(3)]
+        for days_ago in range(3):
+            for member in self.members:
+                day = today - timedelta(days=days_ago)
+                AttendanceRecord.objects.create(
+                    member=member, date=day, check_in_time=timezone.now() - timedelta(days=days_ago), method='qr'
+                )
+
+    def get(self, **params):
+        return self.client.get(self.url, params)
+
+    def pages(self, **params):
+        ids, cursor = [], None
+        while True:
+            response = self.get(**params, **({'cursor': cursor} if cursor else {}))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.append([row['id'] for row in response.data['data']['results']])
+            cursor = response.data['data']['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_pages_cover_every_record_once_newest_first(self):
+        pages = self.pages(page_size=4)
+        self.assertEqual([len(page) for page in pages], [4, 4, 1])
+        expected = list(AttendanceRecord.objects.order_by('-date', '-id').values_list('id', flat=True))
+        self.assertEqual([record_id for page in pages for record_id in page], expected)
+
+    def test_cursor_is_stable_under_inserts(self):
+        first = self.get(page_size=4).data['data']
+        # A newer record does not shift the following pages
+        AttendanceRecord.objects.create(
+            member=make_member('latecomer'), date=timezone.now().date(), check_in_time=timezone.now(), method='qr'
+        )
+        second = self.get(page_size=4, cursor=first['next_cursor']).data['data']
+        expected = list(AttendanceRecord.objects.order_by('-date', '-id').values_list('id', flat=True))
+        start = expected.index(first['results'][-1]['id']) + 1
+        self.assertEqual([row['id'] for row in second['results']], expected[start:start + 4])
+
+    def test_filters_apply_to_every_page(self):
+        member = self.members[0]
+        pages = self.pages(page_size=2, member=member.id)
+        self.assertEqual(
+            [record_id for page in pages for record_id in page],
+            list(member.attendance.order_by('-date', '-id').values_list('id', flat=True))
+        )
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-a-cursor', encode_cursor([1]), encode_cursor(['yesterday', 1]), encode_cursor({'id': 1})):
+            response = self.get(cursor=cursor)
+            self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY, cursor)
+
+    def test_invalid_page_size(self):
+        for page_size in ('ten', '0'):
+            response = self.get(page_size=page_size)
+            self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(self.get(page_size=1000).data['data']['page_size'], 200)
+
+
+class OccupancyTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.members = [make_member(f'member{i}') for i in range(3)]
+
+    def check_in(self, member):
+        with self.captureOnCommitCallbacks(execute=True):
+            return AttendanceRecord.objects.create(member=member, date=self.today, check_in_time=timezone.now(), method='qr')
+
+    def test_counter_follows_check_ins_and_check_outs(self):
+        records = [self.check_in(member) for member in self.members]
+        self.assertEqual(current_occupancy(), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            records[0].check_out_time = timezone.now()
+            records[0].save()
+        self.assertEqual(current_occupancy(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            records[1].delete()
+        self.assertEqual(current_occupancy(), count_open_visits(self.today))
+
+    def test_reconcile_corrects_drift(self):
+        for member in self.members:
+            self.check_in(member)
+        cache.set(_counter_key(self.today), 7)
+        self.assertEqual(reconcile_occupancy(), (3, 7))
+        self.assertEqual(current_occupancy(), 3)
+        self.assertEqual(reconcile_occupancy(), (3, 3))
+
+    def test_reconcile_keeps_events_during_the_count(self):
+        for member in self.members[:2]:
+            self.check_in(member)
+        cache.set(_counter_key(self.today), 5)
+        counted = count_open_visits(self.today)
+
+        def count_with_a_check_in(day):
+            # A check-in commits after the COUNT ran but before the correction is applied
+            cache.incr(_counter_key(day))
+            return counted
+
+        with mock.patch('attendance.occupancy.count_open_visits', side_effect=count_with_a_check_in):
+            reconcile_occupancy()
+        self.assertEqual(current_occupancy(), 3)
+
+    def test_seeding_leaves_a_concurrent_counter_alone(self):
+        self.check_in(self.members[0])
+        cache.clear()
+
+        def count_while_another_process_seeds(day):
+            cache.set(_counter_key(day), 2)
+            return 1
+
+        with mock.patch('attendance.occupancy.count_open_visits', side_effect=count_while_another_process_seeds):
+            self.assertEqual(reconcile_occupancy(), (1, None))
+        self.assertEqual(current_occupancy(), 2)
+
+    def test_occupancy_endpoint(self):
+        self.client.force_authenticate(make_user('frontdesk', 'trainer'))
+        self.check_in(self.members[0])
+        response = self.client.get(reverse('attendance-occupancy'))
+        self.assertEqual(response.data['data'], {'date': self.today.isoformat(), 'current': 1})
+
+    def test_check_out_and_counter_use_the_local_date(self):
+        # Noon UTC is already the next day at UTC+14
+        now = datetime(2026, 3, 10, 12, tzinfo=dt_timezone.utc)
+        local_today = date(2026, 3, 11)
+        self.client.force_authenticate(make_user('frontdesk', 'admin'))
+        with self.settings(TIME_ZONE='Pacific/Kiritimati'), mock.patch('django.utils.timezone.now', return_value=now):
+            with self.captureOnCommitCallbacks(execute=True):
+                AttendanceRecord.objects.create(member=self.members[0], date=local_today, check_in_time=now, method='qr')
+            response = self.client.get(reverse('attendance-occupancy'))
+            self.assertEqual(response.data['data'], {'date': local_today.isoformat(), 'current': 1})
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('attendance-check-out'), {'member_id': self.members[0].id})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(current_occupancy(), 0)
+
+
+class AttendanceExportTest(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(make_user('admin', 'admin'))
+        self.today = timezone.now().date()
+        self.members = [make_member(f'member{n}') for n in range(2)]
+        self.records = [
+            AttendanceRecord.objects.create(
+                member=member, date=self.today - timedelta(days=offset), check_in_time=timezone.now(),
+                method='qr' if offset % 2 else 'manual'
+            )
+            for offset in range(3) for member in self.members
+        ]
+
+    def export(self, **params):
+        response = self.client.get(reverse('attendance-export'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_has_a_header_and_one_line_per_record(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="attendance.csv"')
+        header, *lines = list(csv.reader(StringIO(content)))
+        self.assertEqual(header[:2], ['id', 'member_id'])
+        self.assertEqual(len(lines), len(self.records))
+        ordered = sorted(self.records, key=lambda record: (record.date, record.id))
+        self.assertEqual([int(line[0]) for line in lines], [record.id for record in ordered])
+
+    def test_ndjson_rows(self):
+        response, content = self.export(output='ndjson', member=self.members[0].id, date=self.today.isoformat())
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="attendance-{self.today.isoformat()}.ndjson"')
+        row, = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(row['member_id'], self.members[0].id)
+        self.assertEqual(row['member_name'], 'Member0 Tester')
+        self.assertEqual((row['date'], row['method'], row['check_out_time']), (self.today.isoformat(), 'manual', None))
+
+    def test_filters(self):
+        start = self.today - timedelta(days=1)
+        _, content = self.export(output='ndjson', method='qr', **{'from': start.isoformat()})
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual({(row['date'], row['method']) for row in rows}, {(start.isoformat(), 'qr')})
+        self.assertEqual(len(rows), 2)
+
+    def test_invalid_parameters(self):
+        for params in ({'output': 'xlsx'}, {'from': 'yesterday'}, {'member': 'me'}):
+            response = self.client.get(reverse('attendance-export'), params)
+            self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY, params)
+
+    def test_rows_are_streamed_in_chunks(self):
+        records = AttendanceRecord.objects.order_by('id')
+        response = streaming_export(records, {'id': 'id'}, 'csv', 'attendance', chunk_size=4)
+        chunks = list(response.streaming_content)
+        # The header and six rows, four lines per chunk
+        self.assertEqual([chunk.count(b'\n') for chunk in chunks], [4, 3])
@@ -1,12 +1,22 @@
 from django.urls import path
 from .views import (
-    AttendanceListView, TrainerMemberAttendanceView, 
-    AttendanceMarkView, MemberAttendanceStatsView
+    AttendanceListView, AttendanceExportView, TrainerMemberAttendanceView, 
+    AttendanceMarkView, AttendanceBulkMarkView, MemberAttendanceStatsView,
+    KioskCheckInView, KioskBatchCheckInView, KioskTokenView, CheckOutView, OccupancyView,
+    MemberAttendanceCalendarView
 )
 
 urlpatterns = [
     path('', AttendanceListView.as_view(), name='attendance-list'),
+    path('export/', AttendanceExportView.as_view(), name='attendance-export'),
     path('trainer/', TrainerMemberAttendanceView.as_view(), name='trainer-attendance'),
     path('mark/', AttendanceMarkView.as_view(), name='attendance-mark'),
+    path('mark/bulk/', AttendanceBulkMarkView.as_view(), name='attendance-mark-bulk'),
+    path('kiosk/check-in/', KioskCheckInView.as_view(), name='kiosk-check-in'),
+    path('kiosk/check-in/batch/', KioskBatchCheckInView.as_view(), name='kiosk-check-in-batch'),
+    path('check-out/', CheckOutView.as_view(), name='attendance-check-out'),
+    path('occupancy/', OccupancyView.as_view(), name='attendance-occupancy'),
+    path('kiosk/token/', KioskTokenView.as_view(), name='kiosk-token'),
     path('stats/', MemberAttendanceStatsView.as_view(), name='member-attendance-stats'),
+    path('calendar/', MemberAttendanceCalendarView.as_view(), name='member-attendance-calendar'),
 ]
@@ -3,9 +3,20 @@ from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from .models import AttendanceRecord
-from .serializers import AttendanceRecordSerializer
-from core.models import Member, Trainer
-from shared.permissions import IsAdminOrTrainer, IsTrainer, IsMember
+from .archive import archived_through
+from .signals import attendance_changed, bulk_change
+from .kiosk import KIOSK_METHODS, member_token, verify_token, get_eligibility, get_eligibilities, ineligibility_reason
+from .occupancy import current_occupancy, track_visit_change
+from .pending import sync_after_commit
+from .serializers import AttendanceRecordSerializer, AttendanceRecordListSerializer, AttendanceRecordExpandedSerializer
+from .bitmaps import AttendanceBitmap
+from .streaks import get_streak
+from core.models import Member, Trainer, TrainerClient
+from core.rosters import client_members, is_client
+from core.serializers import prefetch_active_plan
+from shared.permissions import IsAdminOrTrainer, IsTrainer, IsMember, IsAdminUser
+from shared.pagination import keyset_page, parse_page_size
+from shared.export import streaming_export
 from shared.responses import (
     handle_success,
     handle_error,
@@ -13,22 +24,72 @@ from shared.responses import (
     handle_not_found,
 )
 from django.utils import timezone
-from django.db.models import Q, Count
-from django.db.models.functions import TruncMonth, ExtractWeekDay
+from django.utils.dateparse import parse_datetime
+from django.core import signing
+from django.db import transaction, IntegrityError
+from django.db.models import Q, Value
+from django.db.models.functions import Concat
 from datetime import timedelta
 
+RECORD_FILTER_PARAMS = [
+    openapi.Parameter('member', openapi.IN_QUERY, description="Member ID", type=openapi.TYPE_INTEGER),
+    openapi.Parameter('date', openapi.IN_QUERY, description="Exact date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+    openapi.Parameter('from', openapi.IN_QUERY, description="Earliest date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+    openapi.Parameter('to', openapi.IN_QUERY, description="Latest date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+    openapi.Parameter('method', openapi.IN_QUERY, description="Check-in method", type=openapi.TYPE_STRING),
+]
+
+
+def _record_filters(params):
+    """Queryset filters from the member/date/from/to/method query params. Raises ValueError"""
+    filters = {}
+    if params.get('member'):
+        filters['member_id'] = int(params['member'])
+    for name, lookup in (('date', 'date'), ('from', 'date__gte'), ('to', 'date__lte')):
+        if params.get(name):
+            filters[lookup] = timezone.datetime.strptime(params[name], '%Y-%m-%d').date()
+    if params.get('method'):
+        filters['method'] = params['method']
+    return filters
+
+
 class AttendanceListView(views.APIView):
     permission_classes = [IsAdminOrTrainer]
 
-    @swagger_auto_schema(tags=['Attendance'], operation_summary='List attendance records')
+    @swagger_auto_schema(
+        tags=['Attendance'],
+        operation_summary='List attendance records, newest first',
+        manual_parameters=RECORD_FILTER_PARAMS + [
+            openapi.Parameter('expand', openapi.IN_QUERY, description="'member' to include full member details", type=openapi.TYPE_STRING),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="next_cursor of the previous page", type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Results per page (default 50, max 200)", type=openapi.TYPE_INTEGER),
+        ]
+    )
     def get(self, request):
-        date = request.query_params.get('date')
-        if date:
-            records = AttendanceRecord.objects.filter(date=date).select_related('member__user')
-        else:
-            records = AttendanceRecord.objects.select_related('member__user').all()
-        serializer = AttendanceRecordSerializer(records, many=True)
-        return handle_success(data=serializer.data, message="Attendance records retrieved successfully", status_code=status.HTTP_200_OK)
+        params = request.query_params
+        try:
+            filters = _record_filters(params)
+        except ValueError:
+            return handle_validation_error(errors={'detail': 'member must be an integer and dates must be YYYY-MM-DD'})
+        records = AttendanceRecord.objects.select_related('member__user').filter(**filters)
+
+        expand = params.get('expand') == 'member'
+        if expand:
+            records = records.prefetch_related(prefetch_active_plan('member__'))
+
+        try:
+            page_size = parse_page_size(params)
+            page, next_cursor = keyset_page(records, ['-date', '-id'], params.get('cursor'), page_size)
+        except ValueError as e:
+            return handle_validation_error(errors={'detail': str(e)})
+
+        serializer_class = AttendanceRecordExpandedSerializer if expand else AttendanceRecordListSerializer
+        data = {
+            'results': serializer_class(page, many=True).data,
+            'next_cursor': next_cursor,
+            'page_size': page_size
+        }
+        return handle_success(data=data, message="Attendance records retrieved successfully", status_code=status.HTTP_200_OK)
 
     @swagger_auto_schema(tags=['Attendance'], operation_summary='Create attendance record', request_body=AttendanceRecordSerializer)
     def post(self, request):
@@ -38,6 +99,61 @@ class AttendanceListView(views.APIView):
             return handle_success(data=serializer.data, message="Attendance record created successfully", status_code=status.HTTP_201_CREATED)
         return handle_validation_error(errors=serializer.errors)
 
+class AttendanceExportView(views.APIView):
+    permission_classes = [IsAdminOrTrainer]
+
+    COLUMNS = {
+        'id': 'id',
+        'member_id': 'member_id',
+        'member_name': 'member_name',
+        'date': 'date',
+        'check_in_time': 'check_in_time',
+        'check_out_time': 'check_out_time',
+        'auto_checked_out': 'auto_checked_out',
+        'method': 'method',
+    }
+
+    @swagger_auto_schema(
+        tags=['Attendance'],
+        operation_summary='Export attendance records as a CSV or NDJSON download; archived dates are skipped',
+        manual_parameters=RECORD_FILTER_PARAMS + [
+            openapi.Parameter('output', openapi.IN_QUERY, description="'csv' (default) or 'ndjson'", type=openapi.TYPE_STRING),
+        ]
+    )
+    def get(self, request):
+        params = request.query_params
+        try:
+            filters = _record_filters(params)
+        except ValueError:
+            return handle_validation_error(errors={'detail': 'member must be an integer and dates must be YYYY-MM-DD'})
+
+        # Archived months keep the days visited but not the records, so they cannot be exported
+        through = archived_through()
+        if through is not None:
+            first = filters.get('date', filters.get('date__gte'))
+            last = filters.get('date', filters.get('date__lte'))
+            if any(day is not None and day <= through for day in (first, last)):
+                return handle_validation_error(
+                    errors={'detail': f'Attendance up to {through.isoformat()} is archived and cannot be exported'}
+                )
+            if first is None:
+                filters['date__gte'] = through + timedelta(days=1)
+
+        records = AttendanceRecord.objects.filter(**filters).annotate(
+            member_name=Concat('member__user__first_name', Value(' '), 'member__user__last_name')
+        ).order_by('date', 'id')
+
+        filename = '-'.join(['attendance'] + [params[name] for name in ('from', 'to', 'date') if params.get(name)])
+        try:
+            response = streaming_export(records, self.COLUMNS, params.get('output', 'csv'), filename)
+        except ValueError as e:
+            return handle_validation_error(errors={'detail': str(e)})
+        if through is not None:
+            # Without 'from' the export starts the day after this date
+            response['X-Archived-Through'] = through.isoformat()
+        return response
+
+
 class TrainerMemberAttendanceView(views.APIView):
     permission_classes = [IsTrainer]
 
@@ -63,9 +179,7 @@ class TrainerMemberAttendanceView(views.APIView):
                 except ValueError:
                     return handle_validation_error(errors={'date': 'Invalid date format. Use YYYY-MM-DD'})
 
-            members = Member.objects.filter(
-                Q(assigned_trainer=trainer) | Q(booked_sessions__trainer=trainer)
-            ).filter(status='active').select_related('user').distinct()
+            members = client_members(trainer).filter(status='active').select_related('user')
             
             attendance_map = {}
             records = AttendanceRecord.objects.filter(date=target_date, member__in=members)
@@ -90,6 +204,16 @@ class TrainerMemberAttendanceView(views.APIView):
         except Exception as e:
             return handle_error(message=f"Failed to retrieve attendance: {str(e)}")
 
+MAX_BULK_MARK_RECORDS = 500
+
+
+def _check_in_time(target_date):
+    # Back-filled days have no real check-in time, so use the start of the day
+    if target_date < timezone.now().date():
+        return timezone.make_aware(timezone.datetime.combine(target_date, timezone.datetime.min.time()))
+    return timezone.now()
+
+
 class AttendanceMarkView(views.APIView):
     permission_classes = [IsAdminOrTrainer]
 
@@ -123,12 +247,7 @@ class AttendanceMarkView(views.APIView):
             if request.user.role == 'trainer':
                 try:
                     trainer = Trainer.objects.get(user=request.user)
-                    is_assigned = Member.objects.filter(
-                        Q(assigned_trainer=trainer) | Q(booked_sessions__trainer=trainer),
-                        id=member_id
-                    ).exists()
-                    
-                    if not is_assigned:
+                    if not is_client(trainer, member_id):
                          return handle_error(message="Member is not assigned to you", status_code=status.HTTP_403_FORBIDDEN)
                 except Trainer.DoesNotExist:
                     return handle_error(message="Trainer profile not found", status_code=status.HTTP_404_NOT_FOUND)
@@ -138,7 +257,7 @@ class AttendanceMarkView(views.APIView):
                     member_id=member_id,
                     date=target_date,
                     defaults={
-                        'check_in_time': timezone.make_aware(timezone.datetime.combine(target_date, timezone.datetime.min.time())) if target_date < timezone.now().date() else timezone.now(),
+                        'check_in_time': _check_in_time(target_date),
                         'method': 'manual'
                     }
                 )
@@ -156,6 +275,450 @@ class AttendanceMarkView(views.APIView):
         except Exception as e:
             return handle_error(message=f"Failed to mark attendance: {str(e)}")
 
+class AttendanceBulkMarkView(views.APIView):
+    permission_classes = [IsAdminOrTrainer]
+
+    @swagger_auto_schema(
+        tags=['Attendance'],
+        operation_summary='Mark or unmark attendance for many members at once',
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'records': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'member_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                            'date': openapi.Schema(type=openapi.TYPE_STRING, format='date'),
+                            'status': openapi.Schema(type=openapi.TYPE_STRING, enum=['present', 'absent']),
+                        },
+                        required=['member_id', 'date', 'status']
+                    )
+                ),
+            },
+            required=['records']
+        )
+    )
+    def post(self, request):
+        try:
+            entries = request.data.get('records')
+            if not isinstance(entries, list) or not entries:
+                return handle_validation_error(errors={'records': 'Provide a non-empty list of records'})
+            if len(entries) > MAX_BULK_MARK_RECORDS:
+                return handle_validation_error(errors={'records': f'At most {MAX_BULK_MARK_RECORDS} records per request'})
+
+            # (member_id, date) -> status, rejecting malformed or contradicting entries
+            marks = {}
+            errors = {}
+            for index, entry in enumerate(entries):
+                try:
+                    key = (int(entry['member_id']), timezone.datetime.strptime(entry['date'], '%Y-%m-%d').date())
+                except (KeyError, TypeError, ValueError):
+                    errors[index] = 'member_id must be an integer and date must be YYYY-MM-DD'
+                    continue
+                status_action = entry.get('status')
+                if status_action not in ('present', 'absent'):
+                    errors[index] = 'Invalid status. Use present or absent'
+                elif marks.setdefault(key, status_action) != status_action:
+                    errors[index] = 'Conflicts with another record for the same member and date'
+            if errors:
+                return handle_validation_error(errors=errors)
+
+            member_ids = {member_id for member_id, _ in marks}
+            if request.user.role == 'trainer':
+                trainer = Trainer.objects.filter(user=request.user).first()
+                if trainer is None:
+                    return handle_error(message="Trainer profile not found", status_code=status.HTTP_404_NOT_FOUND)
+                # One query authorizes the whole set
+                allowed = TrainerClient.objects.filter(trainer=trainer, member_id__in=member_ids)
+                missing = member_ids - set(allowed.values_list('member_id', flat=True))
+                if missing:
+                    return handle_error(
+                        errors={'member_ids': sorted(missing)},
+                        message="Some members are not assigned to you",
+                        status_code=status.HTTP_403_FORBIDDEN
+                    )
+            else:
+                missing = member_ids - set(Member.objects.filter(id__in=member_ids).values_list('id', flat=True))
+                if missing:
+                    return handle_validation_error(errors={'member_ids': sorted(missing)}, message="Unknown members")
+
+            present = [key for key, status_action in marks.items() if status_action == 'present']
+            absent = [key for key, status_action in marks.items() if status_action == 'absent']
+
+            with transaction.atomic():
+                created = 0
+                if present:
+                    existing = set(AttendanceRecord.objects.filter(
+                        member_id__in={member_id for member_id, _ in present},
+                        date__in={day for _, day in present}
+                    ).values_list('member_id', 'date'))
+                    records = [
+                        AttendanceRecord(member_id=member_id, date=day, check_in_time=_check_in_time(day), method='manual')
+                        for member_id, day in present if (member_id, day) not in existing
+                    ]
+                    # The unique (member, date) constraint skips a row another request inserted
+                    # since the read above; it is then counted as created here and as present there
+                    AttendanceRecord.objects.bulk_create(records, ignore_conflicts=True)
+                    created = len(records)
+
+                removed = 0
+                if absent:
+                    by_date = {}
+                    for member_id, day in absent:
+                        by_date.setdefault(day, []).append(member_id)
+                    condition = Q()
+                    for day, ids in by_date.items():
+                        condition |= Q(date=day, member_id__in=ids)
+                    # The per-row delete handlers stand down; attendance_changed covers them
+                    with bulk_change():
+                        removed, _ = AttendanceRecord.objects.filter(condition).delete()
+
+                if created or removed:
+                    attendance_changed.send(
+                        sender=AttendanceRecord,
+                        member_ids=member_ids,
+                        dates={day for _, day in marks}
+                    )
+
+            data = {
+                'marked_present': created,
+                'already_present': len(present) - created,
+                'marked_absent': removed
+            }
+            return handle_success(data=data, message="Attendance updated successfully")
+        except Exception as e:
+            return handle_error(message=f"Failed to mark attendance: {str(e)}")
+
+MAX_KIOSK_BATCH = 1000
+# Kiosk clocks may run slightly ahead of the server's
+KIOSK_CLOCK_SKEW = timedelta(minutes=5)
+
+
+class KioskCheckInView(views.APIView):
+    permission_classes = [IsAdminOrTrainer]
+
+    @swagger_auto_schema(
+        tags=['Attendance'],
+        operation_summary='Check a member in from a scanned QR code or ID card',
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'token': openapi.Schema(type=openapi.TYPE_STRING, description="Signed token from the member's QR code or card"),
+                'method': openapi.Schema(type=openapi.TYPE_STRING, enum=list(KIOSK_METHODS)),
+            },
+            required=['token']
+        )
+    )
+    def post(self, request):
+        try:
+            token = request.data.get('token')
+            method = request.data.get('method', 'qr')
+            if not token:
+                return handle_validation_error(errors={'token': 'This field is required'})
+            if method not in KIOSK_METHODS:
+                return handle_validation_error(errors={'method': f"Use one of: {', '.join(KIOSK_METHODS)}"})
+
+            # The signature proves the card was issued by us, no lookup needed
+            try:
+                member_id = verify_token(token)
+            except signing.BadSignature:
+                return handle_error(message="Invalid card")
+
+            now = timezone.now()
+            today = timezone.localdate(now)
+            eligibility = get_eligibility(member_id)
+            reason = ineligibility_reason(eligibility, today)
+            if reason:
+                return handle_error(message=reason, status_code=status.HTTP_403_FORBIDDEN)
+
+            data = {'member_id': member_id, 'name': eligibility['name']}
+            record = AttendanceRecord(
+                member_id=member_id, date=today, check_in_time=now, method=method, sync_pending=True
+            )
+            try:
+                # A single INSERT; a second scan on the same day hits the unique constraint.
+                # bulk_create skips the per-row signals: the live occupancy counter is bumped
+                # and attendance.pending updates the derived tables once this commits
+                with transaction.atomic():
+                    AttendanceRecord.objects.bulk_create([record])
+                    track_visit_change(record.date, 1)
+                    sync_after_commit(record)
+            except IntegrityError:
+                return handle_success(data={**data, 'already_checked_in': True}, message="Already checked in today")
+
+            data.update({'attendance_id': record.id, 'check_in_time': record.check_in_time, 'already_checked_in': False})
+            return handle_success(data=data, message="Checked in successfully", status_code=status.HTTP_201_CREATED)
+        except Exception as e:
+            return handle_error(message=f"Failed to check in: {str(e)}")
+
+class KioskBatchCheckInView(views.APIView):
+    permission_classes = [IsAdminOrTrainer]
+
+    @swagger_auto_schema(
+        tags=['Attendance'],
+        operation_summary='Upload check-ins a kiosk queued while offline',
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'check_ins': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'client_ref': openapi.Schema(type=openapi.TYPE_STRING, description="Unique id the kiosk generated for the check-in"),
+                            'token': openapi.Schema(type=openapi.TYPE_STRING, description="Signed token from the member's QR code or card"),
+                            'method': openapi.Schema(type=openapi.TYPE_STRING, enum=list(KIOSK_METHODS)),
+                            'checked_in_at': openapi.Schema(type=openapi.TYPE_STRING, format='date-time'),
+                        },
+                        required=['client_ref', 'token', 'checked_in_at']
+                    )
+                ),
+            },
+            required=['check_ins']
+        )
+    )
+    def post(self, request):
+        """
+        Each check-in gets a result with a status: created, duplicate (its client_ref was
+        already uploaded), already_checked_in (the member has a visit that day) or rejected
+        (with an error). Retrying a whole batch is safe.
+        """
+        try:
+            entries = request.data.get('check_ins')
+            if not isinstance(entries, list) or not entries:
+                return handle_validation_error(errors={'check_ins': 'Provide a non-empty list of check-ins'})
+            if len(entries) > MAX_KIOSK_BATCH:
+                return handle_validation_error(errors={'check_ins': f'At most {MAX_KIOSK_BATCH} check-ins per request'})
+
+            latest_allowed = timezone.now() + KIOSK_CLOCK_SKEW
+            results = [None] * len(entries)
+            pending = {}  # client_ref -> (index, member_id, check_in_time, method)
+            repeats = []  # (index, index of the first check-in with the same client_ref)
+            for index, entry in enumerate(entries):
+                entry = entry if isinstance(entry, dict) else {}
+                client_ref = entry.get('client_ref')
+                result = results[index] = {'client_ref': client_ref}
+                if not isinstance(client_ref, str) or not 0 < len(client_ref) <= 64:
+                    result.update(status='rejected', error='client_ref must be a string of 1-64 characters')
+                    continue
+                if client_ref in pending:
+                    result['status'] = 'duplicate'
+                    repeats.append((index, pending[client_ref][0]))
+                    continue
+                method = entry.get('method', 'qr')
+                if method not in KIOSK_METHODS:
+                    result.update(status='rejected', error=f"method must be one of: {', '.join(KIOSK_METHODS)}")
+                    continue
+                try:
+                    checked_in_at = parse_datetime(entry.get('checked_in_at') or '')
+                except (TypeError, ValueError):
+                    checked_in_at = None
+                if checked_in_at is None:
+                    result.update(status='rejected', error='checked_in_at must be an ISO 8601 date-time')
+                    continue
+                if timezone.is_naive(checked_in_at):
+                    checked_in_at = timezone.make_aware(checked_in_at)
+                if checked_in_at > latest_allowed:
+                    result.update(status='rejected', error='checked_in_at is in the future')
+                    continue
+                try:
+                    member_id = verify_token(entry.get('token') or '')
+                except signing.BadSignature:
+                    result.update(status='rejected', error='Invalid card')
+                    continue
+                result['member_id'] = member_id
+                pending[client_ref] = (index, member_id, checked_in_at, method)
+
+            # Check-ins uploaded by an earlier (possibly interrupted) attempt
+            uploaded = dict(
+                AttendanceRecord.objects.filter(client_ref__in=pending.keys()).values_list('client_ref', 'id')
+            )
+            for client_ref, attendance_id in uploaded.items():
+                results[pending.pop(client_ref)[0]].update(status='duplicate', attendance_id=attendance_id)
+
+            eligibility = get_eligibilities(member_id for _, member_id, _, _ in pending.values())
+            visits = {}
+            for client_ref, (index, member_id, checked_in_at, method) in list(pending.items()):
+                day = timezone.localdate(checked_in_at)
+                reason = ineligibility_reason(eligibility[member_id], day)
+                if reason:
+                    results[index].update(status='rejected', error=reason)
+                    del pending[client_ref]
+                elif (member_id, day) in visits:
+                    # Two scans of the same member on one day: the first one counts
+                    results[index].update(status='already_checked_in')
+                    del pending[client_ref]
+                else:
+                    visits[(member_id, day)] = client_ref
+
+            with transaction.atomic():
+                if visits:
+                    existing = set(AttendanceRecord.objects.filter(
+                        member_id__in={member_id for member_id, _ in visits},
+                        date__in={day for _, day in visits}
+                    ).values_list('member_id', 'date'))
+                    records = []
+                    for (member_id, day), client_ref in visits.items():
+                        index, _, checked_in_at, method = pending[client_ref]
+                        if (member_id, day) in existing:
+                            results[index].update(status='already_checked_in')
+                            continue
+                        records.append(AttendanceRecord(
+                            member_id=member_id, date=day, check_in_time=checked_in_at,
+                            method=method, client_ref=client_ref
+                        ))
+                    # Rows inserted concurrently (same client_ref or member and day) are skipped
+                    AttendanceRecord.objects.bulk_create(records, ignore_conflicts=True)
+
+                    created = dict(AttendanceRecord.objects.filter(
+                        client_ref__in=[record.client_ref for record in records]
+                    ).values_list('client_ref', 'id'))
+                    for record in records:
+                        index = pending[record.client_ref][0]
+                        if record.client_ref in created:
+                            results[index].update(status='created', attendance_id=created[record.client_ref])
+                        else:
+                            results[index].update(status='already_checked_in')
+
+                    if created:
+                        attendance_changed.send(
+                            sender=AttendanceRecord,
+                            member_ids={record.member_id for record in records},
+                            dates={record.date for record in records}
+                        )
+
+            for index, first in repeats:
+                results[index]['attendance_id'] = results[first].get('attendance_id')
+
+            summary = {}
+            for result in results:
+                summary[result['status']] = summary.get(result['status'], 0) + 1
+            return handle_success(data={'results': results, 'summary': summary}, message="Check-ins processed")
+        except Exception as e:
+            return handle_error(message=f"Failed to process check-ins: {str(e)}")
+
+class CheckOutView(views.APIView):
+    permission_classes = [IsAdminOrTrainer]
+
+    @swagger_auto_schema(
+        tags=['Attendance'],
+        operation_summary="Check a member out of today's visit",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'token': openapi.Schema(type=openapi.TYPE_STRING, description="Signed token from the member's QR code or card"),
+                'member_id': openapi.Schema(type=openapi.TYPE_INTEGER, description="Alternative to token for the front desk"),
+            }
+        )
+    )
+    def post(self, request):
+        try:
+            token = request.data.get('token')
+            if token:
+                try:
+                    member_id = verify_token(token)
+                except signing.BadSignature:
+                    return handle_error(message="Invalid card")
+            else:
+                try:
+                    member_id = int(request.data.get('member_id'))
+                except (TypeError, ValueError):
+                    return handle_validation_error(errors={'detail': 'Provide a token or an integer member_id'})
+                if request.user.role == 'trainer':
+                    is_assigned = TrainerClient.objects.filter(trainer__user=request.user, member_id=member_id).exists()
+                    if not is_assigned:
+                        return handle_error(message="Member is not assigned to you", status_code=status.HTTP_403_FORBIDDEN)
+
+            now = timezone.now()
+            today = timezone.localdate(now)
+            with transaction.atomic():
+                # Conditional UPDATE: of two concurrent check-outs only one closes the visit
+                closed = AttendanceRecord.objects.filter(
+                    member_id=member_id, date=today, check_out_time__isnull=True
+                ).update(check_out_time=now, updated_at=now)
+                if closed:
+                    track_visit_change(today, -1)
+
+            if not closed:
+                return handle_error(message="No open check-in today for this member", status_code=status.HTTP_404_NOT_FOUND)
+            return handle_success(data={'member_id': member_id, 'check_out_time': now}, message="Checked out successfully")
+        except Exception as e:
+            return handle_error(message=f"Failed to check out: {str(e)}")
+
+class OccupancyView(views.APIView):
+    permission_classes = [IsAdminOrTrainer]
+
+    @swagger_auto_schema(tags=['Attendance'], operation_summary='Number of members in the gym right now')
+    def get(self, request):
+        try:
+            today = timezone.localdate()
+            data = {'date': today.isoformat(), 'current': current_occupancy(today)}
+            return handle_success(data=data, message="Occupancy retrieved successfully")
+        except Exception as e:
+            return handle_error(message=f"Failed to retrieve occupancy: {str(e)}")
+
+class KioskTokenView(views.APIView):
+    permission_classes = [IsMember | IsAdminUser]
+
+    @swagger_auto_schema(
+        tags=['Attendance'],
+        operation_summary="Get the signed token to encode in a member's QR code",
+        manual_parameters=[
+            openapi.Parameter('member', openapi.IN_QUERY, description="Member ID (admins only)", type=openapi.TYPE_INTEGER)
+        ]
+    )
+    def get(self, request):
+        try:
+            if request.user.role == 'member':
+                member = Member.objects.filter(user=request.user).only('id').first()
+            else:
+                member = Member.objects.filter(pk=request.query_params.get('member') or None).only('id').first()
+            if member is None:
+                return handle_not_found(message="Member not found")
+            return handle_success(data={'member_id': member.id, 'token': member_token(member.id)}, message="Check-in token retrieved successfully")
+        except Exception as e:
+            return handle_error(message=f"Failed to retrieve token: {str(e)}")
+
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+class MemberAttendanceCalendarView(views.APIView):
+    permission_classes = [IsMember]
+
+    @swagger_auto_schema(
+        tags=['Attendance'],
+        operation_summary="Days the current member attended in a year, by month",
+        manual_parameters=[
+            openapi.Parameter('year', openapi.IN_QUERY, description="Year (defaults to the current year)", type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request):
+        try:
+            try:
+                year = int(request.query_params.get('year', timezone.now().year))
+            except ValueError:
+                return handle_validation_error(errors={'year': 'year must be an integer'})
+            if not 1 <= year <= 9999:
+                return handle_validation_error(errors={'year': 'year is out of range'})
+
+            member = Member.objects.filter(user=request.user).only('id').first()
+            if member is None:
+                return handle_not_found(message="Member profile not found")
+
+            bitmap = AttendanceBitmap.for_member(member.id, years=[year])
+            months = [{'month': month, 'days': [], 'visits': 0} for month in range(1, 13)]
+            for day in bitmap.days():
+                months[day.month - 1]['days'].append(day.day)
+                months[day.month - 1]['visits'] += 1
+
+            data = {'year': year, 'visits': bitmap.total, 'months': months}
+            return handle_success(data=data, message="Attendance calendar retrieved successfully")
+        except Exception as e:
+            return handle_error(message=f"Failed to retrieve attendance calendar: {str(e)}")
+
+
 class MemberAttendanceStatsView(views.APIView):
     permission_classes = [IsMember]
 
@@ -163,56 +726,41 @@ class MemberAttendanceStatsView(views.APIView):
     def get(self, request):
         try:
             member = Member.objects.get(user=request.user)
-            total_visits = AttendanceRecord.objects.filter(member=member).count()
-            
             today = timezone.now().date()
+            # Every count below comes from the member's yearly attendance bitmaps (one query)
+            bitmap = AttendanceBitmap.for_member(member.id)
+            total_visits = bitmap.total
             
             # 1. Monthly Stats (Last 12 months)
             one_year_ago = today - timedelta(days=365)
-            attendance_query = AttendanceRecord.objects.filter(
-                member=member,
-                date__gte=one_year_ago.replace(day=1)
-            ).annotate(
-                month_trunc=TruncMonth('date')
-            ).values('month_trunc').annotate(
-                count=Count('id')
-            ).order_by('month_trunc')
-
             monthly_stats = [
                 {
-                    'month': item['month_trunc'].strftime('%b %Y'),
-                    'visits': item['count']
-                } for item in attendance_query
+                    'month': month.strftime('%b %Y'),
+                    'visits': visits
+                } for month, visits in sorted(bitmap.monthly_counts(one_year_ago.replace(day=1)).items())
             ]
             
-            # 2. Weekly Pattern (visits by day of week)
+            # 2. Weekly Pattern (visits by day of week), Sunday first
             three_months_ago = today - timedelta(days=90)
-            weekly_query = AttendanceRecord.objects.filter(
-                member=member,
-                date__gte=three_months_ago
-            ).annotate(
-                day_of_week=ExtractWeekDay('date')
-            ).values('day_of_week').annotate(
-                count=Count('id')
-            ).order_by('day_of_week')
-            
-            # ExtractWeekDay returns 1 (Sunday) through 7 (Saturday)
-            day_names = {
-                1: 'Sun', 2: 'Mon', 3: 'Tue', 4: 'Wed', 5: 'Thu', 6: 'Fri', 7: 'Sat'
-            }
+            weekday_counts = bitmap.weekday_counts(three_months_ago)
             weekly_pattern = [
                 {
-                    'day': day_names.get(item['day_of_week'], 'Unknown'),
-                    'visits': item['count']
-                } for item in weekly_query
+                    'day': WEEKDAY_NAMES[weekday],
+                    'visits': weekday_counts[weekday]
+                } for weekday in sorted(weekday_counts, key=lambda weekday: (weekday + 1) % 7)
             ]
 
             # 3. History (Last 30 visits)
             history_records = AttendanceRecord.objects.filter(member=member).order_by('-date')[:30]
             history_serializer = AttendanceRecordSerializer(history_records, many=True)
+
+            # 4. Streaks
+            streak = get_streak(member, today)
                 
             data = {
                 'total_visits': total_visits,
+                'current_streak': streak['current'],
+                'longest_streak': streak['longest'],
                 'monthly_stats': monthly_stats,
                 'weekly_pattern': weekly_pattern,
                 'history': history_serializer.data
@@ -0,0 +1,99 @@
+"""
+Push delivery of chat messages and notifications for deployments served through
+config/asgi.py. Events come from shared.pubsub: ChatMessage and Notification
+creations are published to their recipients' channels by chat.signals and
+notifications.signals.
+"""
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from shared.async_views import AsyncAPIView
+from shared.pubsub import get_broker, channels_for
+from shared.responses import handle_success, handle_error, handle_validation_error
+
+# Comment lines sent while idle so proxies keep the stream open
+HEARTBEAT_SECONDS = 15
+# Tells EventSource how long to wait before reconnecting (milliseconds)
+RETRY_MS = 3000
+DEFAULT_POLL_TIMEOUT = 25
+MAX_POLL_TIMEOUT = 55
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets EventSource's Accept: text/event-stream through content negotiation"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode() if data is not None else b''
+
+
+def _event_frame(event):
+    return f"id: {event.cursor}\nevent: {event.type}\ndata: {json.dumps(event.data)}\n\n"
+
+
+async def _event_stream(broker, channels, cursor):
+    # Hand the client a cursor straight away so even an idle connection can resume
+    _, cursor = await broker.wait(channels, cursor)
+    yield f"retry: {RETRY_MS}\nid: {cursor}\nevent: ready\ndata: {{}}\n\n"
+    while True:
+        events, cursor = await broker.wait(channels, cursor, timeout=HEARTBEAT_SECONDS)
+        if not events:
+            yield ": heartbeat\n\n"
+        for event in events:
+            yield _event_frame(event)
+
+
+class AsyncEventStreamView(AsyncAPIView):
+    """
+    Server-sent events for the requesting user. Reconnecting clients resume from the
+    Last-Event-ID header EventSource sends (or ?cursor=) and receive what they missed.
+    """
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+
+    async def get(self, request):
+        if not isinstance(request._request, ASGIRequest):
+            # A stream would hold a WSGI worker for as long as the client stays connected
+            return handle_error(
+                message="The event stream needs the ASGI server; use chat/events/poll/ instead",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        cursor = request.headers.get('Last-Event-ID') or request.query_params.get('cursor')
+        response = StreamingHttpResponse(
+            _event_stream(get_broker(), channels_for(request.user), cursor),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class AsyncEventPollView(AsyncAPIView):
+    """
+    Long-poll fallback for clients that cannot hold a stream open: answers as soon as
+    there are events after ?cursor=, or with none after ?timeout= seconds.
+    """
+
+    async def get(self, request):
+        try:
+            try:
+                timeout = int(request.query_params.get('timeout', DEFAULT_POLL_TIMEOUT))
+            except ValueError:
+                return handle_validation_error(errors={'timeout': 'timeout must be an integer'})
+            timeout = max(0, min(timeout, MAX_POLL_TIMEOUT))
+
+            events, cursor = await get_broker().wait(
+                channels_for(request.user), request.query_params.get('cursor'), timeout=timeout
+            )
+            data = {
+                'events': [{'type': event.type, 'data': event.data, 'cursor': event.cursor} for event in events],
+                'cursor': cursor,
+            }
+            return handle_success(data=data, message="Events retrieved successfully")
+        except Exception as e:
+            return handle_error(message=f"Failed to retrieve events: {str(e)}")
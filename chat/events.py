@@ -0,0 +1,40 @@
+from django.db import transaction
+
+from shared.pagination import encode_cursor
+from shared.pubsub import publish, user_channel, role_channel
+from .models import Conversation
+
+CHAT_MESSAGE_EVENT = 'chat_message'
+
+
+def message_channels(conversation_id):
+    """Everyone taking part in a conversation; support threads reach every admin"""
+    member_user_id, trainer_user_id = Conversation.objects.filter(pk=conversation_id).values_list(
+        'member__user_id', 'trainer__user_id'
+    ).first() or (None, None)
+    channels = [user_channel(user_id) for user_id in (member_user_id, trainer_user_id) if user_id]
+    if member_user_id is None or trainer_user_id is None:
+        channels.append(role_channel('admin'))
+    return channels
+
+
+def message_event(message):
+    return {
+        'conversation': message.conversation_id,
+        'message': {
+            'id': message.id,
+            'sender': message.sender_id,
+            'sender_name': message.sender.get_full_name(),
+            'content': "This message was deleted" if message.is_deleted else message.content,
+            'sent_at': message.sent_at,
+            'is_deleted': message.is_deleted,
+        },
+        # ?after= cursor of the conversation's message history right after this message
+        'after': encode_cursor([message.sent_at, message.id]),
+    }
+
+
+def publish_message(message):
+    """Push a new message to the conversation's participants once the transaction commits"""
+    data = message_event(message)
+    transaction.on_commit(lambda: publish(message_channels(message.conversation_id), CHAT_MESSAGE_EVENT, data))
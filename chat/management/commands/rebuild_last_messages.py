@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from chat.threads import refresh_last_messages
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the denormalized last message and preview of every conversation'
+
+    def handle(self, *args, **kwargs):
+        changed = refresh_last_messages()
+        self.stdout.write(self.style.SUCCESS(f'Updated {changed} conversations'))
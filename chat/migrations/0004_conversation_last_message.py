@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-17 17:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_last_messages(apps, schema_editor):
+    # Same values as chat.threads.refresh_last_messages, built from the historical models
+    Conversation = apps.get_model('chat', 'Conversation')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    latest = ChatMessage.objects.filter(conversation=OuterRef('pk')).order_by('-sent_at', '-id').values('id')[:1]
+    conversations = list(Conversation.objects.annotate(latest_id=Subquery(latest)).exclude(latest_id=None).only('id'))
+    messages = ChatMessage.objects.only('id', 'content', 'is_deleted').in_bulk([c.latest_id for c in conversations])
+    for conversation in conversations:
+        message = messages[conversation.latest_id]
+        conversation.last_message_id = message.id
+        if message.is_deleted:
+            conversation.last_message_preview = "This message was deleted"
+        else:
+            conversation.last_message_preview = message.content[:100] + ("..." if len(message.content) > 100 else "")
+    Conversation.objects.bulk_update(conversations, ['last_message', 'last_message_preview'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_chatmessage_is_deleted_conversation_deleted_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.chatmessage'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', max_length=120),
+        ),
+        migrations.RunPython(populate_last_messages, migrations.RunPython.noop),
+    ]
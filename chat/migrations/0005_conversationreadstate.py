@@ -0,0 +1,79 @@
+# Generated by Django 6.0 on 2026-10-17 18:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def populate_read_states(apps, schema_editor):
+    # A reader has read up to the newest message flagged read that someone else sent.
+    # is_read was shared by all participants, so every admin of a support thread inherits it.
+    Conversation = apps.get_model('chat', 'Conversation')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    ConversationReadState = apps.get_model('chat', 'ConversationReadState')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    read = {}
+    rows = ChatMessage.objects.filter(is_read=True).values_list('conversation_id', 'sender_id').annotate(last=Max('id')).order_by()
+    for conversation_id, sender_id, last in rows:
+        read.setdefault(conversation_id, {})[sender_id] = last
+    admin_ids = list(User.objects.filter(role='admin').values_list('id', flat=True))
+
+    states = []
+    conversations = Conversation.objects.filter(pk__in=read.keys()).values_list(
+        'id', 'member__user_id', 'trainer__user_id'
+    )
+    for conversation_id, member_user_id, trainer_user_id in conversations:
+        readers = {member_user_id, trainer_user_id} - {None}
+        if member_user_id is None or trainer_user_id is None:
+            readers.update(admin_ids)
+        by_sender = read[conversation_id]
+        for user_id in readers:
+            last = max((last for sender_id, last in by_sender.items() if sender_id != user_id), default=0)
+            if last:
+                states.append(ConversationReadState(user_id=user_id, conversation_id=conversation_id, last_read_message_id=last))
+    ConversationReadState.objects.bulk_create(states, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_conversation_last_message'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationReadState',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True)),
+                ('last_read_message_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['conversation', 'id'], name='chat_message_conv_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='conversationreadstate',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='chat.conversation'),
+        ),
+        migrations.AddField(
+            model_name='conversationreadstate',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='conversation_read_states', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='conversationreadstate',
+            constraint=models.UniqueConstraint(fields=('user', 'conversation'), name='unique_conversation_read_state'),
+        ),
+        migrations.RunPython(populate_read_states, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='chatmessage',
+            name='is_read',
+        ),
+    ]
@@ -7,6 +7,9 @@ class Conversation(BaseModel):
     member = models.ForeignKey('core.Member', on_delete=models.CASCADE, related_name='conversations', null=True, blank=True)
     trainer = models.ForeignKey('core.Trainer', on_delete=models.CASCADE, null=True, blank=True, related_name='conversations')
     last_message_at = models.DateTimeField(auto_now=True)
+    # Denormalized from the newest ChatMessage by chat.signals so listings need no per-row lookup
+    last_message = models.ForeignKey('ChatMessage', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_preview = models.CharField(max_length=120, blank=True, default='')
     deleted_by = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, related_name='deleted_conversations')
     
     class Meta:
@@ -26,16 +29,35 @@ class ChatMessage(BaseModel):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='chat_messages')
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_messages_sent')
     content = models.TextField()
-    is_read = models.BooleanField(default=False, db_index=True)
     sent_at = models.DateTimeField(auto_now_add=True, db_index=True)
     is_deleted = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['sent_at']
+        indexes = [
+            # Unread counts are id ranges past a reader's cursor within one conversation
+            models.Index(fields=['conversation', 'id'], name='chat_message_conv_id_idx'),
+            # Message history pages are (sent_at, id) ranges within one conversation
+            models.Index(fields=['conversation', 'sent_at', 'id'], name='chat_message_conv_sent_idx'),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.get_full_name()} at {self.sent_at}"
 
+class ConversationReadState(BaseModel):
+    """How far a user has read a conversation: every message with a higher id is unread for them"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversation_read_states', db_index=False)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='read_states')
+    last_read_message_id = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'conversation'], name='unique_conversation_read_state'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} read conversation {self.conversation_id} up to message {self.last_read_message_id}"
+
 class Message(BaseModel):
     recipient = models.ForeignKey('core.Member', on_delete=models.CASCADE, related_name='messages')
     type = models.CharField(max_length=50)
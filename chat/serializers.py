@@ -1,11 +1,13 @@
 from rest_framework import serializers
 from .models import Conversation, ChatMessage, Message
+from .threads import unread_messages
 from core.serializers import MemberSerializer, TrainerSerializer
 from users.serializers import UserSerializer
 
 class ChatMessageSerializer(serializers.ModelSerializer):
     sender_details = UserSerializer(source='sender', read_only=True)
     sender_name = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
     
     class Meta:
         model = ChatMessage
@@ -14,6 +16,11 @@ class ChatMessageSerializer(serializers.ModelSerializer):
     def get_sender_name(self, obj):
         return obj.sender.get_full_name()
 
+    def get_is_read(self, obj):
+        # Read once anyone other than the sender has read past it; read_cursors() in the context
+        cursors = self.context.get('read_cursors', {})
+        return any(last >= obj.id for user_id, last in cursors.items() if user_id != obj.sender_id)
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
         if instance.is_deleted:
@@ -39,19 +46,23 @@ class ConversationSerializer(serializers.ModelSerializer):
         return obj.trainer.user.get_full_name() if obj.trainer else "Gym Support"
 
     def get_last_message(self, obj):
-        last_msg = obj.chat_messages.order_by('-sent_at').first()
+        last_msg = obj.last_message
         if last_msg:
             return {
-                'content': last_msg.content,
+                # Kept shortened (and blanked for deleted messages) by chat.threads
+                'content': obj.last_message_preview,
                 'sent_at': last_msg.sent_at,
                 'sender_name': last_msg.sender.get_full_name()
             }
         return None
 
     def get_unread_count(self, obj):
+        # Listings annotate the count; a single conversation falls back to counting
+        if hasattr(obj, 'unread_count'):
+            return obj.unread_count
         request = self.context.get('request')
         if request and request.user:
-            return obj.chat_messages.filter(is_read=False).exclude(sender=request.user).count()
+            return unread_messages(request.user, obj).count()
         return 0
 
 class MessageSerializer(serializers.ModelSerializer):
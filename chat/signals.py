@@ -0,0 +1,26 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import ChatMessage
+from .threads import record_message, refresh_preview, refresh_last_messages
+from .events import publish_message
+
+
+@receiver(post_save, sender=ChatMessage)
+def sync_last_message_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        record_message(instance)
+        publish_message(instance)
+    else:
+        refresh_preview(instance)
+
+
+@receiver(post_delete, sender=ChatMessage)
+def sync_last_message_on_delete(sender, instance, origin=None, **kwargs):
+    # Messages removed with their conversation leave nothing to update
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is ChatMessage:
+        refresh_last_messages([instance.conversation_id])
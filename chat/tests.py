@@ -1,3 +1,437 @@
-from django.test import TestCase
+import asyncio
+import threading
+import time
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Member, Trainer
+from notifications.models import Notification
+from shared.pagination import encode_cursor
+from shared.pubsub import InProcessBroker, get_broker, user_channel
+from .events import CHAT_MESSAGE_EVENT
+from .models import Conversation, ChatMessage, ConversationReadState
+from .threads import DELETED_PREVIEW, PREVIEW_LENGTH, mark_read, unread_messages
+
+User = get_user_model()
+
+
+def make_user(name, role):
+    return User.objects.create_user(
+        email=f'{name}@example.com',
+        username=name,
+        password='password123',
+        first_name=name.title(),
+        last_name='Tester',
+        role=role
+    )
+
+
+class ChatTestCase(APITestCase):
+    def setUp(self):
+        self.admin = make_user('admin', 'admin')
+        self.member_user = make_user('member', 'member')
+        self.member = Member.objects.create(
+            user=self.member_user,
+            date_of_birth=date(1990, 1, 1),
+            gender='female',
+            address='1 Test Street',
+            join_date=timezone.now().date()
+        )
+        self.conversation = Conversation.objects.create(member=self.member)
+
+    def send(self, sender, count=1):
+        return [
+            ChatMessage.objects.create(conversation=self.conversation, sender=sender, content=f'Message {index}')
+            for index in range(count)
+        ]
+
+    def unread_count(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse('conversation-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {row['id']: row['unread_count'] for row in response.data['data']}[self.conversation.id]
+
+    def history(self, user, **params):
+        self.client.force_authenticate(user)
+        return self.client.get(reverse('conversation-detail', args=[self.conversation.id]), params)
+
+
+class ReadCursorTest(ChatTestCase):
+    def test_unread_count_leaves_out_own_messages(self):
+        self.send(self.admin, 3)
+        self.send(self.member_user, 2)
+        self.assertEqual(self.unread_count(self.member_user), 3)
+        self.assertEqual(self.unread_count(self.admin), 2)
+
+    def test_opening_a_conversation_marks_it_read(self):
+        self.send(self.admin, 3)
+        self.history(self.member_user)
+        self.assertEqual(self.unread_count(self.member_user), 0)
+
+        self.send(self.admin, 2)
+        self.assertEqual(self.unread_count(self.member_user), 2)
+        # The other side's count is untouched by the member reading
+        self.assertEqual(self.unread_count(self.admin), 0)
+
+    def test_single_conversation_count_matches_listing(self):
+        messages = self.send(self.admin, 4)
+        mark_read(self.member_user, self.conversation, messages[1].id)
+        self.assertEqual(unread_messages(self.member_user, self.conversation).count(), 2)
+        self.assertEqual(self.unread_count(self.member_user), 2)
+
+    def test_mark_read_never_moves_back(self):
+        messages = self.send(self.admin, 3)
+        mark_read(self.member_user, self.conversation, messages[2].id)
+        mark_read(self.member_user, self.conversation, messages[0].id)
+        state = ConversationReadState.objects.get(user=self.member_user, conversation=self.conversation)
+        self.assertEqual(state.last_read_message_id, messages[2].id)
+        self.assertEqual(self.unread_count(self.member_user), 0)
+
+    def test_mark_read_defaults_to_last_message(self):
+        mark_read(self.member_user, self.conversation)
+        self.assertFalse(ConversationReadState.objects.exists())
+
+        messages = self.send(self.admin, 2)
+        self.conversation.refresh_from_db()
+        mark_read(self.member_user, self.conversation)
+        state = ConversationReadState.objects.get(user=self.member_user, conversation=self.conversation)
+        self.assertEqual(state.last_read_message_id, messages[-1].id)
+
+    def test_is_read_follows_the_other_participants_cursor(self):
+        messages = self.send(self.admin, 2)
+        mark_read(self.member_user, self.conversation, messages[0].id)
+        results = self.history(self.admin).data['data']['results']
+        self.assertEqual([row['is_read'] for row in results], [True, False])
+
+
+class HistoryCursorTest(ChatTestCase):
+    def test_latest_page_then_older_pages(self):
+        messages = self.send(self.admin, 7)
+        ids = [message.id for message in messages]
+
+        data = self.history(self.member_user, page_size=3).data['data']
+        self.assertEqual([row['id'] for row in data['results']], ids[4:])
+        pages = [ids[4:]]
+        while data['before']:
+            data = self.history(self.member_user, page_size=3, before=data['before']).data['data']
+            pages.insert(0, [row['id'] for row in data['results']])
+        self.assertEqual(pages, [ids[:1], ids[1:4], ids[4:]])
+
+    def test_paging_back_does_not_move_the_read_cursor(self):
+        messages = self.send(self.admin, 5)
+        mark_read(self.member_user, self.conversation, messages[1].id)
+        before = encode_cursor([messages[3].sent_at, messages[3].id])
+        self.history(self.member_user, page_size=2, before=before)
+        self.assertEqual(self.unread_count(self.member_user), 3)
+
+    def test_only_delivered_messages_are_marked_read(self):
+        self.send(self.admin, 2)
+        after = self.history(self.member_user).data['data']['after']
+        newer = self.send(self.admin, 5)
+
+        data = self.history(self.member_user, page_size=2, after=after).data['data']
+        self.assertEqual([row['id'] for row in data['results']], [message.id for message in newer[:2]])
+        self.assertTrue(data['has_more'])
+        self.assertEqual(self.unread_count(self.member_user), 3)
+
+        data = self.history(self.member_user, page_size=5, after=data['after']).data['data']
+        self.assertEqual([row['id'] for row in data['results']], [message.id for message in newer[2:]])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(self.unread_count(self.member_user), 0)
+
+    def test_polling_with_nothing_new(self):
+        self.send(self.admin, 2)
+        after = self.history(self.member_user).data['data']['after']
+        data = self.history(self.member_user, after=after).data['data']
+        self.assertEqual((data['results'], data['after'], data['has_more']), ([], after, False))
+
+    def test_invalid_cursors(self):
+        self.send(self.admin, 2)
+        for params in (
+            {'before': 'not-a-cursor'},
+            {'after': encode_cursor([1])},
+            {'after': encode_cursor(['yesterday', 1])},
+            {'before': encode_cursor([1, 2]), 'after': encode_cursor([1, 2])},
+            {'page_size': 'all'},
+        ):
+            response = self.history(self.member_user, **params)
+            self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY, params)
+        self.assertEqual(self.unread_count(self.member_user), 2)
+
+    def test_other_members_cannot_read_the_conversation(self):
+        other = make_user('other', 'member')
+        Member.objects.create(
+            user=other, date_of_birth=date(1990, 1, 1), gender='male', address='2 Test Street', join_date=timezone.now().date()
+        )
+        self.send(self.admin)
+        self.assertEqual(self.history(other).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(ConversationReadState.objects.exists())
+
+
+class ConversationListingTest(ChatTestCase):
+    def listing(self, user):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('conversation-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {row['id']: row for row in response.data['data']}, len(queries)
+
+    def last_message(self):
+        return self.listing(self.member_user)[0][self.conversation.id]['last_message']
+
+    def test_query_count_does_not_grow_with_conversations(self):
+        self.send(self.admin, 2)
+        _, baseline = self.listing(self.admin)
+        for name in ('second', 'third'):
+            member = Member.objects.create(
+                user=make_user(name, 'member'), date_of_birth=date(1990, 1, 1), gender='male',
+                address='2 Test Street', join_date=timezone.now().date()
+            )
+            conversation = Conversation.objects.create(member=member)
+            ChatMessage.objects.create(conversation=conversation, sender=member.user, content='Hello')
+        rows, queries = self.listing(self.admin)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(queries, baseline)
+
+    def test_listing_shows_the_stored_preview(self):
+        message = ChatMessage.objects.create(conversation=self.conversation, sender=self.admin, content='x' * 150)
+        last = self.last_message()
+        self.assertEqual(last['content'], 'x' * PREVIEW_LENGTH + '...')
+        self.assertEqual(last['sender_name'], self.admin.get_full_name())
+
+        message.is_deleted = True
+        message.save()
+        self.assertEqual(self.last_message()['content'], DELETED_PREVIEW)
+
+    def test_removing_the_last_message_falls_back_to_the_previous_one(self):
+        first, second = self.send(self.admin, 2)
+        second.delete()
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message_id, first.id)
+        self.assertEqual(self.last_message()['content'], first.content)
+
+        first.delete()
+        self.conversation.refresh_from_db()
+        self.assertEqual((self.conversation.last_message_id, self.conversation.last_message_preview), (None, ''))
+        self.assertIsNone(self.last_message())
+
+
+class InProcessBrokerTest(APITestCase):
+    def setUp(self):
+        self.broker = InProcessBroker(backlog=3)
+
+    def wait(self, channels, cursor=None, timeout=None):
+        return async_to_sync(self.broker.wait)(channels, cursor, timeout=timeout)
+
+    def test_only_events_after_the_cursor_on_the_given_channels(self):
+        self.broker.publish('user:1', 'ping', {'n': 1})
+        events, cursor = self.wait(['user:1'])
+        self.assertEqual(events, [])
+
+        self.broker.publish('user:1', 'ping', {'n': 2})
+        self.broker.publish('user:2', 'ping', {'n': 3})
+        self.broker.publish('role:admin', 'ping', {'n': 4})
+        events, cursor = self.wait(['user:1', 'role:admin'], cursor)
+        self.assertEqual([(event.channel, event.data['n']) for event in events], [('user:1', 2), ('role:admin', 4)])
+        self.assertEqual(self.wait(['user:1', 'role:admin'], cursor), ([], cursor))
+
+    def test_a_reconnecting_client_catches_up_within_the_backlog(self):
+        _, cursor = self.wait(['user:1'])
+        for n in range(5):
+            self.broker.publish('user:1', 'ping', {'n': n})
+        events, _ = self.wait(['user:1'], cursor)
+        self.assertEqual([event.data['n'] for event in events], [2, 3, 4])
+
+    def test_resuming_from_an_event_cursor(self):
+        _, cursor = self.wait(['user:1'])
+        for n in range(3):
+            self.broker.publish('user:1', 'ping', {'n': n})
+        events, _ = self.wait(['user:1'], cursor)
+        events, _ = self.wait(['user:1'], events[0].cursor)
+        self.assertEqual([event.data['n'] for event in events], [1, 2])
+
+    def test_waiting_wakes_up_on_publish_from_another_thread(self):
+        async def wait_for_publish():
+            _, cursor = await self.broker.wait(['user:1'])
+            publisher = threading.Timer(0.05, self.broker.publish, args=('user:1', 'ping', {'n': 1}))
+            publisher.start()
+            started = time.monotonic()
+            events, _ = await self.broker.wait(['user:1'], cursor, timeout=5)
+            return events, time.monotonic() - started
+
+        events, waited = async_to_sync(wait_for_publish)()
+        self.assertEqual([event.data for event in events], [{'n': 1}])
+        self.assertLess(waited, 1)
+
+    def test_timeout_without_events_keeps_the_cursor(self):
+        _, cursor = self.wait(['user:1'])
+        self.assertEqual(self.wait(['user:1'], cursor, timeout=0.05), ([], cursor))
+
+    def test_unknown_cursors_start_from_now(self):
+        self.broker.publish('user:1', 'ping', {'n': 1})
+        for cursor in ('not-a-cursor', encode_cursor([99]), encode_cursor(['x'])):
+            events, resumed = self.wait(['user:1'], cursor)
+            self.assertEqual(events, [], cursor)
+        self.broker.publish('user:1', 'ping', {'n': 2})
+        events, _ = self.wait(['user:1'], resumed)
+        self.assertEqual([event.data['n'] for event in events], [2])
+
+
+class PushDeliveryTest(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        # A fresh in-process broker, without events from other tests
+        get_broker.cache_clear()
+        self.addCleanup(get_broker.cache_clear)
+
+    def poll(self, user, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse('chat-events-poll'), {'timeout': 0, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['data']
+
+    def send_committed(self, sender):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.send(sender)[0]
+
+    def test_messages_reach_the_participants_once_committed(self):
+        member_cursor = self.poll(self.member_user)['cursor']
+        admin_cursor = self.poll(self.admin)['cursor']
+        with self.captureOnCommitCallbacks() as callbacks:
+            message, = self.send(self.admin)
+            self.assertEqual(self.poll(self.member_user, cursor=member_cursor)['events'], [])
+        for callback in callbacks:
+            callback()
+
+        event, = self.poll(self.member_user, cursor=member_cursor)['events']
+        self.assertEqual(event['type'], CHAT_MESSAGE_EVENT)
+        self.assertEqual(event['data']['conversation'], self.conversation.id)
+        self.assertEqual((event['data']['message']['id'], event['data']['message']['content']), (message.id, 'Message 0'))
+        # A support conversation reaches every admin through the role channel
+        self.assertEqual(len(self.poll(self.admin, cursor=admin_cursor)['events']), 1)
+
+    def test_other_members_receive_nothing(self):
+        other = make_user('other', 'member')
+        cursor = self.poll(other)['cursor']
+        self.send_committed(self.admin)
+        self.assertEqual(self.poll(other, cursor=cursor)['events'], [])
+
+    def test_poll_resumes_from_the_last_cursor(self):
+        cursor = self.poll(self.member_user)['cursor']
+        first = self.send_committed(self.admin)
+        data = self.poll(self.member_user, cursor=cursor)
+        self.assertEqual([event['data']['message']['id'] for event in data['events']], [first.id])
+        second = self.send_committed(self.admin)
+        data = self.poll(self.member_user, cursor=data['cursor'])
+        self.assertEqual([event['data']['message']['id'] for event in data['events']], [second.id])
+
+    def test_invalid_timeout(self):
+        self.client.force_authenticate(self.member_user)
+        response = self.client.get(reverse('chat-events-poll'), {'timeout': 'soon'})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_event_stream_needs_the_asgi_server(self):
+        self.client.force_authenticate(self.member_user)
+        response = self.client.get(reverse('chat-events'), HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_event_stream_under_asgi(self):
+        async def read_stream(last_event_id=None):
+            client = AsyncClient()
+            await client.aforce_login(self.member_user)
+            headers = {'HTTP_LAST_EVENT_ID': last_event_id} if last_event_id else {}
+            response = await client.get(reverse('chat-events'), HTTP_ACCEPT='text/event-stream', **headers)
+            stream = aiter(response.streaming_content)
+            ready = (await anext(stream)).decode()
+            get_broker().publish(user_channel(self.member_user.id), CHAT_MESSAGE_EVENT, {'n': 1})
+            frame = (await asyncio.wait_for(anext(stream), 5)).decode()
+            await stream.aclose()
+            return response, ready, frame
+
+        response, ready, frame = async_to_sync(read_stream)()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('event: ready', ready)
+        self.assertIn(f'event: {CHAT_MESSAGE_EVENT}\ndata: {{"n": 1}}', frame)
+
+        # Reconnecting with the id of the ready frame replays what was published since
+        ready_id = ready.split('id: ')[1].split('\n')[0]
+        _, _, frame = async_to_sync(read_stream)(ready_id)
+        self.assertIn('data: {"n": 1}', frame)
+
+
+class InlineThread:
+    """Stands in for threading.Thread and runs the target on start(), so emails go out within the test"""
+    def __init__(self, target, args=(), kwargs=None):
+        self.target, self.args, self.kwargs = target, args, kwargs or {}
+
+    def start(self):
+        self.target(*self.args, **self.kwargs)
+
+
+class SupportFanOutTest(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        get_broker.cache_clear()
+        self.addCleanup(get_broker.cache_clear)
+        self.admins = [self.admin, make_user('admin2', 'admin')]
+
+    def post(self, user, content='Help with my plan'):
+        self.client.force_authenticate(user)
+        with mock.patch('notifications.utils.threading.Thread', InlineThread):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse('conversation-detail', args=[self.conversation.id]), {'content': content}, format='json'
+                )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response
+
+    def test_support_message_notifies_every_admin_once(self):
+        cursors = {admin.id: async_to_sync(get_broker().wait)([user_channel(admin.id)])[1] for admin in self.admins}
+        self.conversation.deleted_by.add(self.admin, self.member_user)
+        self.post(self.member_user)
+
+        notifications = Notification.objects.order_by('recipient_id')
+        self.assertEqual([notification.recipient_id for notification in notifications], [admin.id for admin in self.admins])
+        self.assertEqual({notification.title for notification in notifications}, {'New Support Message from Member Tester'})
+        self.assertTrue(all(notification.email_sent for notification in notifications))
+        self.assertEqual(sorted(email.to[0] for email in mail.outbox), sorted(admin.email for admin in self.admins))
+        # The sender and the admin who had deleted the conversation see it again
+        self.assertFalse(self.conversation.deleted_by.exists())
+        for admin in self.admins:
+            events, _ = async_to_sync(get_broker().wait)([user_channel(admin.id)], cursors[admin.id])
+            self.assertEqual([event.type for event in events], ['notification'])
+
+    def test_query_count_does_not_grow_with_admins(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.post(self.member_user)
+        baseline = len(queries)
+        for n in range(5):
+            make_user(f'extra{n}', 'admin')
+        with CaptureQueriesContext(connection) as queries:
+            self.post(self.member_user)
+        self.assertEqual(len(queries), baseline)
+        self.assertEqual(Notification.objects.count(), 2 + 7)
+
+    def test_direct_conversation_notifies_the_other_participant(self):
+        trainer = Trainer.objects.create(user=make_user('trainer', 'trainer'), hire_date=date(2020, 1, 1))
+        self.conversation.trainer = trainer
+        self.conversation.save()
+        self.post(self.member_user)
+        notification, = Notification.objects.all()
+        self.assertEqual((notification.recipient, notification.title), (trainer.user, 'New Message from Member Tester'))
+
+        self.post(self.admin, 'x' * 150)
+        self.assertEqual(
+            Notification.objects.filter(recipient=trainer.user).latest('id').message, 'x' * 100 + '...'
+        )
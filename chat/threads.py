@@ -0,0 +1,111 @@
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Conversation, ChatMessage, ConversationReadState
+
+PREVIEW_LENGTH = 100
+DELETED_PREVIEW = "This message was deleted"
+
+
+def preview(message):
+    """Short form of a message for conversation listings"""
+    if message.is_deleted:
+        return DELETED_PREVIEW
+    content = message.content
+    return content[:PREVIEW_LENGTH] + ("..." if len(content) > PREVIEW_LENGTH else "")
+
+
+def record_message(message):
+    """Point a conversation at a newly sent message (single UPDATE)"""
+    now = timezone.now()
+    Conversation.objects.filter(pk=message.conversation_id).update(
+        last_message=message,
+        last_message_preview=preview(message),
+        last_message_at=message.sent_at or now,
+        updated_at=now
+    )
+
+
+def refresh_preview(message):
+    """Rewrite the preview if this is its conversation's last message (e.g. after a delete)"""
+    Conversation.objects.filter(pk=message.conversation_id, last_message=message).update(
+        last_message_preview=preview(message)
+    )
+
+
+def refresh_last_messages(conversation_ids=None):
+    """Recompute last_message and its preview from the messages table (all conversations when None)"""
+    latest = ChatMessage.objects.filter(conversation=OuterRef('pk')).order_by('-sent_at', '-id').values('id')[:1]
+    conversations = Conversation.objects.all()
+    if conversation_ids is not None:
+        conversations = conversations.filter(pk__in=conversation_ids)
+    conversations = list(conversations.annotate(latest_id=Subquery(latest)).only('id', 'last_message', 'last_message_preview'))
+    messages = ChatMessage.objects.only('id', 'content', 'is_deleted').in_bulk(
+        [conversation.latest_id for conversation in conversations if conversation.latest_id]
+    )
+
+    changed = []
+    for conversation in conversations:
+        message = messages.get(conversation.latest_id)
+        values = (message.id, preview(message)) if message else (None, '')
+        if (conversation.last_message_id, conversation.last_message_preview) != values:
+            conversation.last_message_id, conversation.last_message_preview = values
+            changed.append(conversation)
+    with transaction.atomic():
+        Conversation.objects.bulk_update(changed, ['last_message', 'last_message_preview'], batch_size=1000)
+    return len(changed)
+
+
+def mark_read(user, conversation, message_id=None):
+    """
+    Move user's read cursor forward to message_id (default: the conversation's last message),
+    without touching the messages. The cursor never moves back, so overlapping requests
+    cannot mark read messages unread again.
+    """
+    message_id = message_id or conversation.last_message_id
+    if message_id is None:
+        return
+    states = ConversationReadState.objects.filter(user=user, conversation=conversation)
+    if states.filter(last_read_message_id__lt=message_id).update(last_read_message_id=message_id, updated_at=timezone.now()):
+        return
+    state, created = ConversationReadState.objects.get_or_create(
+        user=user, conversation=conversation, defaults={'last_read_message_id': message_id}
+    )
+    if not created and state.last_read_message_id < message_id:
+        # Created concurrently between the UPDATE and the get, with an older cursor
+        states.filter(last_read_message_id__lt=message_id).update(last_read_message_id=message_id, updated_at=timezone.now())
+
+
+def read_cursors(conversation):
+    """{user_id: last read message id} of everyone who opened the conversation"""
+    return dict(conversation.read_states.values_list('user_id', 'last_read_message_id'))
+
+
+def _read_cursor(user, conversation_ref):
+    return Coalesce(
+        Subquery(
+            ConversationReadState.objects.filter(user=user, conversation=conversation_ref).values('last_read_message_id')[:1]
+        ),
+        0
+    )
+
+
+def unread_messages(user, conversation):
+    """Messages of conversation sent by others after user's read cursor"""
+    return conversation.chat_messages.filter(id__gt=_read_cursor(user, conversation)).exclude(sender=user)
+
+
+def unread_count_subquery(user):
+    """Messages of the outer conversation that user has not read, for .annotate()"""
+    unread = ChatMessage.objects.filter(
+        conversation=OuterRef('pk'), id__gt=_read_cursor(user, OuterRef(OuterRef('pk')))
+    ).exclude(sender=user)
+    return Coalesce(
+        Subquery(
+            unread.order_by().values('conversation').annotate(total=Count('id')).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
@@ -1,5 +1,6 @@
 from django.urls import path
 from .views import ConversationListView, ConversationDetailView, MemberListForChatView, MessageListView, ChatMessageDeleteView
+from .async_views import AsyncEventStreamView, AsyncEventPollView
 
 urlpatterns = [
     path('conversations/', ConversationListView.as_view(), name='conversation-list'),
@@ -7,4 +8,7 @@ urlpatterns = [
     path('messages/<int:message_id>/delete/', ChatMessageDeleteView.as_view(), name='message-delete'),
     path('members/', MemberListForChatView.as_view(), name='chat-member-list'),
     path('list/', MessageListView.as_view(), name='message-list-all'),
+    # Push delivery of new messages and notifications (stream needs ASGI; poll works anywhere)
+    path('events/', AsyncEventStreamView.as_view(), name='chat-events'),
+    path('events/poll/', AsyncEventPollView.as_view(), name='chat-events-poll'),
 ]
@@ -1,11 +1,14 @@
 from rest_framework import status, views
 from rest_framework.response import Response
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from .models import Conversation, ChatMessage, Message
 from .serializers import ConversationSerializer, ChatMessageSerializer, MessageSerializer
+from .threads import unread_count_subquery, mark_read, read_cursors
 from core.models import Member, Trainer
-from core.serializers import MemberSerializer
+from core.serializers import MemberSerializer, prefetch_active_plan
 from shared.permissions import IsAdminUser
+from shared.pagination import keyset_page, parse_page_size, encode_cursor
 from rest_framework.permissions import IsAuthenticated
 from shared.responses import (
     handle_success,
@@ -13,7 +16,9 @@ from shared.responses import (
     handle_validation_error,
     handle_not_found,
 )
-from notifications.models import Notification
+from notifications.utils import notify
+from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Q
 
 class ConversationListView(views.APIView):
@@ -23,22 +28,27 @@ class ConversationListView(views.APIView):
     def get(self, request):
         user = request.user
         if user.role == 'admin':
-            conversations = Conversation.objects.filter(Q(member__isnull=True) | Q(trainer__isnull=True)).exclude(deleted_by=user).select_related('member__user', 'trainer__user').prefetch_related('chat_messages__sender')
+            conversations = Conversation.objects.filter(Q(member__isnull=True) | Q(trainer__isnull=True)).exclude(deleted_by=user)
         elif user.role == 'member':
             try:
                 member = Member.objects.get(user=user)
-                conversations = Conversation.objects.filter(member=member).exclude(deleted_by=user).select_related('member__user', 'trainer__user').prefetch_related('chat_messages__sender')
+                conversations = Conversation.objects.filter(member=member).exclude(deleted_by=user)
             except Member.DoesNotExist:
                 return handle_error(message="Member profile not found", status_code=status.HTTP_404_NOT_FOUND)
         elif user.role == 'trainer':
              try:
                 trainer = Trainer.objects.get(user=user)
-                conversations = Conversation.objects.filter(trainer=trainer).exclude(deleted_by=user).select_related('member__user', 'trainer__user').prefetch_related('chat_messages__sender')
+                conversations = Conversation.objects.filter(trainer=trainer).exclude(deleted_by=user)
              except Trainer.DoesNotExist:
                 return handle_error(message="Trainer profile not found", status_code=status.HTTP_404_NOT_FOUND)
         else:
             return handle_error(message="Unauthorized", status_code=status.HTTP_403_FORBIDDEN)
-        
+
+        conversations = conversations.select_related(
+            'member__user', 'trainer__user', 'last_message__sender'
+        ).prefetch_related('deleted_by', prefetch_active_plan('member__')).annotate(
+            unread_count=unread_count_subquery(user)
+        )
         serializer = ConversationSerializer(conversations, many=True, context={'request': request})
         return handle_success(data=serializer.data, message="Conversations retrieved successfully")
 
@@ -84,8 +94,25 @@ class ConversationListView(views.APIView):
 class ConversationDetailView(views.APIView):
     permission_classes = [IsAuthenticated]
 
-    @swagger_auto_schema(tags=['Chat'], operation_summary='Get conversation messages')
+    @swagger_auto_schema(
+        tags=['Chat'],
+        operation_summary='Get conversation messages, one page at a time',
+        manual_parameters=[
+            openapi.Parameter('before', openapi.IN_QUERY, description="'before' cursor of a previous page, to load older messages", type=openapi.TYPE_STRING),
+            openapi.Parameter('after', openapi.IN_QUERY, description="'after' cursor of a previous page, to load newer messages", type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Messages per page (default 50, max 200)", type=openapi.TYPE_INTEGER),
+        ]
+    )
     def get(self, request, conversation_id):
+        params = request.query_params
+        before, after = params.get('before'), params.get('after')
+        if before and after:
+            return handle_validation_error(errors={'detail': 'Pass either before or after, not both'})
+        try:
+            page_size = parse_page_size(params)
+        except ValueError as e:
+            return handle_validation_error(errors={'detail': str(e)})
+
         try:
             conversation = Conversation.objects.get(id=conversation_id)
         except Conversation.DoesNotExist:
@@ -111,17 +138,42 @@ class ConversationDetailView(views.APIView):
         
         # If user has deleted this conversation, return empty messages
         if user in conversation.deleted_by.all():
-            return handle_success(data=[], message="Messages retrieved successfully")
-        
-        conversation.chat_messages.filter(is_read=False).exclude(sender=user).update(is_read=True)
-        messages = conversation.chat_messages.select_related('sender').all()
-        serializer = ChatMessageSerializer(messages, many=True)
-        return handle_success(data=serializer.data, message="Messages retrieved successfully")
+            data = {'results': [], 'before': None, 'after': after, 'has_more': False, 'page_size': page_size}
+            return handle_success(data=data, message="Messages retrieved successfully")
+
+        # Pages are keyed on (sent_at, id) and served by chat_message_conv_sent_idx. Without a
+        # cursor the latest messages are returned; results are always oldest first.
+        messages = conversation.chat_messages.select_related('sender')
+        try:
+            if after:
+                page, more = keyset_page(messages, ['sent_at', 'id'], after, page_size)
+            else:
+                page, more = keyset_page(messages, ['-sent_at', '-id'], before, page_size)
+                page.reverse()
+        except ValueError as e:
+            return handle_validation_error(errors={'detail': str(e)})
+
+        if page and not before:
+            # Only what this response delivers counts as read (has_more pages are still
+            # unseen); scrolling back through history does not move the read cursor
+            mark_read(user, conversation, page[-1].id)
+        serializer = ChatMessageSerializer(page, many=True, context={'read_cursors': read_cursors(conversation)})
+        data = {
+            'results': serializer.data,
+            # Older messages remain before the first one returned (unknown, and already loaded, when paging forward)
+            'before': more if not after else None,
+            # Poll with this to receive messages sent after the last one returned
+            'after': encode_cursor([page[-1].sent_at, page[-1].id]) if page else after,
+            # More newer messages are waiting beyond this page
+            'has_more': bool(more) if after else False,
+            'page_size': page_size
+        }
+        return handle_success(data=data, message="Messages retrieved successfully")
 
     @swagger_auto_schema(tags=['Chat'], operation_summary='Send a message')
     def post(self, request, conversation_id):
         try:
-            conversation = Conversation.objects.get(id=conversation_id)
+            conversation = Conversation.objects.select_related('member__user', 'trainer__user').get(id=conversation_id)
         except Conversation.DoesNotExist:
             return handle_not_found(message="Conversation not found")
         
@@ -147,71 +199,36 @@ class ConversationDetailView(views.APIView):
             except Trainer.DoesNotExist:
                  return handle_not_found(message="Trainer profile not found")
         
-        # If user previously deleted this conversation, restore it when they send a new message
-        if user in conversation.deleted_by.all():
-            conversation.deleted_by.remove(user)
-        
-        message = ChatMessage.objects.create(
-            conversation=conversation,
-            sender=user,
-            content=content
-        )
-        
-        recipient = None
-        if user.role == 'member':
-            if conversation.trainer:
-                recipient = conversation.trainer.user
-            else:
-                # Support conversation - restore for all admins who deleted it
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-                admins = User.objects.filter(role='admin')
-                for admin in admins:
-                    # Restore conversation for admin if they deleted it
-                    if admin in conversation.deleted_by.all():
-                        conversation.deleted_by.remove(admin)
-                    
-                    Notification.objects.create(
-                        recipient=admin,
-                        title=f"New Support Message from {user.get_full_name()}",
-                        message=content[:100] + ("..." if len(content) > 100 else "")
-                    )
-        elif user.role == 'trainer':
-            if conversation.member:
-                recipient = conversation.member.user
-            else:
-                # Support conversation - restore for all admins who deleted it
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-                admins = User.objects.filter(role='admin')
-                for admin in admins:
-                    # Restore conversation for admin if they deleted it
-                    if admin in conversation.deleted_by.all():
-                        conversation.deleted_by.remove(admin)
-                    
-                    Notification.objects.create(
-                        recipient=admin,
-                        title=f"New Staff Message from {user.get_full_name()}",
-                        message=content[:100] + ("..." if len(content) > 100 else "")
-                    )
-        elif user.role == 'admin':
-             if conversation.trainer:
-                 recipient = conversation.trainer.user
-             elif conversation.member:
-                 recipient = conversation.member.user
-        
-        if recipient:
-            # Also restore conversation for recipient if they had deleted it
-            if recipient in conversation.deleted_by.all():
-                conversation.deleted_by.remove(recipient)
-            
-            Notification.objects.create(
-                recipient=recipient,
-                title=f"New Message from {user.get_full_name()}",
-                message=content[:100] + ("..." if len(content) > 100 else "")
+        with transaction.atomic():
+            message = ChatMessage.objects.create(
+                conversation=conversation,
+                sender=user,
+                content=content
             )
-        
-        conversation.save()
+
+            # The other participant, or every admin for a member's or trainer's support conversation
+            title = f"New Message from {user.get_full_name()}"
+            if user.role == 'admin':
+                participant = conversation.trainer or conversation.member
+                recipients = [participant.user] if participant else []
+            elif user.role == 'member' and conversation.trainer:
+                recipients = [conversation.trainer.user]
+            elif user.role == 'trainer' and conversation.member:
+                recipients = [conversation.member.user]
+            elif user.role in ('member', 'trainer'):
+                recipients = list(get_user_model().objects.filter(role='admin'))
+                kind = "Support" if user.role == 'member' else "Staff"
+                title = f"New {kind} Message from {user.get_full_name()}"
+            else:
+                recipients = []
+
+            # Restore the conversation for the sender and everyone notified who had deleted it, in one DELETE
+            Conversation.deleted_by.through.objects.filter(
+                conversation=conversation, user_id__in={user.id, *(recipient.id for recipient in recipients)}
+            ).delete()
+            notify(recipients, title, content[:100] + ("..." if len(content) > 100 else ""))
+
+        # last_message_at and the last message itself are moved forward by chat.signals
         serializer = ChatMessageSerializer(message)
         return handle_success(data=serializer.data, message="Message sent successfully", status_code=status.HTTP_201_CREATED)
 
@@ -2,6 +2,11 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Besides the regular API it serves the long-lived push connections of
+chat/events/ (server-sent events), which only run under ASGI; see chat.async_views.
+Run it with uvicorn:
+
+    uvicorn config.asgi:application --host 0.0.0.0 --workers 4
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -108,6 +108,34 @@ DATABASES = {
     )
 }
 
+# Cache
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared backend in production
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'gym-flow'),
+    }
+}
+
+# Seconds admin stats responses stay cached (0 disables caching)
+STATS_CACHE_TTL = int(os.environ.get('STATS_CACHE_TTL', 300))
+
+# Seconds a kiosk check-in eligibility entry is trusted. Changes refresh the entry only in the
+# process that made them, so with a per-process cache this is how long other workers can lag
+KIOSK_CACHE_TTL = int(os.environ.get('KIOSK_CACHE_TTL', 60))
+
+# Attendance records older than this many days (rounded down to whole months) are moved to
+# the archive table by `archive_attendance`
+ATTENDANCE_ARCHIVE_AFTER_DAYS = int(os.environ.get('ATTENDANCE_ARCHIVE_AFTER_DAYS', 730))
+
+# Visits still open this many hours after check-in are closed by `auto_check_out`
+ATTENDANCE_AUTO_CHECKOUT_HOURS = int(os.environ.get('ATTENDANCE_AUTO_CHECKOUT_HOURS', 4))
+
+# Pub/sub behind the chat event stream. The in-process broker only reaches clients connected to
+# the same server process; set 'shared.pubsub.RedisBroker' and PUSH_BROKER_URL when running several
+PUSH_BROKER = os.environ.get('PUSH_BROKER', 'shared.pubsub.InProcessBroker')
+PUSH_BROKER_URL = os.environ.get('PUSH_BROKER_URL', '')
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -153,6 +181,7 @@ AUTH_USER_MODEL = 'users.User'
 
 # CORS
 CORS_ALLOW_ALL_ORIGINS = True  # For development
+CORS_EXPOSE_HEADERS = ['X-Cache']
 
 # DRF
 REST_FRAMEWORK = {
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.rosters import refresh_trainer_clients
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the trainer-client link table from member assignments and sessions'
+
+    def handle(self, *args, **kwargs):
+        links = refresh_trainer_clients()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {links} trainer-client links'))
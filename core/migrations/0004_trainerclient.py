@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-17 13:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_trainer_clients(apps, schema_editor):
+    # Same links as core.rosters.refresh_trainer_clients, built from the historical models
+    Member = apps.get_model('core', 'Member')
+    Session = apps.get_model('scheduling', 'Session')
+    TrainerClient = apps.get_model('core', 'TrainerClient')
+    links = {}
+    for trainer_id, member_id in Member.objects.exclude(assigned_trainer=None).values_list('assigned_trainer_id', 'id'):
+        links[(trainer_id, member_id)] = (True, 0)
+    counts = Session.objects.exclude(status='cancelled').values_list('trainer_id', 'member_id').annotate(total=Count('id')).order_by()
+    for trainer_id, member_id, total in counts:
+        links[(trainer_id, member_id)] = (links.get((trainer_id, member_id), (False, 0))[0], total)
+    TrainerClient.objects.bulk_create([
+        TrainerClient(trainer_id=trainer_id, member_id=member_id, is_assigned=assigned, active_sessions=total)
+        for (trainer_id, member_id), (assigned, total) in links.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_member_last_attended_on'),
+        ('scheduling', '0002_alter_session_start_time_alter_session_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainerClient',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True)),
+                ('is_assigned', models.BooleanField(default=False)),
+                ('active_sessions', models.IntegerField(default=0)),
+                ('member', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='trainer_links', to='core.member')),
+                ('trainer', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='client_links', to='core.trainer')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['member', 'trainer'], name='trainer_client_member_idx')],
+                'constraints': [models.UniqueConstraint(fields=('trainer', 'member'), name='unique_trainer_client')],
+            },
+        ),
+        migrations.RunPython(populate_trainer_clients, migrations.RunPython.noop),
+    ]
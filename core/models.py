@@ -22,10 +22,38 @@ class Member(BaseModel):
     join_date = models.DateField()
     assigned_trainer = models.ForeignKey(Trainer, on_delete=models.SET_NULL, null=True, blank=True, related_name='members')
     notes = models.TextField(blank=True, null=True)
+    last_attended_on = models.DateField(null=True, blank=True)  # Denormalized max(attendance.date)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'last_attended_on'], name='member_status_last_visit_idx'),
+        ]
 
     def __str__(self):
         return f"Member: {self.user.email}"
 
+class TrainerClient(BaseModel):
+    """
+    A member a trainer works with: assigned to them, or holding an uncancelled session
+    with them. Maintained by core.signals and rebuilt by rebuild_trainer_clients.
+    """
+    trainer = models.ForeignKey(Trainer, on_delete=models.CASCADE, related_name='client_links', db_index=False)
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='trainer_links', db_index=False)
+    is_assigned = models.BooleanField(default=False)
+    active_sessions = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves trainer -> clients lookups
+            models.UniqueConstraint(fields=['trainer', 'member'], name='unique_trainer_client'),
+        ]
+        indexes = [
+            models.Index(fields=['member', 'trainer'], name='trainer_client_member_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.trainer} -> {self.member}"
+
 class GymSetting(BaseModel):
     gym_name = models.CharField(max_length=200, default='Gym Flow')
     address = models.TextField(default='123 Fitness Blvd, Workout City')
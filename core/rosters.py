@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.models import Count
+
+from scheduling.models import Session
+from .models import Member, TrainerClient
+
+
+def _compute_links(pairs=None):
+    """{(trainer_id, member_id): (is_assigned, active_sessions)} from members and sessions"""
+    members = Member.objects.exclude(assigned_trainer=None)
+    sessions = Session.objects.exclude(status='cancelled')
+    if pairs is not None:
+        members = members.filter(pk__in={member_id for _, member_id in pairs})
+        sessions = sessions.filter(
+            trainer_id__in={trainer_id for trainer_id, _ in pairs},
+            member_id__in={member_id for _, member_id in pairs}
+        )
+
+    links = {}
+    for trainer_id, member_id in members.values_list('assigned_trainer_id', 'id'):
+        links[(trainer_id, member_id)] = (True, 0)
+    counts = sessions.values_list('trainer_id', 'member_id').annotate(total=Count('id')).order_by()
+    for trainer_id, member_id, total in counts:
+        assigned, _ = links.get((trainer_id, member_id), (False, 0))
+        links[(trainer_id, member_id)] = (assigned, total)
+    if pairs is not None:
+        links = {pair: value for pair, value in links.items() if pair in pairs}
+    return links
+
+
+def refresh_trainer_clients(pairs=None):
+    """
+    Recompute the TrainerClient rows of the given (trainer_id, member_id) pairs,
+    or rebuild the whole table when pairs is None. Returns the number of links kept.
+    """
+    if pairs is not None:
+        pairs = {(trainer_id, member_id) for trainer_id, member_id in pairs if trainer_id and member_id}
+        if not pairs:
+            return 0
+    links = _compute_links(pairs)
+
+    with transaction.atomic():
+        if pairs is None:
+            TrainerClient.objects.all().delete()
+        else:
+            stale = pairs - links.keys()
+            for trainer_id, member_id in stale:
+                TrainerClient.objects.filter(trainer_id=trainer_id, member_id=member_id).delete()
+        TrainerClient.objects.bulk_create(
+            [
+                TrainerClient(trainer_id=trainer_id, member_id=member_id, is_assigned=assigned, active_sessions=total)
+                for (trainer_id, member_id), (assigned, total) in links.items()
+            ],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['trainer', 'member'],
+            update_fields=['is_assigned', 'active_sessions', 'updated_at'],
+        )
+    return len(links)
+
+
+def client_members(trainer):
+    """Members a trainer works with, as one indexed join on the link table"""
+    return Member.objects.filter(trainer_links__trainer=trainer)
+
+
+def is_client(trainer, member_id):
+    return TrainerClient.objects.filter(trainer=trainer, member_id=member_id).exists()
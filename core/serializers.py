@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from django.db.models import Prefetch
 from .models import Trainer, Member, GymSetting
 from users.serializers import UserSerializer
 
@@ -23,15 +24,27 @@ class MemberSerializer(serializers.ModelSerializer):
     class Meta:
         model = Member
         fields = '__all__'
+        read_only_fields = ['last_attended_on']
 
     def get_active_plan(self, obj):
         # We'll use string-based check or import from subscriptions if needed
         # For now, to avoid circular imports, we check via reverse relation
-        active_sub = obj.subscriptions.filter(status='active').first()
+        # Set by prefetch_active_plan() in list views
+        if hasattr(obj, 'active_subscriptions'):
+            active_sub = obj.active_subscriptions[0] if obj.active_subscriptions else None
+        else:
+            active_sub = obj.subscriptions.filter(status='active').first()
         if active_sub and active_sub.plan:
             return active_sub.plan.name
         return "No Active Plan"
 
+def prefetch_active_plan(prefix=''):
+    """Prefetch for MemberSerializer.active_plan, so serializing many members costs one query"""
+    subscriptions = Member.subscriptions.rel.related_model.objects.filter(
+        status='active'
+    ).select_related('plan').order_by('pk')
+    return Prefetch(f'{prefix}subscriptions', queryset=subscriptions, to_attr='active_subscriptions')
+
 class GymSettingSerializer(serializers.ModelSerializer):
     class Meta:
         model = GymSetting
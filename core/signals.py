@@ -0,0 +1,61 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from scheduling.models import Session
+from .models import Member
+from .rosters import refresh_trainer_clients
+
+
+def _deleted_directly(origin, model):
+    # Links of a deleted member or trainer go with it through the cascade
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is model
+
+
+@receiver(post_init, sender=Member)
+def remember_assigned_trainer(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred field is never fetched just for the snapshot
+    instance._loaded_trainer_id = instance.__dict__.get('assigned_trainer_id')
+
+
+@receiver(post_save, sender=Member)
+def sync_trainer_clients_on_member_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance._loaded_trainer_id
+    if created or previous != instance.assigned_trainer_id:
+        refresh_trainer_clients({(previous, instance.id), (instance.assigned_trainer_id, instance.id)})
+    instance._loaded_trainer_id = instance.assigned_trainer_id
+
+
+def _session_pair(values):
+    return (values['trainer_id'], values['member_id'])
+
+
+def _session_snapshot(instance):
+    return {field: instance.__dict__.get(field) for field in ('trainer_id', 'member_id', 'status')}
+
+
+@receiver(post_init, sender=Session)
+def remember_session_values(sender, instance, **kwargs):
+    instance._loaded_values = _session_snapshot(instance)
+
+
+@receiver(post_save, sender=Session)
+def sync_trainer_clients_on_session_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous, current = instance._loaded_values, _session_snapshot(instance)
+    # Only booking, cancelling (or un-cancelling) and reassignment change a link
+    was_active = previous['status'] != 'cancelled'
+    is_active = current['status'] != 'cancelled'
+    if created or _session_pair(previous) != _session_pair(current) or was_active != is_active:
+        refresh_trainer_clients({_session_pair(previous), _session_pair(current)})
+    instance._loaded_values = current
+
+
+@receiver(post_delete, sender=Session)
+def sync_trainer_clients_on_session_delete(sender, instance, origin=None, **kwargs):
+    if _deleted_directly(origin, Session):
+        refresh_trainer_clients({(instance.trainer_id, instance.member_id)})
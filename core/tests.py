@@ -1,3 +1,131 @@
-from django.test import TestCase
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from scheduling.models import Session
+from .models import Member, Trainer, TrainerClient
+from .rosters import refresh_trainer_clients
+
+User = get_user_model()
+
+
+def make_user(name, role):
+    return User.objects.create_user(
+        email=f'{name}@example.com',
+        username=name,
+        password='password123',
+        first_name=name.title(),
+        last_name='Tester',
+        role=role
+    )
+
+
+def make_trainer(name):
+    return Trainer.objects.create(user=make_user(name, 'trainer'), hire_date=date(2020, 1, 1))
+
+
+def make_member(name, trainer=None):
+    return Member.objects.create(
+        user=make_user(name, 'member'),
+        date_of_birth=date(1990, 1, 1),
+        gender='female',
+        address='1 Test Street',
+        join_date=timezone.now().date(),
+        assigned_trainer=trainer
+    )
+
+
+class TrainerRosterTest(APITestCase):
+    def setUp(self):
+        self.trainer = make_trainer('trainer')
+        self.other_trainer = make_trainer('other')
+        self.member = make_member('member')
+
+    def links(self):
+        return {
+            (link.trainer_id, link.member_id): (link.is_assigned, link.active_sessions)
+            for link in TrainerClient.objects.all()
+        }
+
+    def book(self, trainer, status='pending'):
+        start = timezone.now() + timedelta(days=1)
+        return Session.objects.create(
+            trainer=trainer, member=self.member, start_time=start, end_time=start + timedelta(hours=1), status=status
+        )
+
+    def assertLinksMatchRebuild(self):
+        incremental = self.links()
+        refresh_trainer_clients()
+        self.assertEqual(incremental, self.links())
+
+    def test_assignment_moves_the_link(self):
+        self.member.assigned_trainer = self.trainer
+        self.member.save()
+        self.assertEqual(self.links(), {(self.trainer.id, self.member.id): (True, 0)})
+
+        self.member.assigned_trainer = self.other_trainer
+        self.member.save()
+        self.assertEqual(self.links(), {(self.other_trainer.id, self.member.id): (True, 0)})
+
+        self.member.assigned_trainer = None
+        self.member.save()
+        self.assertEqual(self.links(), {})
+
+    def test_sessions_are_counted_until_cancelled(self):
+        first, second = self.book(self.trainer), self.book(self.trainer)
+        self.assertEqual(self.links(), {(self.trainer.id, self.member.id): (False, 2)})
+
+        first.status = 'cancelled'
+        first.save()
+        self.assertEqual(self.links(), {(self.trainer.id, self.member.id): (False, 1)})
+        second.status = 'cancelled'
+        second.save()
+        self.assertEqual(self.links(), {})
+
+        second.status = 'confirmed'
+        second.save()
+        self.assertEqual(self.links(), {(self.trainer.id, self.member.id): (False, 1)})
+        self.assertLinksMatchRebuild()
+
+    def test_cancelled_bookings_never_link(self):
+        self.book(self.trainer, status='cancelled')
+        self.assertEqual(self.links(), {})
+
+    def test_assigned_member_keeps_the_link_without_sessions(self):
+        self.member.assigned_trainer = self.trainer
+        self.member.save()
+        session = self.book(self.trainer)
+        self.assertEqual(self.links(), {(self.trainer.id, self.member.id): (True, 1)})
+        session.delete()
+        self.assertEqual(self.links(), {(self.trainer.id, self.member.id): (True, 0)})
+
+    def test_moving_a_session_to_another_trainer(self):
+        session = self.book(self.trainer)
+        session.trainer = self.other_trainer
+        session.save()
+        self.assertEqual(self.links(), {(self.other_trainer.id, self.member.id): (False, 1)})
+        self.assertLinksMatchRebuild()
+
+    def test_deleting_sessions_in_bulk(self):
+        self.book(self.trainer)
+        self.book(self.other_trainer)
+        Session.objects.filter(trainer=self.trainer).delete()
+        self.assertEqual(self.links(), {(self.other_trainer.id, self.member.id): (False, 1)})
+
+    def test_deleting_the_member_removes_its_links(self):
+        self.book(self.trainer)
+        self.member.delete()
+        self.assertEqual(self.links(), {})
+
+    def test_trainer_member_list_reads_the_roster(self):
+        assigned = make_member('assigned', trainer=self.trainer)
+        self.book(self.trainer)
+        make_member('unrelated', trainer=self.other_trainer)
+        self.client.force_authenticate(self.trainer.user)
+        response = self.client.get(reverse('trainer-member-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({row['id'] for row in response.data['data']}, {assigned.id, self.member.id})
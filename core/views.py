@@ -4,7 +4,7 @@ from drf_yasg.utils import swagger_auto_schema
 from .serializers import TrainerSerializer, MemberSerializer, GymSettingSerializer
 from .models import Trainer, Member, GymSetting
 from shared.permissions import IsAdminUser, IsAdminOrTrainer, IsTrainer, IsMember
-from django.db.models import Q
+from .rosters import client_members
 from rest_framework.permissions import IsAuthenticated
 from shared.responses import (
     handle_success,
@@ -98,9 +98,7 @@ class TrainerMemberListView(views.APIView):
         try:
             trainer = Trainer.objects.get(user=request.user)
             # Members assigned directly OR who have booked sessions with this trainer
-            members = Member.objects.filter(
-                Q(assigned_trainer=trainer) | Q(booked_sessions__trainer=trainer)
-            ).select_related('user').distinct()
+            members = client_members(trainer).select_related('user')
             serializer = MemberSerializer(members, many=True)
             return handle_success(data=serializer.data, message="Assigned members retrieved successfully")
         except Trainer.DoesNotExist:
@@ -0,0 +1,273 @@
+import json
+import statistics
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.utils import timezone
+
+BUDGETS_PATH = Path(__file__).resolve().parent / 'benchmark_budgets.json'
+# Timing budgets below this are dominated by noise rather than by the endpoint
+MIN_TIMING_BUDGET_MS = 10
+# Inside the benchmark's rolled-back transaction these replace BEGIN/COMMIT, so they are
+# timed but not counted as queries
+TRANSACTION_CONTROL = ('BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+# name, role of the requesting user, path
+ENDPOINTS = [
+    ('members', 'admin', '/api/members/'),
+    ('programs', 'admin', '/api/programs/'),
+    ('payments', 'admin', '/api/payments/'),
+    ('subscriptions', 'admin', '/api/subscriptions/'),
+    ('attendance', 'admin', '/api/attendance/'),
+    ('attendance_by_date', 'admin', '/api/attendance/?date={today}'),
+    ('attendance_expanded', 'admin', '/api/attendance/?expand=member&page_size=200'),
+    ('occupancy', 'trainer', '/api/attendance/occupancy/'),
+    ('sessions', 'admin', '/api/sessions/'),
+    ('conversations_admin', 'admin', '/api/chat/conversations/'),
+    ('conversations_member', 'member', '/api/chat/conversations/'),
+    ('conversation_messages', 'admin', '/api/chat/conversations/{conversation}/'),
+    ('notifications', 'member', '/api/notifications/'),
+    ('dashboard', 'admin', '/api/stats/dashboard/'),
+    ('reports', 'admin', '/api/stats/reports/'),
+    ('attendance_heatmap', 'admin', '/api/stats/attendance-heatmap/?from={year_ago}'),
+    ('dropouts', 'admin', '/api/stats/dropouts/'),
+    ('member_dashboard', 'member', '/api/stats/member-dashboard/'),
+    ('member_attendance_stats', 'member', '/api/stats/member-attendance/'),
+    ('member_attendance_calendar', 'member', '/api/attendance/calendar/'),
+    ('trainer_members', 'trainer', '/api/trainer/members/'),
+    ('trainer_attendance', 'trainer', '/api/trainer/attendance/'),
+]
+
+
+def benchmark_users():
+    """
+    One user per role to issue requests as. Prefers the generate_load_data
+    accounts and falls back to the first user of each role.
+    """
+    User = get_user_model()
+    users = {}
+    for role in ('admin', 'member', 'trainer'):
+        user = User.objects.filter(email=f'{role}0@load.gymflow.test').first()
+        if user is None:
+            user = User.objects.filter(role=role).order_by('id').first()
+        users[role] = user
+    return users
+
+
+def busiest_conversation():
+    """Id of the conversation with the most messages (0 when there are none)"""
+    from chat.models import ChatMessage
+    row = ChatMessage.objects.values('conversation').annotate(total=Count('id')).order_by('-total', 'conversation').first()
+    return row['conversation'] if row else 0
+
+
+@contextmanager
+def rolled_back():
+    """
+    Run the block in a transaction that is always rolled back, so a benchmark leaves the
+    database as it found it. On-commit work (signal follow-ups, cache updates) only runs
+    where the block uses run_on_commit.
+    """
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+@contextmanager
+def run_on_commit():
+    """
+    Run the on-commit callbacks registered inside the block when it ends, as a commit
+    would, including those the callbacks register themselves. Lets a benchmark inside
+    rolled_back() time a write together with the work it defers to commit.
+    """
+    start = len(connection.run_on_commit)
+    try:
+        yield
+    finally:
+        while len(connection.run_on_commit) > start:
+            callbacks = connection.run_on_commit[start:]
+            start = len(connection.run_on_commit)
+            for _, callback, _ in callbacks:
+                callback()
+
+
+class QueryTimer:
+    """Counts and times every query on the connection (no cap, unlike the debug query log)"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not sql.lstrip().upper().startswith(TRANSACTION_CONTROL):
+                self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def measure(client, path, iterations):
+    """Wall time, query count and DB time of a GET, after one warm-up request"""
+    response = client.get(path)
+    status_code = response.status_code
+    wall, db, queries = [], [], []
+    for _ in range(iterations):
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            response = client.get(path)
+            wall.append((time.perf_counter() - started) * 1000)
+        status_code = response.status_code
+        queries.append(timer.count)
+        db.append(timer.seconds * 1000)
+    return {
+        'status_code': status_code,
+        'queries': max(queries),
+        'wall_ms': round(statistics.median(wall), 2),
+        'wall_ms_max': round(max(wall), 2),
+        'db_ms': round(statistics.median(db), 2),
+    }
+
+
+def run_endpoints(iterations, context, only=None):
+    with rolled_back():
+        return _run_endpoints(iterations, context, only)
+
+
+def _run_endpoints(iterations, context, only):
+    # GETs may still write (sessions, chat read cursors)
+    users = benchmark_users()
+    clients = {}
+    results = {}
+    for name, role, path in ENDPOINTS:
+        if only and name not in only:
+            continue
+        user = users.get(role)
+        if user is None:
+            results[name] = {'skipped': f'no {role} user in the database'}
+            continue
+        if role not in clients:
+            clients[role] = Client()
+            clients[role].force_login(user)
+        results[name] = {'path': path.format(**context), **measure(clients[role], path.format(**context), iterations)}
+    return results
+
+
+KIOSK_CHECK_IN_PATH = '/api/attendance/kiosk/check-in/'
+
+
+def _p99(values):
+    return statistics.quantiles(values, n=100)[98] if len(values) > 1 else values[0]
+
+
+def run_kiosk(check_ins):
+    """
+    Time front-desk QR check-ins of active members who have not checked in today,
+    including the derived-table upkeep each one runs once it commits. Eligibility
+    entries and the occupancy counter are loaded first, as they stay cached in
+    steady state.
+    """
+    from attendance.kiosk import member_token, get_eligibility
+    from attendance.occupancy import current_occupancy
+    from core.models import Member
+
+    staff = benchmark_users().get('admin')
+    today = timezone.now().date()
+    member_ids = list(Member.objects.filter(
+        status='active',
+        subscriptions__status='active',
+        subscriptions__end_date__gte=today
+    ).exclude(attendance__date=today).values_list('id', flat=True).distinct().order_by('id')[:check_ins])
+    if staff is None or len(member_ids) < 2:
+        return {'kiosk_check_in': {'skipped': 'needs an admin and at least two members who can check in'}}
+
+    for member_id in member_ids:
+        get_eligibility(member_id)
+    current_occupancy()
+    warm_up, *tokens = [member_token(member_id) for member_id in member_ids]
+
+    client = Client()
+    wall, db, queries, statuses = [], [], [], set()
+    # Check-ins are rolled back, so neither the records nor their upkeep stay behind
+    with rolled_back():
+        client.force_login(staff)
+        # Untimed, like the warm-up request of measure()
+        with run_on_commit():
+            client.post(KIOSK_CHECK_IN_PATH, {'token': warm_up}, content_type='application/json')
+        for token in tokens:
+            timer = QueryTimer()
+            with connection.execute_wrapper(timer):
+                started = time.perf_counter()
+                with run_on_commit():
+                    response = client.post(KIOSK_CHECK_IN_PATH, {'token': token}, content_type='application/json')
+                wall.append((time.perf_counter() - started) * 1000)
+            statuses.add(response.status_code)
+            queries.append(timer.count)
+            db.append(timer.seconds * 1000)
+
+    return {
+        'kiosk_check_in': {
+            'path': KIOSK_CHECK_IN_PATH,
+            'check_ins': len(tokens),
+            'status_code': max(statuses),
+            'queries': max(queries),
+            'wall_ms': round(statistics.median(wall), 2),
+            'wall_ms_p99': round(_p99(wall), 2),
+            'wall_ms_max': round(max(wall), 2),
+            'db_ms': round(statistics.median(db), 2),
+            'db_ms_p99': round(_p99(db), 2),
+        }
+    }
+
+
+def load_budgets(path=BUDGETS_PATH):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def check_budgets(results, budgets, tolerance):
+    """
+    Compare results to budgets. Query counts must not exceed the budget at all;
+    timings may exceed theirs by the tolerance fraction to absorb noise.
+    """
+    failures = []
+    limits = budgets.get('endpoints', {})
+    for name, result in results.items():
+        budget = limits.get(name)
+        if budget is None or 'skipped' in result:
+            continue
+        if not 200 <= result['status_code'] < 300:
+            failures.append(f"{name}: returned HTTP {result['status_code']}")
+        if result['queries'] > budget['max_queries']:
+            failures.append(f"{name}: {result['queries']} queries (budget {budget['max_queries']})")
+        for metric in ('wall_ms', 'db_ms', 'wall_ms_p99'):
+            if f'max_{metric}' not in budget:
+                continue
+            allowed = budget[f'max_{metric}'] * (1 + tolerance)
+            if result[metric] > allowed:
+                failures.append(f"{name}: {metric} {result[metric]} over budget {budget[f'max_{metric}']} (+{int(tolerance * 100)}%)")
+        result['budget'] = budget
+    return failures
+
+
+def budgets_from(results, dataset, headroom=1.5):
+    """Build a budgets document from a run, padding timings with headroom"""
+    endpoints = {}
+    for name, result in results.items():
+        if 'skipped' in result:
+            continue
+        endpoints[name] = {'max_queries': result['queries']}
+        for metric in ('wall_ms', 'db_ms', 'wall_ms_p99'):
+            if metric in result:
+                endpoints[name][f'max_{metric}'] = round(max(result[metric] * headroom, MIN_TIMING_BUDGET_MS), 1)
+    return {'dataset': dataset, 'endpoints': endpoints}
@@ -0,0 +1,95 @@
+import statistics
+from datetime import timedelta
+
+from django.db import transaction
+
+from attendance.models import AttendanceRecord
+from shared.cache import invalidate
+from .models import DailyDwellSummary
+from .rollups import CHUNK_DAYS
+
+BIN_MINUTES = 15
+# 0-15, 15-30, ... 345-360 and a last bin for anything longer than six hours
+HISTOGRAM_BINS = 25
+
+
+def _bin(minutes):
+    return min(int(minutes // BIN_MINUTES), HISTOGRAM_BINS - 1)
+
+
+def histogram_percentile(histogram, fraction):
+    """Approximate percentile (0-1) of a histogram, interpolating inside the bin it falls in"""
+    total = sum(histogram)
+    if not total:
+        return None
+    target = fraction * total
+    seen = 0
+    for index, count in enumerate(histogram):
+        if count and seen + count >= target:
+            return round((index + (target - seen) / count) * BIN_MINUTES, 1)
+        seen += count
+    return float(len(histogram) * BIN_MINUTES)
+
+
+def _summaries(start, end):
+    """{date: DailyDwellSummary} computed from one read of the visits between start and end"""
+    rows = AttendanceRecord.objects.filter(
+        date__range=(start, end), check_out_time__isnull=False
+    ).values_list('date', 'check_in_time', 'check_out_time', 'auto_checked_out')
+
+    durations, auto_closed = {}, {}
+    for day, check_in, check_out, automatic in rows.iterator(chunk_size=2000):
+        if automatic:
+            auto_closed[day] = auto_closed.get(day, 0) + 1
+            continue
+        minutes = (check_out - check_in).total_seconds() / 60
+        if minutes >= 0:
+            durations.setdefault(day, []).append(minutes)
+
+    summaries = {}
+    for day in durations.keys() | auto_closed.keys():
+        minutes = durations.get(day, [])
+        histogram = [0] * HISTOGRAM_BINS
+        for value in minutes:
+            histogram[_bin(value)] += 1
+        summary = DailyDwellSummary(
+            date=day,
+            visits=len(minutes),
+            auto_closed=auto_closed.get(day, 0),
+            total_minutes=round(sum(minutes), 1),
+            histogram=histogram,
+        )
+        if minutes:
+            summary.average_minutes = round(statistics.fmean(minutes), 1)
+            summary.median_minutes = round(statistics.median(minutes), 1)
+            summary.p90_minutes = round(
+                statistics.quantiles(minutes, n=10, method='inclusive')[8] if len(minutes) > 1 else minutes[0], 1
+            )
+        summaries[day] = summary
+    return summaries
+
+
+def refresh_dwell_summaries(start, end):
+    """Recompute the dwell summaries of every day between start and end (inclusive)"""
+    written = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=CHUNK_DAYS - 1), end)
+        summaries = _summaries(chunk_start, chunk_end)
+        with transaction.atomic():
+            DailyDwellSummary.objects.filter(date__range=(chunk_start, chunk_end)).exclude(
+                date__in=summaries.keys()
+            ).delete()
+            DailyDwellSummary.objects.bulk_create(
+                summaries.values(),
+                update_conflicts=True,
+                unique_fields=['date'],
+                update_fields=[
+                    'visits', 'auto_closed', 'total_minutes', 'average_minutes',
+                    'median_minutes', 'p90_minutes', 'histogram', 'updated_at'
+                ],
+            )
+        written += len(summaries)
+        chunk_start = chunk_end + timedelta(days=1)
+    transaction.on_commit(lambda: invalidate(DailyDwellSummary._meta.label))
+    return written
@@ -0,0 +1,120 @@
+"""
+Gym-wide visits per weekday and hour of check-in.
+
+A requested range is assembled from two parts:
+- closed weeks, cached as whole 7x24 grids;
+- the current week and partially covered weeks at the edges of the range,
+  which are queried on every request.
+Whatever is not cached is read with one grouped query, so a long range
+only scans the open week and the weeks that changed since they were cached.
+The open week is always recounted rather than kept in counters: counters
+seeded from a query miss or repeat check-ins committed while it runs.
+"""
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import TruncWeek, ExtractIsoWeekDay, ExtractHour
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+HOURS = 24
+WEEK_TIMEOUT = 30 * 24 * 60 * 60
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _empty_grid():
+    return [[0] * HOURS for _ in WEEKDAYS]
+
+
+def _week_key(monday):
+    return f'heatmap:week:{monday.isoformat()}'
+
+
+def _add(grid, other):
+    for weekday in range(len(WEEKDAYS)):
+        for hour in range(HOURS):
+            grid[weekday][hour] += other[weekday][hour]
+
+
+def _split(start, end, today):
+    """Split [start, end] into closed full weeks (cacheable) and ranges to query"""
+    current = week_start(today)
+    full_weeks, edges = [], []
+    cursor = start
+    while cursor <= end:
+        monday = week_start(cursor)
+        sunday = monday + timedelta(days=6)
+        first, last = cursor, min(end, sunday)
+        if monday < current and (first, last) == (monday, sunday):
+            full_weeks.append(monday)
+        else:
+            edges.append((first, last))
+        cursor = sunday + timedelta(days=1)
+    return full_weeks, edges
+
+
+def _merge(ranges):
+    """Join adjacent date ranges so the query has as few conditions as possible"""
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def _week_of(value):
+    return value.date() if hasattr(value, 'date') else value
+
+
+def build_heatmap(start, end, today=None):
+    """7x24 visit counts (Monday first, hours in the current time zone) for [start, end]"""
+    today = today or timezone.now().date()
+    full_weeks, edges = _split(start, end, today)
+    grid = _empty_grid()
+
+    cached = cache.get_many([_week_key(monday) for monday in full_weeks])
+    missing = [monday for monday in full_weeks if _week_key(monday) not in cached]
+    for week_grid in cached.values():
+        _add(grid, week_grid)
+
+    ranges = edges + [(monday, monday + timedelta(days=6)) for monday in missing]
+    if not ranges:
+        return grid
+
+    rows = AttendanceRecord.objects.filter(
+        reduce(or_, (Q(date__range=bounds) for bounds in _merge(ranges)))
+    ).annotate(
+        week=TruncWeek('date'),
+        weekday=ExtractIsoWeekDay('date'),
+        hour=ExtractHour('check_in_time')
+    ).values('week', 'weekday', 'hour').annotate(visits=Count('id')).order_by()
+
+    week_grids = {monday: _empty_grid() for monday in missing}
+    for row in rows:
+        monday = _week_of(row['week'])
+        weekday, hour = row['weekday'] - 1, row['hour']
+        if monday in week_grids:
+            week_grids[monday][weekday][hour] += row['visits']
+        else:
+            grid[weekday][hour] += row['visits']
+
+    for monday, week_grid in week_grids.items():
+        _add(grid, week_grid)
+    cache.set_many({_week_key(monday): week_grid for monday, week_grid in week_grids.items()}, timeout=WEEK_TIMEOUT)
+    return grid
+
+
+def invalidate_weeks(days):
+    """Forget the cached grids of the weeks of days, so the next read recounts them"""
+    mondays = {week_start(day) for day in days if day is not None}
+    cache.delete_many([_week_key(monday) for monday in mondays])
@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance.occupancy import close_stale_visits
+from gym.dwell import refresh_dwell_summaries
+
+
+class Command(BaseCommand):
+    help = 'Checks out visits left open too long and refreshes the recent daily dwell-time summaries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--after-hours', type=int, default=settings.ATTENDANCE_AUTO_CHECKOUT_HOURS,
+                            help='Close visits open this many hours after check-in (default: ATTENDANCE_AUTO_CHECKOUT_HOURS)')
+        parser.add_argument('--days', type=int, default=2,
+                            help='Also refresh the summaries of this many most recent days, for manual check-outs (default 2)')
+        parser.add_argument('--every', type=int, help='Keep running and repeat every N seconds')
+
+    def handle(self, *args, **options):
+        if options['after_hours'] < 1 or options['days'] < 1:
+            raise CommandError('--after-hours and --days must be positive')
+        while True:
+            closed, days = close_stale_visits(options['after_hours'])
+            today = timezone.now().date()
+            days |= {today - timedelta(days=offset) for offset in range(options['days'])}
+            # Auto-closed visits can be spread over a long backlog; refresh the whole span once
+            refresh_dwell_summaries(min(days), max(days))
+            self.stdout.write(self.style.SUCCESS(
+                f'Closed {closed} stale visits; refreshed dwell summaries from {min(days)} to {max(days)}'
+            ))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
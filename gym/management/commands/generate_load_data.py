@@ -0,0 +1,386 @@
+import io
+import json
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord
+from chat.models import Conversation, ChatMessage, ConversationReadState
+from core.models import Member, Trainer
+from notifications.models import Notification
+from programs.models import Program
+from scheduling.models import Session
+from subscriptions.models import SubscriptionPlan, MemberSubscription, Payment
+from shared.cache import invalidate
+
+User = get_user_model()
+
+EMAIL_DOMAIN = 'load.gymflow.test'
+PASSWORD = 'loadtest123'
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'David', 'Aisha',
+               'Wanjiru', 'Kamau', 'Otieno', 'Achieng', 'Mohamed', 'Fatuma', 'Brian', 'Grace', 'Kevin', 'Faith']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Mwangi', 'Odhiambo', 'Kiptoo', 'Njoroge', 'Wafula', 'Mutua',
+              'Garcia', 'Miller', 'Davis', 'Wilson', 'Taylor', 'Anderson', 'Thomas', 'Moore', 'Jackson', 'White']
+SPECIALIZATIONS = ['HIIT', 'Yoga', 'Strength', 'Cardio', 'Pilates', 'CrossFit', 'Boxing', 'Mobility']
+PLANS = [
+    ('Monthly Basic', 30, Decimal('30.00')),
+    ('Monthly Premium', 30, Decimal('55.00')),
+    ('Quarterly', 90, Decimal('80.00')),
+    ('Annual', 365, Decimal('300.00')),
+]
+PROGRAM_GOALS = ['Weight Loss', 'Muscle Gain', 'Endurance', 'Flexibility', 'General Fitness']
+DIFFICULTIES = ['beginner', 'intermediate', 'advanced']
+ATTENDANCE_METHODS = ['manual', 'qr', 'id', 'session']
+ATTENDANCE_METHOD_WEIGHTS = [35, 40, 15, 10]
+CHAT_LINES = [
+    'Hi, is the gym open on the public holiday?', 'Can we move tomorrow\'s session to 6pm?',
+    'Thanks for the workout plan!', 'My card payment failed, can you check?', 'See you at 7am.',
+    'How many sets should I do for squats?', 'I will be travelling next week.', 'Great progress this month!',
+]
+
+
+def _csv_value(value):
+    # PostgreSQL CSV treats an unquoted empty field as NULL and a quoted one as ''
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    text = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    return '"' + text.replace('"', '""') + '"'
+
+
+@contextmanager
+def _explicit_timestamps(*models):
+    """Let generated rows keep their historical created_at/sent_at values in bulk_create"""
+    toggled = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            for flag in ('auto_now', 'auto_now_add'):
+                if getattr(field, flag, False):
+                    setattr(field, flag, False)
+                    toggled.append((field, flag))
+    try:
+        yield
+    finally:
+        for field, flag in toggled:
+            setattr(field, flag, True)
+
+
+class Command(BaseCommand):
+    help = 'Generates a large, deterministic synthetic dataset for load and benchmark runs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=1000, help='Number of members to create')
+        parser.add_argument('--trainers', type=int, help='Number of trainers (default: one per 50 members)')
+        parser.add_argument('--days', type=int, default=730, help='Days of history to generate')
+        parser.add_argument('--end-date', help='Last day of generated history (YYYY-MM-DD, default today)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; same seed and end date give the same data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--no-copy', action='store_true', help='Use bulk_create even when PostgreSQL COPY is available')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').exists():
+            raise CommandError(f'Load data already exists (users @{EMAIL_DOMAIN}). Run against a fresh database.')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.use_copy = not options['no_copy'] and self._copy_supported()
+        self.end = datetime.strptime(options['end_date'], '%Y-%m-%d').date() if options['end_date'] else timezone.now().date()
+        self.start = self.end - timedelta(days=options['days'] - 1)
+        member_count = options['members']
+        trainer_count = options['trainers'] or max(1, member_count // 50)
+        self.password = make_password(PASSWORD)
+
+        self.stdout.write(f"Generating {member_count} members and {trainer_count} trainers over {options['days']} days "
+                          f"({'COPY' if self.use_copy else 'bulk_create'})")
+
+        with _explicit_timestamps(User, Trainer, Member, SubscriptionPlan, MemberSubscription, Payment,
+                                  Program, AttendanceRecord, Session, Conversation, ChatMessage, ConversationReadState,
+                                  Notification):
+            with transaction.atomic():
+                admins = self._create_users('admin', 2)
+                trainers = self._create_trainers(trainer_count)
+                members = self._create_members(member_count, trainers)
+                plans = self._create_plans()
+                self._create_subscriptions(members, plans)
+                self._create_programs(trainers, members)
+                self._create_attendance(members)
+                self._create_sessions(trainers, members)
+                self._create_chat(admins, trainers, members)
+                self._create_notifications(admins + [m.user for m in members])
+
+        self.stdout.write('Rebuilding derived tables...')
+        for command in ('rebuild_gym_rollups', 'backfill_last_attended', 'rebuild_attendance_bitmaps',
+                        'rebuild_attendance_streaks', 'rebuild_trainer_clients', 'rebuild_dwell_summaries',
+                        'rebuild_last_messages'):
+            call_command(command, stdout=self.stdout)
+        invalidate(*[model._meta.label for model in (AttendanceRecord, Payment, Member, MemberSubscription, Program, Trainer, SubscriptionPlan)])
+
+        self.stdout.write(self.style.SUCCESS(f'Load data generated. Log in as member0@{EMAIL_DOMAIN} / {PASSWORD}'))
+
+    # Writing helpers
+
+    def _copy_supported(self):
+        if connection.vendor != 'postgresql':
+            return False
+        with connection.cursor() as cursor:
+            return hasattr(cursor.cursor, 'copy_expert')
+
+    def _bulk(self, objects, model=None):
+        """bulk_create a list in batches and return it with primary keys set"""
+        if objects:
+            (model or type(objects[0])).objects.bulk_create(objects, batch_size=self.batch_size)
+        return objects
+
+    def _stream(self, model, fields, rows):
+        """Insert an iterable of value tuples without keeping them all in memory"""
+        columns = [model._meta.get_field(name).column for name in fields]
+        written = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                written += self._write_batch(model, fields, columns, batch)
+                batch = []
+        if batch:
+            written += self._write_batch(model, fields, columns, batch)
+        self.stdout.write(f'  {model.__name__}: {written} rows')
+        return written
+
+    def _write_batch(self, model, fields, columns, batch):
+        if self.use_copy:
+            buffer = io.StringIO()
+            for row in batch:
+                buffer.write(','.join(_csv_value(value) for value in row) + '\n')
+            buffer.seek(0)
+            sql = f"COPY {model._meta.db_table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+            with connection.cursor() as cursor:
+                cursor.cursor.copy_expert(sql, buffer)
+        else:
+            model.objects.bulk_create([model(**dict(zip(fields, row))) for row in batch], batch_size=self.batch_size)
+        return len(batch)
+
+    def _moment(self, day, earliest=5, latest=22):
+        """A timezone-aware datetime on day between the given hours"""
+        moment = datetime.combine(day, time(self.rng.randint(earliest, latest - 1), self.rng.randint(0, 59)))
+        return timezone.make_aware(moment)
+
+    def _random_day(self, start=None, end=None):
+        start, end = start or self.start, end or self.end
+        return start + timedelta(days=self.rng.randint(0, max(0, (end - start).days)))
+
+    # Generators
+
+    def _create_users(self, role, count, joined=None):
+        users = []
+        for n in range(count):
+            first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+            email = f'{role}{n}@{EMAIL_DOMAIN}'
+            date_joined = self._moment(joined[n]) if joined else timezone.make_aware(datetime.combine(self.start, time(8)))
+            users.append(User(
+                username=email, email=email, password=self.password, first_name=first, last_name=last,
+                role=role, phone=f'+2547{self.rng.randint(10000000, 99999999)}', is_staff=role == 'admin',
+                date_joined=date_joined,
+            ))
+        self._bulk(users)
+        self.stdout.write(f'  {role} users: {count} rows')
+        return users
+
+    def _create_trainers(self, count):
+        users = self._create_users('trainer', count)
+        trainers = [
+            Trainer(
+                user=user, specializations=self.rng.sample(SPECIALIZATIONS, 2), bio='Certified personal trainer',
+                status='active', hire_date=self._random_day(self.start - timedelta(days=365), self.start),
+                created_at=user.date_joined, updated_at=user.date_joined,
+            ) for user in users
+        ]
+        return self._bulk(trainers)
+
+    def _create_members(self, count, trainers):
+        join_days = [self._random_day() for _ in range(count)]
+        users = self._create_users('member', count, joined=join_days)
+        members = []
+        for user, join_day in zip(users, join_days):
+            members.append(Member(
+                user=user,
+                date_of_birth=self._random_day(self.end - timedelta(days=365 * 60), self.end - timedelta(days=365 * 18)),
+                gender=self.rng.choice(['male', 'female']),
+                address=f'{self.rng.randint(1, 999)} Fitness Road',
+                emergency_contact={'name': self.rng.choice(FIRST_NAMES), 'phone': '+254700000000', 'relationship': 'Sibling'},
+                status='active' if self.rng.random() < 0.85 else 'inactive',
+                join_date=join_day,
+                assigned_trainer=self.rng.choice(trainers) if self.rng.random() < 0.7 else None,
+                created_at=user.date_joined, updated_at=user.date_joined,
+            ))
+        return self._bulk(members)
+
+    def _create_plans(self):
+        created = timezone.make_aware(datetime.combine(self.start, time(8)))
+        plans = [
+            SubscriptionPlan(name=name, description=f'{name} membership', duration=duration, price=price,
+                             features=['Gym floor access'], status='active', created_at=created, updated_at=created)
+            for name, duration, price in PLANS
+        ]
+        return self._bulk(plans)
+
+    def _create_subscriptions(self, members, plans):
+        subscriptions, payments = [], []
+        for member in members:
+            plan = self.rng.choice(plans)
+            start = member.join_date
+            while start <= self.end:
+                end = start + timedelta(days=plan.duration)
+                active = end >= self.end and member.status == 'active'
+                paid = self.rng.random() < 0.92
+                subscriptions.append(MemberSubscription(
+                    member=member, plan=plan, start_date=start, end_date=end,
+                    status='active' if active else 'expired',
+                    payment_status='paid' if paid else 'pending', amount=plan.price,
+                    created_at=self._moment(start), updated_at=self._moment(start),
+                ))
+                start = end + timedelta(days=1)
+                if self.rng.random() < 0.15:
+                    break
+        self._bulk(subscriptions)
+        for sub in subscriptions:
+            paid_at = self._moment(sub.start_date)
+            payments.append((
+                sub.id, sub.amount, self.rng.choice(['cash', 'card', 'mpesa']),
+                'completed' if sub.payment_status == 'paid' else 'pending', paid_at, None, paid_at, paid_at,
+            ))
+        self.stdout.write(f'  MemberSubscription: {len(subscriptions)} rows')
+        self._stream(Payment, ['subscription_id', 'amount', 'method', 'status', 'transaction_date', 'notes',
+                               'created_at', 'updated_at'], payments)
+
+    def _create_programs(self, trainers, members):
+        programs = []
+        for trainer in trainers:
+            for _ in range(2):
+                created = self._moment(self._random_day())
+                goal = self.rng.choice(PROGRAM_GOALS)
+                programs.append(Program(
+                    name=f'{goal} {self.rng.randint(4, 12)}-Week Plan', description=f'{goal} focused program',
+                    duration=f'{self.rng.randint(4, 12)} weeks', difficulty=self.rng.choice(DIFFICULTIES),
+                    goal=goal, created_by=trainer, status='active', created_at=created, updated_at=created,
+                ))
+        self._bulk(programs)
+        Through = Program.assigned_members.through
+        links = []
+        for member in members:
+            if self.rng.random() < 0.4:
+                links.append(Through(program_id=self.rng.choice(programs).id, member_id=member.id))
+        self._bulk(links, model=Through)
+        self.stdout.write(f'  Program: {len(programs)} rows, {len(links)} assignments')
+
+    def _create_attendance(self, members):
+        def rows():
+            for member in members:
+                span = (self.end - member.join_date).days + 1
+                # Each member visits at their own steady rate; most rows never get a check-out
+                rate = self.rng.uniform(0.05, 0.6)
+                visits = sorted(self.rng.sample(range(span), int(span * rate)))
+                for offset in visits:
+                    day = member.join_date + timedelta(days=offset)
+                    check_in = self._moment(day)
+                    check_out = check_in + timedelta(minutes=self.rng.randint(30, 150)) if self.rng.random() < 0.3 else None
+                    method = self.rng.choices(ATTENDANCE_METHODS, ATTENDANCE_METHOD_WEIGHTS)[0]
+                    yield (member.id, check_in, check_out, day, method, False, False, check_in, check_in)
+        # COPY sends every NOT NULL column: Django keeps no database defaults for them
+        self._stream(AttendanceRecord, ['member_id', 'check_in_time', 'check_out_time', 'date', 'method',
+                                        'auto_checked_out', 'sync_pending', 'created_at', 'updated_at'], rows())
+
+    def _create_sessions(self, trainers, members):
+        def rows():
+            for member in members:
+                for _ in range(self.rng.randint(0, 4)):
+                    trainer = member.assigned_trainer or self.rng.choice(trainers)
+                    start = self._moment(self._random_day(member.join_date, self.end + timedelta(days=14)), 6, 20)
+                    if start.date() < self.end:
+                        status = self.rng.choices(['completed', 'cancelled'], [85, 15])[0]
+                    else:
+                        status = self.rng.choice(['pending', 'confirmed'])
+                    yield (trainer.id, member.id, start, start + timedelta(hours=1), status, None, start, start)
+        self._stream(Session, ['trainer_id', 'member_id', 'start_time', 'end_time', 'status', 'notes',
+                               'created_at', 'updated_at'], rows())
+
+    def _create_chat(self, admins, trainers, members):
+        conversations = []
+        for member in members:
+            if self.rng.random() < 0.1:
+                conversations.append(Conversation(member=member))
+            if member.assigned_trainer and self.rng.random() < 0.2:
+                conversations.append(Conversation(member=member, trainer=member.assigned_trainer))
+        for trainer in trainers:
+            if self.rng.random() < 0.5:
+                conversations.append(Conversation(trainer=trainer))
+
+        # Pre-compute each thread's timeline so the conversation row gets its real last_message_at
+        timelines = []
+        for conversation in conversations:
+            participant = conversation.member or conversation.trainer
+            sent_at = self._moment(self._random_day(participant.join_date if conversation.member else self.start))
+            timeline = []
+            for _ in range(self.rng.randint(3, 30)):
+                sent_at += timedelta(minutes=self.rng.randint(1, 60 * 24 * 3))
+                timeline.append(sent_at)
+            conversation.created_at = timeline[0]
+            conversation.updated_at = conversation.last_message_at = timeline[-1]
+            timelines.append(timeline)
+        self._bulk(conversations)
+
+        def rows():
+            for conversation, timeline in zip(conversations, timelines):
+                participants = [conversation.member.user if conversation.member else None,
+                                conversation.trainer.user if conversation.trainer else None]
+                participants = [user for user in participants if user]
+                if not conversation.member or not conversation.trainer:
+                    participants.append(self.rng.choice(admins))
+                for sent_at in timeline:
+                    sender = self.rng.choice(participants)
+                    yield (conversation.id, sender.id, self.rng.choice(CHAT_LINES), sent_at, False, sent_at, sent_at)
+        self.stdout.write(f'  Conversation: {len(conversations)} rows')
+        self._stream(ChatMessage, ['conversation_id', 'sender_id', 'content', 'sent_at', 'is_deleted',
+                                   'created_at', 'updated_at'], rows())
+
+        # Everyone in a thread has read it up to the day before its last message
+        read_until = {conversation.id: timeline[-1] - timedelta(days=1) for conversation, timeline in zip(conversations, timelines)}
+        last_read = {}
+        messages = ChatMessage.objects.filter(conversation_id__in=read_until).values_list('conversation_id', 'id', 'sent_at')
+        for conversation_id, message_id, sent_at in messages.iterator(chunk_size=self.batch_size):
+            if sent_at < read_until[conversation_id]:
+                last_read[conversation_id] = max(last_read.get(conversation_id, 0), message_id)
+        states = []
+        for conversation in conversations:
+            if conversation.id not in last_read:
+                continue
+            readers = [user for user in (conversation.member.user if conversation.member else None,
+                                         conversation.trainer.user if conversation.trainer else None) if user]
+            if not conversation.member or not conversation.trainer:
+                readers += admins
+            moment = read_until[conversation.id]
+            states += [ConversationReadState(user=user, conversation=conversation, last_read_message_id=last_read[conversation.id],
+                                             created_at=moment, updated_at=moment) for user in readers]
+        self._bulk(states)
+        self.stdout.write(f'  ConversationReadState: {len(states)} rows')
+
+    def _create_notifications(self, users):
+        def rows():
+            for user in users:
+                for _ in range(self.rng.randint(0, 6)):
+                    created = self._moment(self._random_day(timezone.localdate(user.date_joined), self.end))
+                    title = self.rng.choice(['Payment Received', 'Session Reminder', 'New Message', 'Subscription Expiring'])
+                    yield (user.id, title, f'{title} notification', self.rng.random() < 0.7, True, created, created)
+        self._stream(Notification, ['recipient_id', 'title', 'message', 'read', 'email_sent',
+                                    'created_at', 'updated_at'], rows())
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min, Max
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord
+from gym.dwell import refresh_dwell_summaries
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}'. Use YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = 'Backfills or rebuilds the DailyDwellSummary rows for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First day to rebuild (YYYY-MM-DD). Defaults to the earliest visit.')
+        parser.add_argument('--to', dest='end', help='Last day to rebuild (YYYY-MM-DD). Defaults to the latest visit.')
+
+    def handle(self, *args, **options):
+        bounds = AttendanceRecord.objects.aggregate(low=Min('date'), high=Max('date'))
+        today = timezone.now().date()
+        start = _parse_date(options['start']) if options['start'] else bounds['low'] or today
+        end = _parse_date(options['end']) if options['end'] else bounds['high'] or today
+        if start > end:
+            raise CommandError('--from must not be after --to')
+
+        written = refresh_dwell_summaries(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt dwell summaries for {written} days from {start} to {end}'))
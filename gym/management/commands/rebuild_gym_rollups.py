@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from gym.rollups import rebuild_rollups, source_date_range
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}'. Use YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = 'Backfills or rebuilds the DailyGymRollup rows for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First day to rebuild (YYYY-MM-DD). Defaults to the earliest source row.')
+        parser.add_argument('--to', dest='end', help='Last day to rebuild (YYYY-MM-DD). Defaults to the latest source row.')
+
+    def handle(self, *args, **options):
+        earliest, latest = source_date_range()
+        start = _parse_date(options['start']) if options['start'] else earliest
+        end = _parse_date(options['end']) if options['end'] else latest
+        if start > end:
+            raise CommandError('--from must not be after --to')
+
+        written = rebuild_rollups(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} daily rollups from {start} to {end}'))
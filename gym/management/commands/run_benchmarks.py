@@ -0,0 +1,69 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment, override_settings
+from django.utils import timezone
+
+from gym.benchmarks import (
+    BUDGETS_PATH, run_endpoints, load_budgets, check_budgets, budgets_from,
+    run_kiosk, busiest_conversation,
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks list and stats endpoints against the current database and checks them against stored budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suite', choices=['endpoints', 'kiosk'], default='endpoints',
+                            help="'endpoints' times list and stats endpoints; 'kiosk' times check-ins")
+        parser.add_argument('--check-ins', type=int, default=200, help='Kiosk check-ins to time (kiosk suite)')
+        parser.add_argument('--iterations', type=int, default=5, help='Measured requests per endpoint')
+        parser.add_argument('--only', nargs='+', help='Endpoint names to run (default: all)')
+        parser.add_argument('--budgets', default=str(BUDGETS_PATH), help='Budgets JSON file')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed timing overrun as a fraction of the budget')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--update-budgets', action='store_true', help='Store this run as the new budgets instead of checking')
+        parser.add_argument('--dataset', default='generate_load_data --members 200 --days 180 --seed 42',
+                            help='Description of the dataset, stored alongside updated budgets')
+
+    def handle(self, *args, **options):
+        # Allows the test client's host and keeps emails in memory
+        setup_test_environment()
+        today = timezone.now().date()
+        context = {
+            'today': today.isoformat(),
+            'year_ago': (today - timedelta(days=365)).isoformat(),
+            'conversation': busiest_conversation(),
+        }
+
+        # Measure the real query path, not the stats response cache
+        with override_settings(STATS_CACHE_TTL=0):
+            if options['suite'] == 'kiosk':
+                results = run_kiosk(options['check_ins'])
+            else:
+                results = run_endpoints(options['iterations'], context, only=options['only'])
+
+        if options['update_budgets']:
+            # Each suite only replaces the budgets of its own endpoints
+            budgets = load_budgets(options['budgets'])
+            updated = budgets_from(results, options['dataset'])
+            budgets['dataset'] = updated['dataset']
+            budgets.setdefault('endpoints', {}).update(updated['endpoints'])
+            with open(options['budgets'], 'w') as f:
+                json.dump(budgets, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stderr.write(self.style.SUCCESS(f"Budgets written to {options['budgets']}"))
+            failures = []
+        else:
+            failures = check_budgets(results, load_budgets(options['budgets']), options['tolerance'])
+
+        report = json.dumps({'results': results, 'failures': failures, 'passed': not failures}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(report + '\n')
+        else:
+            self.stdout.write(report)
+
+        if failures:
+            raise CommandError('Benchmark checks failed:\n' + '\n'.join(failures))
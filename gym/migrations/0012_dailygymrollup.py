@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-16 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('gym', '0011_remove_attendancerecord_member_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyGymRollup',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True)),
+                ('date', models.DateField(unique=True)),
+                ('attendance_count', models.IntegerField(default=0)),
+                ('completed_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('new_members', models.IntegerField(default=0)),
+                ('expiring_subscriptions', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-17 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0012_dailygymrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyDwellSummary',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True)),
+                ('date', models.DateField(unique=True)),
+                ('visits', models.IntegerField(default=0)),
+                ('auto_closed', models.IntegerField(default=0)),
+                ('total_minutes', models.FloatField(default=0)),
+                ('average_minutes', models.FloatField(blank=True, null=True)),
+                ('median_minutes', models.FloatField(blank=True, null=True)),
+                ('p90_minutes', models.FloatField(blank=True, null=True)),
+                ('histogram', models.JSONField(default=list)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+    ]
@@ -1,3 +1,37 @@
 from django.db import models
+from shared.basemodel import BaseModel
 
-# All models have been moved to their respective modular apps.
+# All domain models have been moved to their respective modular apps.
+# The gym app only keeps the pre-aggregated tables backing the stats views.
+
+class DailyGymRollup(BaseModel):
+    """Per-day totals kept current by gym.signals and rebuilt by rebuild_gym_rollups"""
+    date = models.DateField(unique=True)
+    attendance_count = models.IntegerField(default=0)
+    completed_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    new_members = models.IntegerField(default=0)
+    expiring_subscriptions = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"Rollup {self.date}"
+
+
+class DailyDwellSummary(BaseModel):
+    """Visit length statistics per day, maintained by gym.dwell"""
+    date = models.DateField(unique=True)
+    visits = models.IntegerField(default=0)  # Visits with a real check-out
+    auto_closed = models.IntegerField(default=0)  # Visits closed by auto_check_out, not in the statistics
+    total_minutes = models.FloatField(default=0)
+    average_minutes = models.FloatField(null=True, blank=True)
+    median_minutes = models.FloatField(null=True, blank=True)
+    p90_minutes = models.FloatField(null=True, blank=True)
+    histogram = models.JSONField(default=list)  # Visits per 15-minute bin, so ranges can be merged
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"Dwell {self.date}"
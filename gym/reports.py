@@ -0,0 +1,211 @@
+from datetime import datetime, timedelta
+
+from django.db.models import Sum, Count, Q, DateField
+from django.db.models.functions import Trunc
+
+from attendance.archive import archived_visits
+from attendance.models import AttendanceRecord
+from subscriptions.models import Payment
+from .dwell import HISTOGRAM_BINS, histogram_percentile
+from .models import DailyDwellSummary
+
+BUCKETS = ('day', 'week', 'month')
+MAX_BUCKETS = 1000
+ATTENDANCE_METHODS = ('manual', 'qr', 'id', 'session')
+
+# Labels keep the formats the report charts were built against
+LABEL_FORMATS = {
+    'day': '%Y-%m-%d',
+    'week': '%Y-%m-%d',
+    'month': '%b',
+}
+LABEL_KEYS = {
+    'day': 'date',
+    'week': 'date',
+    'month': 'month',
+}
+
+
+def label_format(bucket, periods):
+    """LABEL_FORMATS[bucket], with the year added once month names would repeat"""
+    if bucket == 'month' and len(periods) > 12:
+        return '%b %Y'
+    return LABEL_FORMATS[bucket]
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def bucket_starts(start, end, bucket):
+    """Every bucket start between start and end, so empty buckets can be zero-filled"""
+    current = bucket_start(start, bucket)
+    starts = []
+    while current <= end:
+        starts.append(current)
+        if bucket == 'day':
+            current += timedelta(days=1)
+        elif bucket == 'week':
+            current += timedelta(days=7)
+        else:
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return starts
+
+
+def fitting_bucket(start, end, preferred):
+    """preferred, or the next coarser bucket that keeps [start, end] within MAX_BUCKETS"""
+    for bucket in BUCKETS[BUCKETS.index(preferred):]:
+        if len(bucket_starts(start, end, bucket)) <= MAX_BUCKETS:
+            return bucket
+    return BUCKETS[-1]
+
+
+def parse_range(params, default_start, default_end, default_bucket):
+    """
+    Resolve from/to/bucket query parameters, falling back to the metric's defaults.
+    Without an explicit bucket, a range too long for the default bucket gets a coarser one.
+    Raises ValueError with a user-facing message on invalid input.
+    """
+    bucket = params.get('bucket')
+    if bucket and bucket not in BUCKETS:
+        raise ValueError(f"Invalid bucket '{bucket}'. Use one of: {', '.join(BUCKETS)}")
+
+    dates = {}
+    for name, default in (('from', default_start), ('to', default_end)):
+        value = params.get(name)
+        if not value:
+            dates[name] = default
+            continue
+        try:
+            dates[name] = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError(f"Invalid '{name}' date. Use YYYY-MM-DD")
+
+    start, end = dates['from'], dates['to']
+    if start > end:
+        raise ValueError("'from' must not be after 'to'")
+    bucket = bucket or fitting_bucket(start, end, default_bucket)
+    if len(bucket_starts(start, end, bucket)) > MAX_BUCKETS:
+        raise ValueError(f"Range too large for '{bucket}' buckets. Use a coarser bucket or a shorter range")
+    return start, end, bucket
+
+
+def revenue_series(start, end, bucket):
+    """Completed and pending revenue per bucket from a single grouped query"""
+    rows = Payment.objects.filter(
+        transaction_date__date__gte=start,
+        transaction_date__date__lte=end
+    ).annotate(
+        period=Trunc('transaction_date', bucket, output_field=DateField())
+    ).values('period').annotate(
+        revenue=Sum('amount', filter=Q(status='completed')),
+        pending=Sum('amount', filter=Q(status='pending')),
+        transactions=Count('id', filter=Q(status='completed'))
+    ).order_by()
+    totals = {row['period']: row for row in rows}
+
+    periods = bucket_starts(start, end, bucket)
+    label = label_format(bucket, periods)
+    series = []
+    for period in periods:
+        row = totals.get(period, {})
+        series.append({
+            # Month buckets keep the 'month' label the revenue chart reads; finer ones are dated
+            LABEL_KEYS[bucket]: period.strftime(label),
+            'period': period.isoformat(),
+            'revenue': float(row.get('revenue') or 0),
+            'pending': float(row.get('pending') or 0),
+            'transactions': row.get('transactions', 0)
+        })
+    return series
+
+
+def _archived_buckets(start, end, bucket):
+    """{period: [archived visits, {member_id, ...}]} for the archived days between start and end"""
+    buckets = {}
+    for member_id, day in archived_visits(start, end):
+        visits = buckets.setdefault(bucket_start(day, bucket), [0, set()])
+        visits[0] += 1
+        visits[1].add(member_id)
+    return buckets
+
+
+def attendance_series(start, end, bucket):
+    """
+    Visits, unique members and per-method visits per bucket from a single grouped query.
+    Archived months only keep the days visited: their visits are added to count and
+    unique_members and reported as 'archived', outside by_method.
+    """
+    method_counts = {
+        f'method_{method}': Count('id', filter=Q(method=method)) for method in ATTENDANCE_METHODS
+    }
+    records = AttendanceRecord.objects.filter(
+        date__gte=start,
+        date__lte=end
+    ).annotate(
+        period=Trunc('date', bucket, output_field=DateField())
+    )
+    rows = records.values('period').annotate(
+        count=Count('id'),
+        unique_members=Count('member', distinct=True),
+        **method_counts
+    ).order_by()
+    totals = {row['period']: row for row in rows}
+
+    archived = _archived_buckets(start, end, bucket)
+    if archived:
+        # A member seen in both the hot rows and the archive of a bucket is one unique member
+        hot_members = records.filter(period__in=list(archived)).values_list('period', 'member_id').distinct()
+        for period, member_id in hot_members:
+            archived[period][1].add(member_id)
+
+    periods = bucket_starts(start, end, bucket)
+    label = label_format(bucket, periods)
+    series = []
+    for period in periods:
+        row = totals.get(period, {})
+        archived_count, members = archived.get(period, (0, None))
+        series.append({
+            'date': period.strftime(label),
+            'period': period.isoformat(),
+            'count': row.get('count', 0) + archived_count,
+            'unique_members': len(members) if members is not None else row.get('unique_members', 0),
+            'by_method': {method: row.get(f'method_{method}', 0) for method in ATTENDANCE_METHODS},
+            'archived': archived_count,
+        })
+    return series
+
+
+def dwell_series(start, end, bucket):
+    """Visit length per bucket from the daily dwell summaries, without touching attendance rows"""
+    summaries = DailyDwellSummary.objects.filter(date__gte=start, date__lte=end)
+    buckets = {}
+    for summary in summaries:
+        buckets.setdefault(bucket_start(summary.date, bucket), []).append(summary)
+
+    periods = bucket_starts(start, end, bucket)
+    label = label_format(bucket, periods)
+    series = []
+    for period in periods:
+        days = buckets.get(period, [])
+        visits = sum(summary.visits for summary in days)
+        if len(days) == 1:
+            # A single day keeps its exact percentiles
+            median, p90 = days[0].median_minutes, days[0].p90_minutes
+        else:
+            histogram = [sum(counts) for counts in zip(*(summary.histogram for summary in days))] or [0] * HISTOGRAM_BINS
+            median, p90 = histogram_percentile(histogram, 0.5), histogram_percentile(histogram, 0.9)
+        series.append({
+            'date': period.strftime(label),
+            'period': period.isoformat(),
+            'visits': visits,
+            'auto_closed': sum(summary.auto_closed for summary in days),
+            'average_minutes': round(sum(summary.total_minutes for summary in days) / visits, 1) if visits else None,
+            'median_minutes': median,
+            'p90_minutes': p90,
+        })
+    return series
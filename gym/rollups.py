@@ -0,0 +1,167 @@
+import threading
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Sum, Min, Max, OuterRef, Subquery, IntegerField
+from django.db.models.functions import TruncDate, Coalesce
+from django.utils import timezone
+
+from attendance.archive import archived_through, archived_daily_counts
+from attendance.models import AttendanceRecord, AttendanceArchive
+from core.models import Member
+from subscriptions.models import MemberSubscription, Payment
+from .models import DailyGymRollup
+
+ROLLUP_FIELDS = ['attendance_count', 'completed_revenue', 'new_members', 'expiring_subscriptions', 'updated_at']
+CHUNK_DAYS = 366
+
+_pending = threading.local()
+
+
+def _aggregate(day_filter):
+    """
+    Run one grouped query per metric for the days matched by day_filter.
+    day_filter maps a date lookup suffix ('__in' or '__range') to its value.
+    """
+    (suffix, value), = day_filter.items()
+
+    attendance = dict(
+        AttendanceRecord.objects.filter(**{f'date{suffix}': value})
+        .values('date').annotate(total=Count('id')).values_list('date', 'total')
+    )
+    start, end = (min(value), max(value)) if suffix == '__in' else value
+    for day, total in archived_daily_counts(start, end).items():
+        if suffix == '__range' or day in value:
+            attendance[day] = attendance.get(day, 0) + total
+    revenue = dict(
+        Payment.objects.filter(status='completed', **{f'transaction_date__date{suffix}': value})
+        .annotate(day=TruncDate('transaction_date')).values('day')
+        .annotate(total=Sum('amount')).values_list('day', 'total')
+    )
+    new_members = dict(
+        Member.objects.filter(**{f'user__date_joined__date{suffix}': value})
+        .annotate(day=TruncDate('user__date_joined')).values('day')
+        .annotate(total=Count('id')).values_list('day', 'total')
+    )
+    expiring = dict(
+        MemberSubscription.objects.filter(status='active', **{f'end_date{suffix}': value})
+        .values('end_date').annotate(total=Count('id')).values_list('end_date', 'total')
+    )
+    return attendance, revenue, new_members, expiring
+
+
+def _upsert(days, day_filter):
+    attendance, revenue, new_members, expiring = _aggregate(day_filter)
+    rows = [
+        DailyGymRollup(
+            date=day,
+            attendance_count=attendance.get(day, 0),
+            completed_revenue=revenue.get(day) or 0,
+            new_members=new_members.get(day, 0),
+            expiring_subscriptions=expiring.get(day, 0),
+        ) for day in days
+    ]
+    DailyGymRollup.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['date'],
+        update_fields=ROLLUP_FIELDS,
+    )
+    return len(rows)
+
+
+def refresh_rollups(days):
+    """Recompute the rollup rows for an arbitrary set of days"""
+    days = sorted({day for day in days if day is not None})
+    for i in range(0, len(days), CHUNK_DAYS):
+        chunk = days[i:i + CHUNK_DAYS]
+        _upsert(chunk, {'__in': chunk})
+
+
+def rebuild_rollups(start, end):
+    """Recompute every rollup row between start and end (inclusive)"""
+    written = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=CHUNK_DAYS - 1), end)
+        days = [chunk_start + timedelta(days=n) for n in range((chunk_end - chunk_start).days + 1)]
+        with transaction.atomic():
+            written += _upsert(days, {'__range': (chunk_start, chunk_end)})
+        chunk_start = chunk_end + timedelta(days=1)
+    return written
+
+
+def source_date_range():
+    """Earliest and latest day that any rollup source table has data for"""
+    User = get_user_model()
+    bounds = [
+        AttendanceRecord.objects.aggregate(low=Min('date'), high=Max('date')),
+        AttendanceArchive.objects.aggregate(low=Min('month'), high=Max('last_visit')),
+        MemberSubscription.objects.aggregate(low=Min('end_date'), high=Max('end_date')),
+        Payment.objects.aggregate(low=Min('transaction_date'), high=Max('transaction_date')),
+        User.objects.filter(member_profile__isnull=False).aggregate(low=Min('date_joined'), high=Max('date_joined')),
+    ]
+    days = []
+    for bound in bounds:
+        for value in bound.values():
+            if value is None:
+                continue
+            if hasattr(value, 'tzinfo'):
+                value = timezone.localdate(value)
+            days.append(value)
+    if not days:
+        today = timezone.now().date()
+        return today, today
+    return min(days), max(days)
+
+
+def refresh_attendance_counts(days):
+    """
+    Recompute only attendance_count for days whose other metrics did not change,
+    in a single UPDATE. Days that have no rollup row yet get a full refresh.
+    """
+    days = {day for day in days if day is not None}
+    through = archived_through()
+    if through is not None and any(day <= through for day in days):
+        # Archived visits of those days are only counted by the full refresh
+        refresh_rollups({day for day in days if day <= through})
+        days = {day for day in days if day > through}
+    if not days:
+        return
+    count = AttendanceRecord.objects.filter(date=OuterRef('date')).order_by().values('date').annotate(
+        total=Count('id')
+    ).values('total')
+    updated = DailyGymRollup.objects.filter(date__in=days).update(
+        attendance_count=Coalesce(Subquery(count, output_field=IntegerField()), 0),
+        updated_at=timezone.now()
+    )
+    if updated < len(days):
+        existing = set(DailyGymRollup.objects.filter(date__in=days).values_list('date', flat=True))
+        refresh_rollups(days - existing)
+
+
+def schedule_refresh(days, attendance_only=False):
+    """
+    Queue days for recomputation once the current transaction commits.
+    Bulk deletes (e.g. a member cascade) mark many rows dirty but only
+    trigger a single refresh. Outside a transaction this runs immediately.
+    attendance_only limits the refresh to attendance_count, for attendance writes.
+    """
+    name = 'attendance_days' if attendance_only else 'days'
+    pending = getattr(_pending, name, None)
+    if pending is None:
+        pending = set()
+        setattr(_pending, name, pending)
+    pending.update(day for day in days if day is not None)
+    transaction.on_commit(_flush)
+
+
+def _flush():
+    days = getattr(_pending, 'days', None) or set()
+    attendance_days = getattr(_pending, 'attendance_days', None) or set()
+    _pending.days, _pending.attendance_days = set(), set()
+    if days:
+        refresh_rollups(days)
+    if attendance_days - days:
+        refresh_attendance_counts(attendance_days - days)
@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord
+from attendance.signals import attendance_changed, in_bulk_change
+from core.models import Member, Trainer
+from programs.models import Program
+from subscriptions.models import MemberSubscription, Payment, SubscriptionPlan
+from shared.cache import invalidate
+from .rollups import schedule_refresh
+from .heatmap import invalidate_weeks
+
+
+def _payment_days(payment):
+    if payment.transaction_date is None:
+        return set()
+    return {timezone.localdate(payment.transaction_date)}
+
+
+def _member_days(member):
+    User = get_user_model()
+    joined = User.objects.filter(pk=member.user_id).values_list('date_joined', flat=True).first()
+    return {timezone.localdate(joined)} if joined else set()
+
+
+# Maps each rollup source model to the rollup days a row contributes to
+ROLLUP_SOURCES = {
+    AttendanceRecord: lambda record: {record.date},
+    Payment: _payment_days,
+    MemberSubscription: lambda sub: {sub.end_date},
+}
+
+
+def _previous_days(sender, instance):
+    if instance.pk is None:
+        return set()
+    previous = sender.objects.filter(pk=instance.pk).first()
+    return ROLLUP_SOURCES[sender](previous) if previous else set()
+
+
+@receiver(pre_save, sender=AttendanceRecord)
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=MemberSubscription)
+def remember_previous_rollup_days(sender, instance, raw=False, **kwargs):
+    # A row that moves to another day must also refresh the day it left
+    if not raw:
+        instance._previous_rollup_days = _previous_days(sender, instance)
+
+
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=MemberSubscription)
+def refresh_rollups_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    days = ROLLUP_SOURCES[sender](instance) | getattr(instance, '_previous_rollup_days', set())
+    schedule_refresh(days, attendance_only=sender is AttendanceRecord)
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=MemberSubscription)
+def refresh_rollups_on_delete(sender, instance, **kwargs):
+    if sender is AttendanceRecord and in_bulk_change():
+        return
+    schedule_refresh(ROLLUP_SOURCES[sender](instance), attendance_only=sender is AttendanceRecord)
+
+
+@receiver(attendance_changed)
+def refresh_rollups_on_bulk_attendance(sender, dates, **kwargs):
+    schedule_refresh(dates, attendance_only=True)
+
+
+@receiver(post_save, sender=Member)
+def refresh_rollups_on_member_create(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        schedule_refresh(_member_days(instance))
+
+
+@receiver(post_delete, sender=Member)
+def refresh_rollups_on_member_delete(sender, instance, **kwargs):
+    schedule_refresh(_member_days(instance))
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def update_heatmap_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    days = {instance.date} | getattr(instance, '_previous_rollup_days', set())
+    transaction.on_commit(lambda: invalidate_weeks(days))
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def update_heatmap_on_delete(sender, instance, **kwargs):
+    if in_bulk_change():
+        return
+    day = instance.date
+    transaction.on_commit(lambda: invalidate_weeks([day]))
+
+
+@receiver(attendance_changed)
+def update_heatmap_on_bulk_attendance(sender, dates, **kwargs):
+    transaction.on_commit(lambda: invalidate_weeks(dates))
+
+
+# Models whose writes invalidate cached stats responses (see shared.cache)
+STATS_CACHE_SOURCES = [AttendanceRecord, Payment, Member, MemberSubscription, Program, Trainer, SubscriptionPlan]
+
+
+def invalidate_stats_cache(sender, raw=False, **kwargs):
+    if raw or (sender is AttendanceRecord and in_bulk_change()):
+        return
+    # Runs after the rollup refresh queued above, so no stale rollup gets cached
+    label = sender._meta.label
+    transaction.on_commit(lambda: invalidate(label))
+
+
+@receiver(attendance_changed)
+def invalidate_stats_cache_on_bulk_attendance(sender, **kwargs):
+    invalidate_stats_cache(AttendanceRecord)
+
+
+for model in STATS_CACHE_SOURCES:
+    post_save.connect(invalidate_stats_cache, sender=model, dispatch_uid=f'stats-cache-save-{model._meta.label}')
+    post_delete.connect(invalidate_stats_cache, sender=model, dispatch_uid=f'stats-cache-delete-{model._meta.label}')
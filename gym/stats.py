@@ -0,0 +1,276 @@
+"""
+Stats endpoints split into independent queries and the payload built from their results.
+
+Each *_queries function returns {name: callable} where every callable runs its own
+query and returns fully evaluated data; run_queries runs them and the *_payload
+function builds the response from the results. Running them concurrently on worker
+threads under ASGI measured slower than in sequence, so the views stay synchronous.
+"""
+from datetime import timedelta
+
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from core.models import Trainer, Member
+from attendance.bitmaps import AttendanceBitmap
+from attendance.models import AttendanceRecord, MemberStreak
+from programs.models import Program
+from subscriptions.models import SubscriptionPlan, MemberSubscription
+from fitness.models import ProgressEntry
+from attendance.last_visit import dropped_out_members
+from attendance.streaks import get_streak
+from .models import DailyGymRollup
+from .reports import parse_range, revenue_series, attendance_series, dwell_series
+
+# Models each cached stats endpoint is derived from
+DASHBOARD_SOURCES = ['core.Member', 'attendance.AttendanceRecord', 'subscriptions.Payment', 'subscriptions.MemberSubscription', 'programs.Program']
+DROPOUT_SOURCES = ['core.Member', 'attendance.AttendanceRecord']
+REPORTS_SOURCES = ['attendance.AttendanceRecord', 'gym.DailyDwellSummary', 'subscriptions.Payment', 'subscriptions.MemberSubscription', 'subscriptions.SubscriptionPlan', 'core.Trainer', 'core.Member', 'programs.Program']
+
+
+def run_queries(queries):
+    """Run the queries of a stats endpoint one after another"""
+    return {name: query() for name, query in queries.items()}
+
+
+def dashboard_queries(today):
+    seven_days_ago = today - timedelta(days=7)
+    expiring_cutoff = today + timedelta(days=7)
+    six_months_ago = today - timedelta(days=180)
+
+    return {
+        'total_members': Member.objects.count,
+        'active_members': Member.objects.filter(status='active').count,
+        'active_programs': Program.objects.filter(status='active').count,
+        # Day-level totals come from the pre-aggregated rollup table
+        'window': lambda: list(DailyGymRollup.objects.filter(
+            date__gte=seven_days_ago,
+            date__lte=expiring_cutoff
+        )),
+        'month_totals': lambda: DailyGymRollup.objects.filter(date__gte=today.replace(day=1)).aggregate(
+            revenue=Sum('completed_revenue'),
+            new_members=Sum('new_members')
+        ),
+        # Dropout alerts (no attendance in 7 days)
+        'dropout_alerts': dropped_out_members(seven_days_ago).count,
+        # Revenue Trend (last 6 months)
+        'revenue_trend': lambda: list(DailyGymRollup.objects.filter(
+            date__gte=six_months_ago.replace(day=1),
+            completed_revenue__gt=0
+        ).annotate(
+            month_trunc=TruncMonth('date')
+        ).values('month_trunc').annotate(
+            total=Sum('completed_revenue')
+        ).order_by('month_trunc')),
+        'expiring_subscriptions': lambda: list(MemberSubscription.objects.filter(
+            end_date__gte=today,
+            end_date__lte=expiring_cutoff,
+            status='active'
+        ).select_related('member__user', 'plan')[:5]),
+    }
+
+
+def dashboard_payload(today, results):
+    window = {rollup.date: rollup for rollup in results['window']}
+    today_rollup = window.get(today)
+
+    # Alerts
+    expiring_sub_count = sum(
+        rollup.expiring_subscriptions for day, rollup in window.items() if day >= today
+    )
+
+    # Trends
+    # Attendance trend (last 7 days for dashboard)
+    attendance_trend = [
+        {
+            'date': day.strftime('%a'),
+            'count': rollup.attendance_count
+        } for day, rollup in sorted(window.items())
+        if day <= today and rollup.attendance_count
+    ]
+
+    revenue_trend = [
+        {
+            'month': item['month_trunc'].strftime('%b'),
+            'revenue': float(item['total'])
+        } for item in results['revenue_trend']
+    ]
+
+    # Expiring Subscriptions List
+    expiring_list = [
+        {
+            'id': sub.id,
+            'memberName': f"{sub.member.user.first_name} {sub.member.user.last_name}",
+            'planName': sub.plan.name,
+            'endDate': sub.end_date.isoformat(),
+            'amount': float(sub.plan.price)
+        } for sub in results['expiring_subscriptions']
+    ]
+
+    month_totals = results['month_totals']
+    return {
+        'overview': {
+            'totalMembers': results['total_members'],
+            'activeMembers': results['active_members'],
+            'todayAttendance': today_rollup.attendance_count if today_rollup else 0,
+            'monthlyRevenue': float(month_totals['revenue'] or 0),
+            'activePrograms': results['active_programs']
+        },
+        'alerts': {
+            'expiringSubscriptions': expiring_sub_count,
+            'dropoutAlerts': results['dropout_alerts'],
+            'newMembersThisMonth': month_totals['new_members'] or 0
+        },
+        'trends': {
+            'attendance': attendance_trend,
+            'revenue': revenue_trend
+        },
+        'expiringSubscriptionsList': expiring_list
+    }
+
+
+def reports_ranges(params, today):
+    """
+    Explicit from/to/bucket apply to every series; anything omitted falls back to
+    that series' default window. Raises ValueError on invalid parameters.
+    """
+    revenue_range = parse_range(
+        params,
+        default_start=(today - timedelta(days=180)).replace(day=1),
+        default_end=today,
+        default_bucket='month'
+    )
+    attendance_range = parse_range(
+        params,
+        default_start=today - timedelta(days=30),
+        default_end=today,
+        default_bucket='day'
+    )
+    return revenue_range, attendance_range
+
+
+def reports_queries(revenue_range, attendance_range):
+    return {
+        # 1. Revenue Analysis (last 6 months by default)
+        'revenue_analysis': lambda: revenue_series(*revenue_range),
+        # 2. Attendance trends (last 30 days by default)
+        'attendance_trends': lambda: attendance_series(*attendance_range),
+        # Visit length over the attendance range, from the daily dwell summaries
+        'dwell_time': lambda: dwell_series(*attendance_range),
+        # 3. Membership Distribution
+        'plans': lambda: list(SubscriptionPlan.objects.annotate(
+            member_count=Count('membersubscription')
+        ).values('name', 'member_count')),
+        # 4. Trainer Performance
+        'trainers': lambda: list(Trainer.objects.select_related('user').annotate(
+            members_count=Count('members', distinct=True),
+            programs_count=Count('created_programs', distinct=True)
+        )),
+    }
+
+
+def reports_payload(results):
+    membership_distribution = [
+        {
+            'name': plan['name'],
+            'value': plan['member_count']
+        } for plan in results['plans']
+    ]
+
+    trainer_performance = [
+        {
+            'name': f"{t.user.first_name} {t.user.last_name}",
+            'members': t.members_count,
+            'programs': t.programs_count,
+            'rating': 4.5 # Placeholder until rating system added
+        } for t in results['trainers']
+    ]
+
+    return {
+        'revenue_analysis': results['revenue_analysis'],
+        'attendance_trends': results['attendance_trends'],
+        'dwell_time': results['dwell_time'],
+        'membership_distribution': membership_distribution,
+        'trainer_performance': trainer_performance
+    }
+
+
+def member_dashboard_queries(member, today):
+    return {
+        'subscription': MemberSubscription.objects.filter(member=member, status='active').select_related('plan').first,
+        'programs': lambda: list(member.assigned_programs.filter(status='active').values(
+            'id', 'name', 'description', 'duration', 'difficulty', 'goal'
+        )),
+        # Attendance streak
+        'streak': lambda: get_streak(member, today)['current'],
+        # Weight change (last two entries)
+        'weight_entries': lambda: list(ProgressEntry.objects.filter(member=member).order_by('-date')[:2]),
+        'attendance_last_30': lambda: AttendanceBitmap.for_member(
+            member.id, years={(today - timedelta(days=30)).year, today.year}
+        ).count(today - timedelta(days=30)),
+    }
+
+
+def member_dashboard_sources(request, *args, **kwargs):
+    """Rows the member dashboard is built from, for conditional requests"""
+    user = request.user
+    thirty_days_ago = timezone.now().date() - timedelta(days=30)
+    return [
+        (Member.objects.filter(user=user), 'updated_at'),
+        (MemberSubscription.objects.filter(member__user=user, status='active'), 'updated_at'),
+        (SubscriptionPlan.objects.filter(membersubscription__member__user=user, membersubscription__status='active'), 'updated_at'),
+        (Program.objects.filter(assigned_members__user=user), 'updated_at'),
+        (Program.assigned_members.through.objects.filter(member__user=user), 'id'),
+        (MemberStreak.objects.filter(member__user=user), 'updated_at'),
+        (ProgressEntry.objects.filter(member__user=user), 'updated_at'),
+        (AttendanceRecord.objects.filter(member__user=user, date__gte=thirty_days_ago), 'updated_at'),
+    ]
+
+
+def member_dashboard_extra(request):
+    # Streak, expiry and the 30-day window move with the date; the name comes from the user row
+    return [timezone.now().date(), request.user.first_name, request.user.last_name]
+
+
+def member_dashboard_payload(member, today, results):
+    # 1. Member Info
+    member_info = {
+        'name': f"{member.user.first_name} {member.user.last_name}",
+        'avatar': None # Placeholder
+    }
+
+    # 2. Subscription Info
+    sub = results['subscription']
+    subscription = None
+    days_until_expiry = 0
+    if sub:
+        days_until_expiry = (sub.end_date - today).days
+        subscription = {
+            'plan_name': sub.plan.name,
+            'end_date': sub.end_date.isoformat(),
+            'status': sub.status,
+            'days_until_expiry': max(0, days_until_expiry)
+        }
+
+    # 3. Programs
+    active_programs = results['programs']
+
+    # 4. Stats
+    weight_entries = results['weight_entries']
+    weight_change = 0
+    if len(weight_entries) >= 2:
+        weight_change = float(weight_entries[0].weight - weight_entries[1].weight)
+
+    return {
+        'member_info': member_info,
+        'subscription': subscription,
+        'programs': active_programs,
+        'stats': {
+            'attendance_streak': results['streak'],
+            'weight_change': weight_change,
+            'active_programs_count': len(active_programs),
+            'days_until_expiry': max(0, days_until_expiry),
+            'attendance_last_30_days': results['attendance_last_30']
+        }
+    }
@@ -1,3 +1,419 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import NOT_PROVIDED, Sum
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from attendance.archive import archive_attendance, archive_cutoff, month_end
+from attendance.models import AttendanceRecord
+from attendance.occupancy import current_occupancy
+from attendance.signals import attendance_changed, bulk_change
+from core.models import Member
+from fitness.models import ProgressEntry
+from shared.cache import CACHE_HEADER, _generation_key
+from subscriptions.models import SubscriptionPlan, MemberSubscription, Payment
+from .dwell import histogram_percentile, refresh_dwell_summaries
+from .heatmap import build_heatmap, week_start
+from .management.commands.generate_load_data import Command as GenerateLoadData
+from .models import DailyGymRollup, DailyDwellSummary
+from .reports import dwell_series
+
+User = get_user_model()
+
+
+def make_user(name, role):
+    return User.objects.create_user(
+        email=f'{name}@example.com',
+        username=name,
+        password='password123',
+        first_name=name.title(),
+        last_name='Tester',
+        role=role
+    )
+
+
+def make_member(name):
+    return Member.objects.create(
+        user=make_user(name, 'member'),
+        date_of_birth=date(1990, 1, 1),
+        gender='female',
+        address='1 Test Street',
+        join_date=timezone.now().date()
+    )
+
+
+class StatsCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(make_user('admin', 'admin'))
+
+    def get(self, name='dashboard-stats', **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_repeated_request_is_served_from_the_cache(self):
+        first, second = self.get(), self.get()
+        self.assertEqual((first[CACHE_HEADER], second[CACHE_HEADER]), ('MISS', 'HIT'))
+        self.assertEqual(first.data, second.data)
+
+    def test_query_parameters_are_part_of_the_key(self):
+        self.get('dropout-list')
+        self.assertEqual(self.get('dropout-list', days=30)[CACHE_HEADER], 'MISS')
+        self.assertEqual(self.get('dropout-list', days=30)[CACHE_HEADER], 'HIT')
+
+    def test_writes_to_a_source_model_invalidate(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_member('member')
+        response = self.get()
+        self.assertEqual(response[CACHE_HEADER], 'MISS')
+        self.assertEqual(response.data['data']['overview']['totalMembers'], 1)
+        self.assertEqual(self.get()[CACHE_HEADER], 'HIT')
+
+    def test_bulk_attendance_changes_invalidate(self):
+        member = make_member('member')
+        self.get('dropout-list')
+        today = timezone.now().date()
+        with self.captureOnCommitCallbacks(execute=True):
+            with bulk_change():
+                AttendanceRecord.objects.create(member=member, date=today, check_in_time=timezone.now(), method='manual')
+            attendance_changed.send(sender=AttendanceRecord, member_ids={member.id}, dates={today})
+        self.assertEqual(self.get('dropout-list')[CACHE_HEADER], 'MISS')
+
+    def test_unrelated_writes_keep_entries(self):
+        self.get('dropout-list')
+        with self.captureOnCommitCallbacks(execute=True):
+            SubscriptionPlan.objects.create(name='Monthly', duration=30, price=50)
+        self.assertEqual(self.get('dropout-list')[CACHE_HEADER], 'HIT')
+
+    def test_failed_responses_are_not_cached(self):
+        for _ in range(2):
+            response = self.client.get(reverse('dropout-list'), {'days': 'week'})
+            self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+            self.assertEqual(response[CACHE_HEADER], 'MISS')
+
+    def test_evicted_generation_starts_a_new_one(self):
+        self.get('dropout-list')
+        cache.delete(_generation_key('core.Member'))
+        self.assertEqual(self.get('dropout-list')[CACHE_HEADER], 'MISS')
+        self.assertEqual(self.get('dropout-list')[CACHE_HEADER], 'HIT')
+
+    def test_zero_ttl_disables_the_cache(self):
+        with self.settings(STATS_CACHE_TTL=0):
+            self.assertEqual([self.get()[CACHE_HEADER] for _ in range(2)], ['MISS', 'MISS'])
+
+
+class MemberDashboardETagTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.member = make_member('member')
+        self.today = timezone.now().date()
+        plan = SubscriptionPlan.objects.create(name='Monthly', duration=30, price=50)
+        self.subscription = MemberSubscription.objects.create(
+            member=self.member, plan=plan, start_date=self.today, end_date=self.today + timedelta(days=30),
+            status='active', payment_status='paid', amount=50
+        )
+        self.client.force_authenticate(self.member.user)
+        self.url = reverse('member-dashboard-stats')
+
+    def get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(self.url, **headers)
+
+    def assertChanged(self, etag):
+        response = self.get(etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_unchanged_dashboard_is_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_dashboard_sources_change_the_etag(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceRecord.objects.create(member=self.member, date=self.today, check_in_time=timezone.now(), method='qr')
+        etag = self.assertChanged(etag)
+
+        ProgressEntry.objects.create(member=self.member, date=self.today, weight=70)
+        etag = self.assertChanged(etag)
+
+        self.subscription.end_date += timedelta(days=30)
+        self.subscription.save()
+        etag = self.assertChanged(etag)
+
+        self.member.user.last_name = 'Renamed'
+        self.member.user.save()
+        self.assertChanged(etag)
+
+    def test_new_day_changes_the_etag(self):
+        etag = self.get()['ETag']
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.now', return_value=tomorrow):
+            self.assertChanged(etag)
+
+    def test_other_members_do_not_change_the_etag(self):
+        etag = self.get()['ETag']
+        other = make_member('other')
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceRecord.objects.create(member=other, date=self.today, check_in_time=timezone.now(), method='qr')
+        ProgressEntry.objects.create(member=other, date=self.today, weight=80)
+        self.assertEqual(self.get(etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+def visit(member, day, hour):
+    return AttendanceRecord.objects.create(
+        member=member, date=day, method='qr',
+        check_in_time=timezone.make_aware(datetime.combine(day, time(hour)))
+    )
+
+
+class AttendanceHeatmapTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.members = [make_member(f'member{i}') for i in range(3)]
+        # Wednesday of a closed week, whose grid gets cached
+        self.closed_day = week_start(self.today) - timedelta(weeks=2) + timedelta(days=2)
+        self.start = week_start(self.today) - timedelta(weeks=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record = visit(self.members[0], self.closed_day, 9)
+
+    def cell(self, day, hour):
+        return build_heatmap(self.start, self.today, self.today)[day.weekday()][hour]
+
+    def test_cached_week_is_recounted_after_changes(self):
+        self.assertEqual(self.cell(self.closed_day, 9), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            visit(self.members[1], self.closed_day, 9)
+        self.assertEqual(self.cell(self.closed_day, 9), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record.delete()
+        self.assertEqual(self.cell(self.closed_day, 9), 1)
+
+    def test_bulk_changes_invalidate_cached_weeks(self):
+        self.assertEqual(self.cell(self.closed_day, 9), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_authenticate(make_user('frontdesk', 'admin'))
+            response = self.client.post(reverse('attendance-mark-bulk'), {'records': [
+                {'member_id': member.id, 'date': self.closed_day.isoformat(), 'status': 'present'}
+                for member in self.members[1:]
+            ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        grid = build_heatmap(self.start, self.today, self.today)
+        self.assertEqual(sum(grid[self.closed_day.weekday()]), 3)
+
+    def test_open_week_is_always_counted(self):
+        self.assertEqual(self.cell(self.today, 7), 0)
+        # No signals, no invalidation: the open week is read from the table on every call
+        AttendanceRecord.objects.bulk_create([AttendanceRecord(
+            member=self.members[1], date=self.today, method='qr',
+            check_in_time=timezone.make_aware(datetime.combine(self.today, time(7)))
+        )])
+        self.assertEqual(self.cell(self.today, 7), 1)
+
+    def test_archived_dates_are_skipped(self):
+        self.client.force_authenticate(make_user('admin', 'admin'))
+        url = reverse('attendance-heatmap')
+        through = self.closed_day - timedelta(days=1)
+        with mock.patch('gym.views.archived_through', return_value=through):
+            response = self.client.get(url, {'from': self.start.isoformat()})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.data['data']
+            self.assertEqual(data['from'], self.closed_day.isoformat())
+            self.assertEqual(data['archived_through'], through.isoformat())
+            self.assertEqual(data['total'], 1)
+
+            response = self.client.get(url, {'from': self.start.isoformat(), 'to': through.isoformat()})
+            self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+
+class ReportsRangeTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        self.client.force_authenticate(make_user('admin', 'admin'))
+        self.url = reverse('reports-stats')
+
+    def reports(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['data']
+
+    def test_default_month_labels(self):
+        revenue = self.reports()['revenue_analysis']
+        self.assertEqual(revenue[-1]['month'], self.today.strftime('%b'))
+        self.assertEqual(revenue[-1]['period'], self.today.replace(day=1).isoformat())
+
+    def test_month_labels_name_the_year_beyond_twelve_months(self):
+        member = make_member('member')
+        plan = SubscriptionPlan.objects.create(name='Monthly', duration=30, price=50)
+        subscription = MemberSubscription.objects.create(
+            member=member, plan=plan, start_date=self.today, end_date=self.today + timedelta(days=30),
+            status='active', payment_status='paid', amount=50
+        )
+        Payment.objects.create(subscription=subscription, amount=50, method='card', status='completed', transaction_date=timezone.now())
+
+        start = (self.today.replace(day=1) - timedelta(days=500)).replace(day=1)
+        revenue = self.reports(**{'from': start.isoformat()})['revenue_analysis']
+        labels = [row['month'] for row in revenue]
+        self.assertEqual(len(labels), len(set(labels)))
+        self.assertEqual(labels[-1], self.today.strftime('%b %Y'))
+        self.assertEqual(revenue[-1]['revenue'], 50.0)
+
+    def test_long_range_gets_a_coarser_bucket(self):
+        start = self.today - timedelta(days=1500)
+        trends = self.reports(**{'from': start.isoformat()})['attendance_trends']
+        self.assertLessEqual(len(trends), 1000)
+        first, second = (date.fromisoformat(row['period']) for row in trends[:2])
+        self.assertEqual((second - first).days, 7)
+
+    def test_explicit_bucket_is_kept(self):
+        start = self.today - timedelta(days=1500)
+        response = self.client.get(self.url, {'from': start.isoformat(), 'bucket': 'day'})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        response = self.client.get(self.url, {'bucket': 'year'})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_archived_months_are_counted(self):
+        members = [make_member(f'member{n}') for n in range(2)]
+        month = (self.today - timedelta(days=400)).replace(day=1)
+        days = [month + timedelta(days=n) for n in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            for member, day in ((members[0], days[0]), (members[0], days[1]), (members[1], days[0])):
+                AttendanceRecord.objects.create(member=member, date=day, check_in_time=timezone.now(), method='qr')
+            archive_attendance(archive_cutoff(self.today, horizon_days=180))
+            # Marked late: one a day the archive already has, one a new day
+            for member, day in ((members[0], days[0]), (members[1], days[2])):
+                AttendanceRecord.objects.create(member=member, date=day, check_in_time=timezone.now(), method='manual')
+
+        trends = self.reports(**{'from': month.isoformat(), 'to': month_end(month).isoformat(), 'bucket': 'month'})
+        row, = trends['attendance_trends']
+        self.assertEqual((row['count'], row['unique_members'], row['archived']), (4, 2, 2))
+        self.assertEqual(row['by_method']['manual'], 2)
+        self.assertEqual(DailyGymRollup.objects.get(date=days[0]).attendance_count, 2)
+
+
+class DwellTimeTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.members = [make_member(f'member{n}') for n in range(3)]
+
+    def visit(self, member, day, minutes=None, check_in=None):
+        check_in = check_in or timezone.make_aware(datetime.combine(day, time(9)))
+        check_out = check_in + timedelta(minutes=minutes) if minutes is not None else None
+        with self.captureOnCommitCallbacks(execute=True):
+            return AttendanceRecord.objects.create(
+                member=member, date=day, check_in_time=check_in, check_out_time=check_out, method='qr'
+            )
+
+    def test_histogram_percentile_interpolates_inside_a_bin(self):
+        self.assertEqual(histogram_percentile([4] + [0] * 24, 0.5), 7.5)
+        self.assertEqual(histogram_percentile([0, 1, 1], 0.5), 30.0)
+        self.assertIsNone(histogram_percentile([0] * 25, 0.5))
+
+    def test_auto_check_out_closes_stale_visits_only(self):
+        now = timezone.now()
+        today = timezone.localdate(now)
+        stale = self.visit(self.members[0], today, check_in=now - timedelta(hours=5))
+        fresh = self.visit(self.members[1], today, check_in=now - timedelta(hours=1))
+        self.visit(self.members[2], today, minutes=30, check_in=now - timedelta(hours=6))
+        self.assertEqual(current_occupancy(today), 2)
+
+        call_command('auto_check_out', after_hours=4, stdout=StringIO())
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.check_out_time, stale.check_in_time + timedelta(hours=4))
+        self.assertTrue(stale.auto_checked_out)
+        self.assertIsNone(fresh.check_out_time)
+        self.assertEqual(current_occupancy(today), 1)
+
+        # The automatic check-out is counted but kept out of the statistics
+        summary = DailyDwellSummary.objects.get(date=today)
+        self.assertEqual((summary.visits, summary.auto_closed, summary.median_minutes), (1, 1, 30.0))
+
+    def test_weeks_merge_the_daily_histograms(self):
+        monday = week_start(timezone.now().date()) - timedelta(weeks=2)
+        self.visit(self.members[0], monday, minutes=20)
+        self.visit(self.members[1], monday, minutes=40)
+        self.visit(self.members[2], monday + timedelta(days=1), minutes=100)
+        refresh_dwell_summaries(monday, monday + timedelta(days=6))
+
+        daily = dwell_series(monday, monday, 'day')
+        self.assertEqual((daily[0]['visits'], daily[0]['median_minutes']), (2, 30.0))
+        week, = dwell_series(monday, monday + timedelta(days=6), 'week')
+        self.assertEqual((week['visits'], week['average_minutes'], week['median_minutes']), (3, 53.3, 37.5))
+
+    def test_refresh_removes_days_without_visits(self):
+        day = timezone.now().date() - timedelta(days=3)
+        record = self.visit(self.members[0], day, minutes=45)
+        refresh_dwell_summaries(day, day)
+        record.delete()
+        refresh_dwell_summaries(day, day)
+        self.assertFalse(DailyDwellSummary.objects.exists())
+
+
+class GenerateLoadDataTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def generate(self, **options):
+        call_command('generate_load_data', members=5, days=30, end_date='2026-01-31', stdout=StringIO(), **options)
+
+    def assertDataGenerated(self):
+        self.assertEqual(Member.objects.count(), 5)
+        self.assertTrue(AttendanceRecord.objects.exists())
+        self.assertFalse(AttendanceRecord.objects.filter(sync_pending=True).exists())
+        # The derived tables are rebuilt from what was written
+        total = DailyGymRollup.objects.aggregate(total=Sum('attendance_count'))['total']
+        self.assertEqual(total, AttendanceRecord.objects.count())
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY needs PostgreSQL')
+    def test_copy_path(self):
+        self.generate()
+        self.assertDataGenerated()
+
+    def test_streamed_rows_fill_every_required_column(self):
+        # COPY gets no Django defaults, so a NOT NULL column missing from a stream fails there
+        streamed = {}
+        write_batch = GenerateLoadData._write_batch
+
+        def record_fields(command, model, fields, columns, batch):
+            streamed[model] = fields
+            return write_batch(command, model, fields, columns, batch)
+
+        with mock.patch.object(GenerateLoadData, '_write_batch', autospec=True, side_effect=record_fields):
+            self.generate(no_copy=True)
+        self.assertIn(AttendanceRecord, streamed)
+        for model, fields in streamed.items():
+            required = {
+                field.attname for field in model._meta.concrete_fields
+                if not field.null and not field.primary_key and field.db_default is NOT_PROVIDED
+            }
+            self.assertEqual(required - set(fields), set(), model.__name__)
+
+    def test_bulk_create_path(self):
+        self.generate(no_copy=True)
+        self.assertDataGenerated()
+
+    def test_refuses_to_run_twice(self):
+        self.generate(no_copy=True)
+        with self.assertRaises(CommandError):
+            self.generate(no_copy=True)
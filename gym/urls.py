@@ -1,5 +1,5 @@
 from django.urls import path, include
-from gym.views import DashboardStatsView, ReportsStatsView, MemberDashboardStatsView
+from gym.views import DashboardStatsView, DropoutListView, AttendanceHeatmapView, ReportsStatsView, MemberDashboardStatsView
 from attendance.views import MemberAttendanceStatsView, TrainerMemberAttendanceView
 from fitness.views import ProgressEntryListView
 from subscriptions.views import SubscriptionPlanListView, MemberSubscriptionListView, PaymentListView
@@ -8,6 +8,8 @@ from chat.views import MessageListView
 urlpatterns = [
     # Dashboard & Reports Stats (Keeping in gym app for now)
     path('stats/dashboard/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('stats/dropouts/', DropoutListView.as_view(), name='dropout-list'),
+    path('stats/attendance-heatmap/', AttendanceHeatmapView.as_view(), name='attendance-heatmap'),
     path('stats/reports/', ReportsStatsView.as_view(), name='reports-stats'),
     path('stats/member-dashboard/', MemberDashboardStatsView.as_view(), name='member-dashboard-stats'),
     
@@ -11,8 +11,23 @@ from fitness.models import ProgressEntry, MemberAchievement
 from chat.models import Message
 from scheduling.models import Session
 from notifications.models import Notification
+from attendance.last_visit import dropped_out_members
+from attendance.archive import archived_through
+from .stats import (
+    DASHBOARD_SOURCES, DROPOUT_SOURCES, REPORTS_SOURCES,
+    run_queries,
+    dashboard_queries, dashboard_payload,
+    reports_ranges, reports_queries, reports_payload,
+    member_dashboard_queries, member_dashboard_payload,
+    member_dashboard_sources, member_dashboard_extra,
+)
+
+from .heatmap import WEEKDAYS, week_start, build_heatmap
+from .reports import parse_range
 
 from shared.permissions import IsAdminUser, IsTrainer, IsMember, IsAdminOrTrainer
+from shared.cache import cached_response
+from shared.conditional import conditional_response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from shared.responses import (
     handle_success,
@@ -21,7 +36,7 @@ from shared.responses import (
     handle_not_found,
 )
 from django.utils import timezone
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Q, F
 from django.db.models.functions import TruncMonth, TruncDate
 from datetime import timedelta
 
@@ -30,188 +45,152 @@ class DashboardStatsView(views.APIView):
     permission_classes = [IsAdminUser]
 
     @swagger_auto_schema(tags=['Stats'], operation_summary='Get dashboard overview statistics')
+    @cached_response('dashboard', depends_on=DASHBOARD_SOURCES)
     def get(self, request):
         try:
             today = timezone.now().date()
-            month_start = today.replace(day=1)
-            
-            # Overview
-            total_members = Member.objects.count()
-            active_members = Member.objects.filter(status='active').count()
-            today_attendance = AttendanceRecord.objects.filter(date=today).count()
-            active_programs = Program.objects.filter(status='active').count()
-            
-            monthly_revenue = Payment.objects.filter(
-                transaction_date__date__gte=month_start,
-                status='completed'
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            results = run_queries(dashboard_queries(today))
+            data = dashboard_payload(today, results)
+            return handle_success(data=data, message="Dashboard stats retrieved successfully")
+        except Exception as e:
+            return handle_error(message=f"Failed to retrieve stats: {str(e)}")
 
-            # Alerts
-            expiring_cutoff = today + timedelta(days=7)
-            expiring_sub_count = MemberSubscription.objects.filter(
-                end_date__gte=today,
-                end_date__lte=expiring_cutoff,
-                status='active'
-            ).count()
-            
-            # Dropout alerts (no attendance in 7 days)
-            seven_days_ago = today - timedelta(days=7)
-            active_member_ids = Member.objects.filter(status='active').values_list('id', flat=True)
-            recent_attendance_member_ids = AttendanceRecord.objects.filter(
-                date__gte=seven_days_ago
-            ).values_list('member_id', flat=True).distinct()
-            dropout_alerts = len(set(active_member_ids) - set(recent_attendance_member_ids))
-            
-            new_members_this_month = Member.objects.filter(user__date_joined__date__gte=month_start).count()
+class DropoutListView(views.APIView):
+    permission_classes = [IsAdminUser]
 
-            # Trends
-            # Attendance trend (last 7 days for dashboard)
-            seven_days_ago_trend = today - timedelta(days=7)
-            attendance_query = AttendanceRecord.objects.filter(
-                date__gte=seven_days_ago_trend
-            ).values('date').annotate(
-                count=Count('id')
-            ).order_by('date')
+    @swagger_auto_schema(
+        tags=['Stats'],
+        operation_summary='List active members who stopped attending',
+        manual_parameters=[
+            openapi.Parameter('days', openapi.IN_QUERY, description="Days without a visit (default 7)", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('page', openapi.IN_QUERY, description="Page number (default 1)", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Results per page (default 20, max 100)", type=openapi.TYPE_INTEGER),
+        ]
+    )
+    @cached_response('dropouts', depends_on=DROPOUT_SOURCES)
+    def get(self, request):
+        try:
+            try:
+                days = int(request.query_params.get('days', 7))
+                page = int(request.query_params.get('page', 1))
+                page_size = min(int(request.query_params.get('page_size', 20)), 100)
+            except ValueError:
+                return handle_validation_error(errors={'detail': 'days, page and page_size must be integers'})
+            if days < 1 or page < 1 or page_size < 1:
+                return handle_validation_error(errors={'detail': 'days, page and page_size must be positive'})
 
-            attendance_trend = [
-                {
-                    'date': item['date'].strftime('%a'),
-                    'count': item['count']
-                } for item in attendance_query
-            ]
+            today = timezone.now().date()
+            cutoff = today - timedelta(days=days)
+            dropouts = dropped_out_members(cutoff)
+            total = dropouts.count()
 
-            # Revenue Trend (last 6 months)
-            six_months_ago = today - timedelta(days=180)
-            revenue_query = Payment.objects.filter(
-                transaction_date__date__gte=six_months_ago.replace(day=1),
-                status='completed'
-            ).annotate(
-                month_trunc=TruncMonth('transaction_date')
-            ).values('month_trunc').annotate(
-                total=Sum('amount')
-            ).order_by('month_trunc')
+            offset = (page - 1) * page_size
+            members = dropouts.select_related('user').order_by(
+                F('last_attended_on').asc(nulls_first=True), 'id'
+            )[offset:offset + page_size]
 
-            revenue_trend = [
+            results = [
                 {
-                    'month': item['month_trunc'].strftime('%b'),
-                    'revenue': float(item['total'])
-                } for item in revenue_query
+                    'id': member.id,
+                    'name': f"{member.user.first_name} {member.user.last_name}",
+                    'email': member.user.email,
+                    'last_attended_on': member.last_attended_on.isoformat() if member.last_attended_on else None,
+                    'days_absent': (today - member.last_attended_on).days if member.last_attended_on else None
+                } for member in members
             ]
 
-            # Expiring Subscriptions List
-            expiring_subs = MemberSubscription.objects.filter(
-                end_date__gte=today,
-                end_date__lte=expiring_cutoff,
-                status='active'
-            ).select_related('member__user', 'plan')[:5]
-            
-            expiring_list = [
-                {
-                    'id': sub.id,
-                    'memberName': f"{sub.member.user.first_name} {sub.member.user.last_name}",
-                    'planName': sub.plan.name,
-                    'endDate': sub.end_date.isoformat(),
-                    'amount': float(sub.plan.price)
-                } for sub in expiring_subs
-            ]
+            data = {
+                'count': total,
+                'page': page,
+                'page_size': page_size,
+                'results': results
+            }
+            return handle_success(data=data, message="Dropped out members retrieved successfully")
+        except Exception as e:
+            return handle_error(message=f"Failed to retrieve dropouts: {str(e)}")
+
+class AttendanceHeatmapView(views.APIView):
+    permission_classes = [IsAdminUser]
 
+    @swagger_auto_schema(
+        tags=['Stats'],
+        operation_summary='Visits by weekday and hour of check-in',
+        manual_parameters=[
+            openapi.Parameter('from', openapi.IN_QUERY, description="Start date (YYYY-MM-DD), defaults to 12 weeks ago; archived dates are skipped", type=openapi.TYPE_STRING),
+            openapi.Parameter('to', openapi.IN_QUERY, description="End date (YYYY-MM-DD), defaults to today", type=openapi.TYPE_STRING),
+        ]
+    )
+    def get(self, request):
+        try:
+            today = timezone.now().date()
+            try:
+                start, end, _ = parse_range(
+                    {name: request.query_params.get(name) for name in ('from', 'to')},
+                    default_start=week_start(today) - timedelta(weeks=11),
+                    default_end=today,
+                    default_bucket='week'
+                )
+            except ValueError as e:
+                return handle_validation_error(errors={'detail': str(e)})
+
+            # Archived months keep the days visited but not the check-in hours
+            through = archived_through()
+            if through is not None and start <= through:
+                if end <= through:
+                    return handle_validation_error(
+                        errors={'detail': f'Attendance up to {through.isoformat()} is archived and has no check-in hours'}
+                    )
+                start = through + timedelta(days=1)
+
+            grid = build_heatmap(start, end, today)
+            total = sum(map(sum, grid))
+            peak = max(
+                ((weekday, hour) for weekday in range(len(WEEKDAYS)) for hour in range(24)),
+                key=lambda cell: grid[cell[0]][cell[1]]
+            )
             data = {
-                'overview': {
-                    'totalMembers': total_members,
-                    'activeMembers': active_members,
-                    'todayAttendance': today_attendance,
-                    'monthlyRevenue': float(monthly_revenue),
-                    'activePrograms': active_programs
-                },
-                'alerts': {
-                    'expiringSubscriptions': expiring_sub_count,
-                    'dropoutAlerts': dropout_alerts,
-                    'newMembersThisMonth': new_members_this_month
-                },
-                'trends': {
-                    'attendance': attendance_trend,
-                    'revenue': revenue_trend
-                },
-                'expiringSubscriptionsList': expiring_list
+                'from': start.isoformat(),
+                'to': end.isoformat(),
+                # A requested start on or before this date was moved to the day after
+                'archived_through': through.isoformat() if through else None,
+                'days': WEEKDAYS,
+                'hours': list(range(24)),
+                'grid': grid,
+                'total': total,
+                'peak': {
+                    'day': WEEKDAYS[peak[0]],
+                    'hour': peak[1],
+                    'visits': grid[peak[0]][peak[1]]
+                } if total else None
             }
-            return handle_success(data=data, message="Dashboard stats retrieved successfully")
+            return handle_success(data=data, message="Attendance heatmap retrieved successfully")
         except Exception as e:
-            return handle_error(message=f"Failed to retrieve stats: {str(e)}")
+            return handle_error(message=f"Failed to retrieve heatmap: {str(e)}")
 
 class ReportsStatsView(views.APIView):
     permission_classes = [IsAdminUser]
 
-    @swagger_auto_schema(tags=['Stats'], operation_summary='Get detailed reports and analytics')
+    @swagger_auto_schema(
+        tags=['Stats'],
+        operation_summary='Get detailed reports and analytics',
+        manual_parameters=[
+            openapi.Parameter('from', openapi.IN_QUERY, description="Start date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter('to', openapi.IN_QUERY, description="End date (YYYY-MM-DD), defaults to today", type=openapi.TYPE_STRING),
+            openapi.Parameter('bucket', openapi.IN_QUERY, description="Grouping granularity. Defaults to month for revenue and day for attendance, or coarser when the range would exceed 1000 buckets", type=openapi.TYPE_STRING, enum=['day', 'week', 'month']),
+        ]
+    )
+    @cached_response('reports', depends_on=REPORTS_SOURCES)
     def get(self, request):
         try:
             today = timezone.now().date()
             
-            # 1. Revenue Analysis (last 6 months)
-            six_months_ago = today - timedelta(days=180)
-            revenue_query = Payment.objects.filter(
-                transaction_date__date__gte=six_months_ago.replace(day=1),
-                status='completed'
-            ).annotate(
-                month_trunc=TruncMonth('transaction_date')
-            ).values('month_trunc').annotate(
-                total=Sum('amount')
-            ).order_by('month_trunc')
+            try:
+                revenue_range, attendance_range = reports_ranges(request.query_params, today)
+            except ValueError as e:
+                return handle_validation_error(errors={'detail': str(e)})
 
-            revenue_analysis = [
-                {
-                    'month': item['month_trunc'].strftime('%b'),
-                    'revenue': float(item['total'])
-                } for item in revenue_query
-            ]
-
-            # 2. Attendance trends (last 30 days)
-            thirty_days_ago = today - timedelta(days=30)
-            attendance_query = AttendanceRecord.objects.filter(
-                date__gte=thirty_days_ago
-            ).values('date').annotate(
-                count=Count('id')
-            ).order_by('date')
-
-            attendance_trends = [
-                {
-                    'date': item['date'].strftime('%Y-%m-%d'),
-                    'count': item['count']
-                } for item in attendance_query
-            ]
-
-            # 3. Membership Distribution
-            plans_data = SubscriptionPlan.objects.annotate(
-                member_count=Count('membersubscription')
-            ).values('name', 'member_count')
-
-            membership_distribution = [
-                {
-                    'name': plan['name'],
-                    'value': plan['member_count']
-                } for plan in plans_data
-            ]
-
-            # 4. Trainer Performance
-            trainers = Trainer.objects.select_related('user').annotate(
-                members_count=Count('member', distinct=True),
-                programs_count=Count('program', distinct=True)
-            )
-
-            trainer_performance = [
-                {
-                    'name': f"{t.user.first_name} {t.user.last_name}",
-                    'members': t.members_count,
-                    'programs': t.programs_count,
-                    'rating': 4.5 # Placeholder until rating system added
-                } for t in trainers
-            ]
-
-            data = {
-                'revenue_analysis': revenue_analysis,
-                'attendance_trends': attendance_trends,
-                'membership_distribution': membership_distribution,
-                'trainer_performance': trainer_performance
-            }
+            results = run_queries(reports_queries(revenue_range, attendance_range))
+            data = reports_payload(results)
             return handle_success(data=data, message="Reports stats retrieved successfully")
         except Exception as e:
             return handle_error(message=f"Failed to retrieve reports: {str(e)}")
@@ -220,71 +199,13 @@ class MemberDashboardStatsView(views.APIView):
     permission_classes = [IsMember]
 
     @swagger_auto_schema(tags=['Stats'], operation_summary='Get member dashboard summary')
+    @conditional_response(member_dashboard_sources, extra=member_dashboard_extra)
     def get(self, request):
         try:
             member = Member.objects.select_related('user').get(user=request.user)
             today = timezone.now().date()
-            
-            # 1. Member Info
-            member_info = {
-                'name': f"{member.user.first_name} {member.user.last_name}",
-                'avatar': None # Placeholder
-            }
-            
-            # 2. Subscription Info
-            sub = MemberSubscription.objects.filter(member=member, status='active').select_related('plan').first()
-            subscription = None
-            days_until_expiry = 0
-            if sub:
-                days_until_expiry = (sub.end_date - today).days
-                subscription = {
-                    'plan_name': sub.plan.name,
-                    'end_date': sub.end_date.isoformat(),
-                    'status': sub.status,
-                    'days_until_expiry': max(0, days_until_expiry)
-                }
-            
-            # 3. Programs
-            active_programs = list(member.assigned_programs.filter(status='active').values(
-                'id', 'name', 'description', 'duration', 'difficulty', 'goal'
-            ))
-
-            # 4. Stats
-            # Attendance streak
-            streak = 0
-            check_date = today
-            # If no attendance today, check from yesterday
-            if not AttendanceRecord.objects.filter(member=member, date=check_date).exists():
-                check_date -= timedelta(days=1)
-                
-            while AttendanceRecord.objects.filter(member=member, date=check_date).exists():
-                streak += 1
-                check_date -= timedelta(days=1)
-                if streak > 365: break # Safety break
-            
-            # Weight change (last 30 days or last two entries)
-            weight_entries = ProgressEntry.objects.filter(member=member).order_by('-date')[:2]
-            weight_change = 0
-            if len(weight_entries) >= 2:
-                weight_change = float(weight_entries[0].weight - weight_entries[1].weight)
-            
-            attendance_last_30 = AttendanceRecord.objects.filter(
-                member=member, 
-                date__gte=today - timedelta(days=30)
-            ).count()
-
-            data = {
-                'member_info': member_info,
-                'subscription': subscription,
-                'programs': active_programs,
-                'stats': {
-                    'attendance_streak': streak,
-                    'weight_change': weight_change,
-                    'active_programs_count': len(active_programs),
-                    'days_until_expiry': max(0, days_until_expiry),
-                    'attendance_last_30_days': attendance_last_30
-                }
-            }
+            results = run_queries(member_dashboard_queries(member, today))
+            data = member_dashboard_payload(member, today, results)
             return handle_success(data=data, message="Member dashboard stats retrieved successfully")
         except Member.DoesNotExist:
              return handle_error(message="Member profile not found")
@@ -1,7 +1,9 @@
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from shared.pubsub import publish, user_channel
 from .models import Notification
-from .utils import send_notification_email
+from .utils import send_notification_email, notification_event, NOTIFICATION_EVENT
 import threading
 
 @receiver(post_save, sender=Notification)
@@ -10,3 +12,10 @@ def send_email_on_notification_create(sender, instance, created, **kwargs):
         # Send email in a separate thread to avoid blocking the response
         email_thread = threading.Thread(target=send_notification_email, args=(instance,))
         email_thread.start()
+
+
+@receiver(post_save, sender=Notification)
+def push_notification_on_create(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        data = notification_event(instance)
+        transaction.on_commit(lambda: publish([user_channel(instance.recipient_id)], NOTIFICATION_EVENT, data))
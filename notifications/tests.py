@@ -1,3 +1,118 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from shared.pubsub import get_broker, user_channel
+from .models import Notification
+from .utils import NOTIFICATION_EVENT
+
+User = get_user_model()
+
+
+def make_notification(recipient, title):
+    # email_sent skips the background email thread, which would save the row again
+    return Notification.objects.create(recipient=recipient, title=title, message='Hello', email_sent=True)
+
+
+def make_user(name, role='member'):
+    return User.objects.create_user(
+        email=f'{name}@example.com',
+        username=name,
+        password='password123',
+        first_name=name.title(),
+        last_name='Tester',
+        role=role
+    )
+
+
+class NotificationListETagTest(APITestCase):
+    def setUp(self):
+        self.user = make_user('member')
+        self.notification = make_notification(self.user, 'Welcome')
+        self.client.force_authenticate(self.user)
+        self.url = reverse('notification-list')
+
+    def get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(self.url, **headers)
+
+    def assertChanged(self, etag):
+        response = self.get(etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_changes_to_own_notifications_change_the_etag(self):
+        etag = self.get()['ETag']
+        make_notification(self.user, 'Reminder')
+        etag = self.assertChanged(etag)
+
+        self.client.patch(reverse('notification-read', args=[self.notification.pk]))
+        etag = self.assertChanged(etag)
+
+        # A deletion lowers the row count even though no timestamp moved forward
+        Notification.objects.filter(pk=self.notification.pk).delete()
+        etag = self.assertChanged(etag)
+
+        # The embedded recipient details come from the user row
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertChanged(etag)
+
+    def test_other_users_notifications_do_not_change_the_etag(self):
+        etag = self.get()['ETag']
+        make_notification(make_user('other'), 'Welcome')
+        self.assertEqual(self.get(etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_is_per_user(self):
+        etag = self.get()['ETag']
+        other = make_user('other')
+        make_notification(other, 'Welcome')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.get(etag).status_code, status.HTTP_200_OK)
+
+
+class NotificationPushTest(APITestCase):
+    def setUp(self):
+        get_broker.cache_clear()
+        self.addCleanup(get_broker.cache_clear)
+        self.user = make_user('member')
+        self.channels = [user_channel(self.user.id)]
+        _, self.cursor = self.wait()
+
+    def wait(self, cursor=None):
+        return async_to_sync(get_broker().wait)(self.channels, cursor)
+
+    def test_new_notifications_are_pushed_to_the_recipient_once_committed(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            notification = make_notification(self.user, 'Welcome')
+            make_notification(make_user('other'), 'Welcome')
+        self.assertEqual(self.wait(self.cursor)[0], [])
+        for callback in callbacks:
+            callback()
+
+        event, = self.wait(self.cursor)[0]
+        self.assertEqual(event.type, NOTIFICATION_EVENT)
+        self.assertEqual((event.data['id'], event.data['title'], event.data['read']), (notification.id, 'Welcome', False))
+
+    def test_updates_are_not_pushed(self):
+        notification = make_notification(self.user, 'Welcome')
+        _, cursor = self.wait()
+        with self.captureOnCommitCallbacks(execute=True):
+            notification.read = True
+            notification.save()
+        self.assertEqual(self.wait(cursor)[0], [])
@@ -1,57 +1,78 @@
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.conf import settings
+from django.db import transaction
 from django.template.loader import render_to_string
+from django.utils import timezone
 from django.utils.html import strip_tags
+from shared.pubsub import publish, user_channel
+from .models import Notification
 import logging
 import os
+import threading
 
 logger = logging.getLogger(__name__)
 
+NOTIFICATION_EVENT = 'notification'
+
+
+def notification_event(notification):
+    """Payload pushed to the recipient's event stream (see chat.async_views)"""
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'read': notification.read,
+        'created_at': notification.created_at,
+    }
+
+
+def notification_email(notification):
+    """The email for a notification, or None when its recipient has no address"""
+    user = notification.recipient
+    if not user.email:
+        logger.warning(f"User {user.id} has no email address. Skipping notification email.")
+        return None
+
+    subject = f"FitHub Notification: {notification.title}"
+    
+    frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:5173')
+    dashboard_url = f"{frontend_url}/dashboard"
+    
+    # Simple HTML content
+    html_message = f"""
+    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+        <div style="background-color: #f8fafc; padding: 20px; text-align: center;">
+            <h2 style="color: #0f172a;">FitHub</h2>
+        </div>
+        <div style="padding: 20px; border: 1px solid #e2e8f0;">
+            <h3 style="color: #334155;">{notification.title}</h3>
+            <p style="color: #475569; font-size: 16px; line-height: 1.5;">{notification.message}</p>
+            <div style="margin-top: 30px; text-align: center;">
+                <a href="{dashboard_url}" style="background-color: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; font-weight: bold;">Go to Dashboard</a>
+            </div>
+        </div>
+        <div style="padding: 20px; text-align: center; color: #94a3b8; font-size: 12px;">
+            <p>&copy; 2024 FitHub. All rights reserved.</p>
+            <p>You received this email because you have notifications enabled on your account.</p>
+        </div>
+    </div>
+    """
+    
+    plain_message = strip_tags(html_message)
+    email = EmailMultiAlternatives(subject, plain_message, settings.DEFAULT_FROM_EMAIL, [user.email])
+    email.attach_alternative(html_message, 'text/html')
+    return email
+
+
 def send_notification_email(notification):
     """
     Send an email for a notification.
     """
     try:
-        user = notification.recipient
-        if not user.email:
-            logger.warning(f"User {user.id} has no email address. Skipping notification email.")
+        email = notification_email(notification)
+        if email is None:
             return False
-
-        subject = f"FitHub Notification: {notification.title}"
-        
-        frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:5173')
-        dashboard_url = f"{frontend_url}/dashboard"
-        
-        # Simple HTML content
-        html_message = f"""
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <div style="background-color: #f8fafc; padding: 20px; text-align: center;">
-                <h2 style="color: #0f172a;">FitHub</h2>
-            </div>
-            <div style="padding: 20px; border: 1px solid #e2e8f0;">
-                <h3 style="color: #334155;">{notification.title}</h3>
-                <p style="color: #475569; font-size: 16px; line-height: 1.5;">{notification.message}</p>
-                <div style="margin-top: 30px; text-align: center;">
-                    <a href="{dashboard_url}" style="background-color: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; font-weight: bold;">Go to Dashboard</a>
-                </div>
-            </div>
-            <div style="padding: 20px; text-align: center; color: #94a3b8; font-size: 12px;">
-                <p>&copy; 2024 FitHub. All rights reserved.</p>
-                <p>You received this email because you have notifications enabled on your account.</p>
-            </div>
-        </div>
-        """
-        
-        plain_message = strip_tags(html_message)
-        
-        send_mail(
-            subject,
-            plain_message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
+        email.send(fail_silently=False)
         
         notification.email_sent = True
         notification.save()
@@ -60,3 +81,47 @@ def send_notification_email(notification):
     except Exception as e:
         logger.error(f"Failed to send notification email to {notification.recipient.email}: {str(e)}")
         return False
+
+
+def send_notification_emails(notifications):
+    """
+    Send the emails of many notifications over one mail server connection and mark
+    the delivered ones with a single UPDATE. A failed email does not stop the rest.
+    """
+    sent = []
+    try:
+        with get_connection(fail_silently=False) as connection:
+            for notification in notifications:
+                try:
+                    email = notification_email(notification)
+                    if email is not None:
+                        connection.send_messages([email])
+                        sent.append(notification.id)
+                except Exception as e:
+                    logger.error(f"Failed to send notification email to {notification.recipient.email}: {str(e)}")
+    except Exception as e:
+        logger.error(f"Failed to connect to the mail server for {len(notifications)} notification emails: {str(e)}")
+    Notification.objects.filter(id__in=sent).update(email_sent=True, updated_at=timezone.now())
+    return len(sent)
+
+
+def notify(recipients, title, message):
+    """
+    Create the same notification for every recipient with one INSERT. Emails go out
+    from a single background thread and push events are published once the
+    transaction commits, so the cost does not grow with the number of recipients.
+    bulk_create skips the per-row post_save handlers in notifications.signals.
+    """
+    notifications = Notification.objects.bulk_create(
+        [Notification(recipient=recipient, title=title, message=message) for recipient in recipients]
+    )
+    if not notifications:
+        return notifications
+
+    def dispatch():
+        threading.Thread(target=send_notification_emails, args=(notifications,)).start()
+        for notification in notifications:
+            publish([user_channel(notification.recipient_id)], NOTIFICATION_EVENT, notification_event(notification))
+
+    transaction.on_commit(dispatch)
+    return notifications
@@ -3,17 +3,29 @@ from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from .models import Notification
 from .serializers import NotificationSerializer
+from users.serializers import UserSerializer
 from rest_framework.permissions import IsAuthenticated
+from shared.conditional import conditional_response
 from shared.responses import (
     handle_success,
     handle_error,
     handle_not_found,
 )
 
+def notification_list_sources(request, *args, **kwargs):
+    return [(Notification.objects.filter(recipient=request.user), 'updated_at')]
+
+
+def recipient_details(request):
+    # Embedded in every notification; the user row has no updated_at to compare
+    return UserSerializer(request.user).data.values()
+
+
 class NotificationListView(views.APIView):
     permission_classes = [IsAuthenticated]
     
     @swagger_auto_schema(tags=['Notifications'], operation_summary='List my notifications')
+    @conditional_response(notification_list_sources, extra=recipient_details)
     def get(self, request):
         try:
             notifications = Notification.objects.filter(recipient=request.user)
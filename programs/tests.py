@@ -1,3 +1,72 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Member
+from .models import Program, WorkoutDay, Exercise, WorkoutSet
+
+User = get_user_model()
+
+
+class ProgramListETagTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='password123',
+            first_name='Admin', last_name='Tester', role='admin'
+        )
+        self.member = Member.objects.create(
+            user=User.objects.create_user(
+                email='member@example.com', username='member', password='password123',
+                first_name='Member', last_name='Tester', role='member'
+            ),
+            date_of_birth=date(1990, 1, 1),
+            gender='female',
+            address='1 Test Street',
+            join_date=timezone.now().date()
+        )
+        self.program = Program.objects.create(name='Strength', duration='8 weeks', difficulty='beginner', goal='Strength')
+        self.day = WorkoutDay.objects.create(program=self.program, day_number=1, name='Legs')
+        self.exercise = Exercise.objects.create(name='Squat', muscle_group='Legs')
+        WorkoutSet.objects.create(workout_day=self.day, exercise=self.exercise, sets=3, reps='10', rest='60s')
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('program-list')
+
+    def get(self, etag=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(self.url, params, **headers)
+
+    def assertChanged(self, etag, **params):
+        response = self.get(etag, **params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.get()['ETag']
+        response = self.get(etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_nested_changes_change_the_etag(self):
+        etag = self.get()['ETag']
+        self.exercise.name = 'Back squat'
+        self.exercise.save()
+        etag = self.assertChanged(etag)
+
+        self.client.post(reverse('program-assign', args=[self.program.pk]), {'member_id': self.member.pk}, format='json')
+        etag = self.assertChanged(etag)
+
+        WorkoutDay.objects.create(program=self.program, day_number=2, name='Push')
+        self.assertChanged(etag)
+
+    def test_filtered_list_ignores_other_programs(self):
+        self.program.assigned_members.add(self.member)
+        etag = self.get(member=self.member.pk)['ETag']
+        Program.objects.create(name='Cardio', duration='4 weeks', difficulty='beginner', goal='Endurance')
+        self.assertEqual(self.get(etag, member=self.member.pk).status_code, status.HTTP_304_NOT_MODIFIED)
+        # The unfiltered list does include the new program
+        self.assertEqual(self.get(etag).status_code, status.HTTP_200_OK)
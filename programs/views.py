@@ -6,6 +6,8 @@ from .models import Program, WorkoutDay, Exercise, WorkoutSet
 from .serializers import ProgramSerializer, WorkoutDaySerializer, ExerciseSerializer, WorkoutSetSerializer
 from core.models import Member, Trainer
 from shared.permissions import IsAdminOrTrainer, IsAdminUser
+from shared.conditional import conditional_response
+from subscriptions.models import MemberSubscription
 from rest_framework.permissions import IsAuthenticated
 from shared.responses import (
     handle_success,
@@ -14,10 +16,29 @@ from shared.responses import (
     handle_not_found,
 )
 
+def program_list_sources(request, *args, **kwargs):
+    # Everything ProgramSerializer nests, limited to the listed programs
+    programs = Program.objects.all()
+    member_id = request.query_params.get('member')
+    if member_id:
+        programs = programs.filter(assigned_members__id=member_id)
+    return [
+        (programs, 'updated_at'),
+        (WorkoutDay.objects.filter(program__in=programs), 'updated_at'),
+        (WorkoutSet.objects.filter(workout_day__program__in=programs), 'updated_at'),
+        (Exercise.objects.filter(workoutset__workout_day__program__in=programs), 'updated_at'),
+        (Program.assigned_members.through.objects.filter(program__in=programs), 'id'),
+        (Member.objects.filter(assigned_programs__in=programs), 'updated_at'),
+        (MemberSubscription.objects.filter(member__assigned_programs__in=programs, status='active'), 'updated_at'),
+        (Trainer.objects.filter(created_programs__in=programs), 'updated_at'),
+    ]
+
+
 class ProgramListView(views.APIView):
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(tags=['Programs'], operation_summary='List all programs')
+    @conditional_response(program_list_sources)
     def get(self, request):
         member_id = request.query_params.get('member')
         if member_id:
@@ -0,0 +1,44 @@
+from asgiref.sync import sync_to_async
+from django.views import View
+from rest_framework.views import APIView
+from rest_framework.settings import api_settings
+
+
+class AsyncAPIView(View):
+    """
+    Read-only async view with the authentication, permission and rendering of a
+    DRF APIView. Handlers are coroutines that receive the DRF request and return
+    DRF Responses, e.g. from shared.responses.
+    """
+    http_method_names = ['get']
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+
+    def _initial(self, request, *args, **kwargs):
+        # Authentication may hit the database (token and session lookups)
+        api_view = APIView(permission_classes=self.permission_classes, renderer_classes=self.renderer_classes)
+        api_view.args, api_view.kwargs = args, kwargs
+        api_view.headers = api_view.default_response_headers
+        request = api_view.initialize_request(request, *args, **kwargs)
+        api_view.request = request
+        try:
+            api_view.initial(request, *args, **kwargs)
+        except Exception as exc:
+            return api_view, request, api_view.handle_exception(exc)
+        return api_view, request, None
+
+    @staticmethod
+    def _finalize(api_view, request, response):
+        response = api_view.finalize_response(request, response)
+        # Streaming responses are sent as they are
+        return response.render() if hasattr(response, 'render') else response
+
+    async def dispatch(self, request, *args, **kwargs):
+        handler = getattr(self, request.method.lower(), None)
+        if request.method.lower() not in self.http_method_names or handler is None:
+            return await self.http_method_not_allowed(request, *args, **kwargs)
+
+        api_view, request, response = await sync_to_async(self._initial)(request, *args, **kwargs)
+        if response is None:
+            response = await handler(request, *args, **kwargs)
+        return await sync_to_async(self._finalize)(api_view, request, response)
@@ -0,0 +1,83 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.response import Response
+
+CACHE_HEADER = 'X-Cache'
+
+
+def _generation_key(label):
+    return f'stats:generation:{label}'
+
+
+def _fresh_generation():
+    # Millisecond clock so a generation lost to eviction never repeats an older one
+    return int(time.time() * 1000)
+
+
+def get_generations(labels):
+    """Current generation of each model label, initialising any that are missing"""
+    keys = {label: _generation_key(label) for label in labels}
+    found = cache.get_many(keys.values())
+    generations = []
+    for label, key in keys.items():
+        if key not in found:
+            cache.add(key, _fresh_generation(), timeout=None)
+            found[key] = cache.get(key)
+        generations.append(f"{label}={found[key]}")
+    return generations
+
+
+def invalidate(*labels):
+    """Bump the generation of each model label, orphaning every cached response built from it"""
+    for label in labels:
+        key = _generation_key(label)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_generation(), timeout=None)
+
+
+def _cache_key(endpoint, request, depends_on, vary_on_user):
+    params = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+    # Stats are relative to today, so entries never outlive the day they were built on
+    parts = [endpoint, str(timezone.localdate()), *get_generations(depends_on), repr(params)]
+    if vary_on_user:
+        parts.append(f"user={request.user.pk}")
+    digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return f'stats:response:{endpoint}:{digest}'
+
+
+def cached_response(endpoint, depends_on, vary_on_user=False):
+    """
+    Cache successful responses of an APIView handler.
+    Entries are keyed by endpoint, query parameters and the current generation of
+    every model in depends_on, so a write to any of those models invalidates them.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            ttl = settings.STATS_CACHE_TTL
+            if ttl <= 0:
+                response = handler(view, request, *args, **kwargs)
+                response[CACHE_HEADER] = 'MISS'
+                return response
+
+            key = _cache_key(endpoint, request, depends_on, vary_on_user)
+            cached = cache.get(key)
+            if cached is not None:
+                response = Response(cached, status=200)
+                response[CACHE_HEADER] = 'HIT'
+                return response
+
+            response = handler(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout=ttl)
+            response[CACHE_HEADER] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,64 @@
+import csv
+import json
+from datetime import date, datetime, time
+
+from django.http import StreamingHttpResponse
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _Echo:
+    """File-like object whose write returns the line instead of storing it"""
+    def write(self, value):
+        return value
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, (date, datetime, time)) else value
+
+
+def _csv_lines(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_plain(value) for value in row])
+
+
+def _ndjson_lines(rows, columns):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, (_plain(value) for value in row)))) + '\n'
+
+
+def _batched(lines, size):
+    # One write per line makes the WSGI server flush tiny chunks; group them instead
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def streaming_export(queryset, columns, output, filename, chunk_size=CHUNK_SIZE):
+    """
+    Stream queryset.values_list(*fields) as CSV or NDJSON.
+    columns maps output column names to queryset fields. Rows are fetched with
+    .iterator(chunk_size), so at most one chunk is held in memory at a time.
+    """
+    if output not in EXPORT_FORMATS:
+        raise ValueError(f"output must be one of: {', '.join(EXPORT_FORMATS)}")
+    names = list(columns)
+    rows = queryset.values_list(*columns.values()).iterator(chunk_size=chunk_size)
+    lines = _csv_lines(rows, names) if output == 'csv' else _ndjson_lines(rows, names)
+
+    response = StreamingHttpResponse(_batched(lines, chunk_size), content_type=CONTENT_TYPES[output])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{output}"'
+    return response
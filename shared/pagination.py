@@ -0,0 +1,74 @@
+import base64
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values):
+    payload = json.dumps([value.isoformat() if isinstance(value, (date, datetime)) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Raises ValueError on anything that is not a cursor produced by encode_cursor"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def parse_page_size(params, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        page_size = int(params.get('page_size', default))
+    except ValueError:
+        raise ValueError('page_size must be an integer')
+    if page_size < 1:
+        raise ValueError('page_size must be positive')
+    return min(page_size, maximum)
+
+
+def _after(fields, values):
+    """Rows strictly after values in the ordering given by fields ('-' prefix for descending)"""
+    condition = Q()
+    for index in reversed(range(len(fields))):
+        name = fields[index].lstrip('-')
+        lookup = 'lt' if fields[index].startswith('-') else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[index]})
+        if index < len(fields) - 1:
+            step |= Q(**{name: values[index]}) & condition
+        condition = step
+    return condition
+
+
+def keyset_page(queryset, fields, cursor, page_size):
+    """
+    One page of queryset ordered by fields, which must end in a unique column.
+    Instead of an OFFSET the page starts after the row the cursor points at, so
+    its cost does not grow with the position in the table.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    queryset = queryset.order_by(*fields)
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(fields):
+            raise ValueError('Invalid cursor')
+        try:
+            queryset = queryset.filter(_after(fields, values))
+        except (ValueError, TypeError, ValidationError):
+            raise ValueError('Invalid cursor')
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, field.lstrip('-')) for field in fields])
+    return rows, next_cursor
@@ -0,0 +1,206 @@
+"""
+Publish/subscribe of push events for connected clients.
+
+Sync code (usually a transaction.on_commit callback) publishes events to named
+channels such as 'user:12'; the async event stream and long-poll views wait on
+them. Every channel keeps a short backlog, and waiting starts from an opaque
+cursor, so a client that reconnects with the last cursor it saw receives what it
+missed instead of losing it. Delivery is at-least-once: clients should ignore
+events they already have.
+
+InProcessBroker only reaches clients served by the same process, which suits a
+single ASGI worker. RedisBroker (PUSH_BROKER = 'shared.pubsub.RedisBroker',
+requires the redis package) shares events between processes through Redis streams.
+"""
+import asyncio
+import json
+import threading
+import weakref
+from collections import deque, namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+from .pagination import encode_cursor, decode_cursor
+
+# Events kept per channel for clients catching up after a reconnect
+BACKLOG = 100
+
+# cursor: where to resume to receive only the events after this one
+Event = namedtuple('Event', ['cursor', 'channel', 'type', 'data'])
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def role_channel(role):
+    return f'role:{role}'
+
+
+def channels_for(user):
+    """Channels a user's event stream listens on"""
+    return [user_channel(user.pk), role_channel(user.role)]
+
+
+def _decode(cursor, length):
+    """The values packed in a cursor, or None when it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        values = decode_cursor(cursor)
+    except ValueError:
+        return None
+    return values if len(values) == length else None
+
+
+class InProcessBroker:
+    def __init__(self, backlog=BACKLOG):
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._backlog_size = backlog
+        self._backlogs = {}
+        # channel -> {(loop, asyncio.Event)} of waiting subscribers
+        self._waiters = {}
+
+    def publish(self, channel, type, data):
+        with self._lock:
+            self._sequence += 1
+            self._backlogs.setdefault(channel, deque(maxlen=self._backlog_size)).append(
+                (self._sequence, type, json.loads(json.dumps(data, cls=DjangoJSONEncoder)))
+            )
+            waiters = list(self._waiters.get(channel, ()))
+        for loop, flag in waiters:
+            try:
+                loop.call_soon_threadsafe(flag.set)
+            except RuntimeError:
+                # The subscriber's loop has closed; it unregisters itself
+                pass
+
+    def _collect(self, channels, since):
+        with self._lock:
+            found = [
+                (sequence, channel, type, data)
+                for channel in channels
+                for sequence, type, data in self._backlogs.get(channel, ())
+                if sequence > since
+            ]
+        found.sort(key=lambda event: event[0])
+        return [Event(encode_cursor([sequence]), channel, type, data) for sequence, channel, type, data in found]
+
+    async def wait(self, channels, cursor=None, timeout=None):
+        """
+        Events on channels after cursor, waiting up to timeout seconds for the first one
+        (not at all when timeout is falsy). Returns (events, cursor to continue from).
+        Without a cursor only events published from now on count.
+        """
+        values = _decode(cursor, 1)
+        with self._lock:
+            # A cursor from before a restart may be ahead of the counter; start over from now
+            since = values[0] if values and isinstance(values[0], int) and values[0] <= self._sequence else self._sequence
+        events = self._collect(channels, since)
+        if events or not timeout:
+            return events, events[-1].cursor if events else encode_cursor([since])
+
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            for channel in channels:
+                self._waiters.setdefault(channel, set()).add(waiter)
+        try:
+            # Something may have been published between the first look and registering
+            events = self._collect(channels, since)
+            if not events:
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                events = self._collect(channels, since)
+        finally:
+            with self._lock:
+                for channel in channels:
+                    self._waiters.get(channel, set()).discard(waiter)
+        return events, events[-1].cursor if events else encode_cursor([since])
+
+
+class RedisBroker:
+    """One Redis stream per channel, trimmed to about BACKLOG entries"""
+
+    def __init__(self, url=None, prefix='push:', backlog=BACKLOG):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise ImproperlyConfigured("RedisBroker requires the 'redis' package")
+        self._url = url or settings.PUSH_BROKER_URL
+        if not self._url:
+            raise ImproperlyConfigured('RedisBroker requires PUSH_BROKER_URL')
+        self._prefix = prefix
+        self._backlog_size = backlog
+        self._redis = redis
+        self._client = redis.Redis.from_url(self._url)
+        # Async clients are bound to the event loop they were created on
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def _key(self, channel):
+        return f'{self._prefix}{channel}'
+
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = self._redis.asyncio.Redis.from_url(self._url)
+        return client
+
+    def publish(self, channel, type, data):
+        self._client.xadd(
+            self._key(channel),
+            {'type': type, 'data': json.dumps(data, cls=DjangoJSONEncoder)},
+            maxlen=self._backlog_size,
+            approximate=True
+        )
+
+    async def wait(self, channels, cursor=None, timeout=None):
+        """Same contract as InProcessBroker.wait; the cursor holds one stream id per channel"""
+        client = self._async_client()
+        channels = sorted(set(channels))
+        ids = _decode(cursor, len(channels))
+        if ids is None:
+            # Start from the newest entry of each stream
+            pipeline = client.pipeline()
+            for channel in channels:
+                pipeline.xrevrange(self._key(channel), count=1)
+            latest = await pipeline.execute()
+            ids = [entries[0][0].decode() if entries else '0-0' for entries in latest]
+        position = dict(zip(channels, ids))
+
+        response = await client.xread(
+            {self._key(channel): position[channel] for channel in channels},
+            block=int(timeout * 1000) if timeout else None
+        )
+        events = []
+        for key, entries in response or []:
+            channel = key.decode()[len(self._prefix):]
+            for entry_id, fields in entries:
+                position[channel] = entry_id.decode()
+                events.append(Event(
+                    encode_cursor([position[name] for name in channels]),
+                    channel,
+                    fields[b'type'].decode(),
+                    json.loads(fields[b'data'])
+                ))
+        return events, encode_cursor([position[name] for name in channels])
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.PUSH_BROKER)()
+
+
+def publish(channels, type, data):
+    """Publish one event to each channel (a user or role channel, see channels_for)"""
+    broker = get_broker()
+    for channel in channels:
+        broker.publish(channel, type, data)
@@ -1,9 +1,16 @@
+from unittest import mock
+
+from django.core import mail
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
 
+from notifications.models import Notification
+
 User = get_user_model()
 
 class AdminRegisterTest(APITestCase):
@@ -35,3 +42,54 @@ class AdminRegisterTest(APITestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('role', response.data['errors'])
+
+
+class InlineThread:
+    """Stands in for threading.Thread and runs the target on start(), so emails go out within the test"""
+    def __init__(self, target, args=(), kwargs=None):
+        self.target, self.args, self.kwargs = target, args, kwargs or {}
+
+    def start(self):
+        self.target(*self.args, **self.kwargs)
+
+
+class RegisterNotificationTest(APITestCase):
+    def make_admin(self, name):
+        return User.objects.create_user(
+            email=f'{name}@example.com', username=name, password='password123', role='admin'
+        )
+
+    def register(self, name):
+        data = {
+            'username': name,
+            'email': f'{name}@example.com',
+            'password': 'password123',
+            'first_name': name.title(),
+            'last_name': 'Tester',
+            'role': 'member'
+        }
+        with mock.patch('notifications.utils.threading.Thread', InlineThread):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('register'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_every_admin_is_notified_and_emailed(self):
+        admins = [self.make_admin('admin1'), self.make_admin('admin2')]
+        self.register('newmember')
+        notifications = Notification.objects.order_by('recipient_id')
+        self.assertEqual([notification.recipient for notification in notifications], admins)
+        self.assertEqual({notification.title for notification in notifications}, {'New Member Registration'})
+        self.assertTrue(all(notification.email_sent for notification in notifications))
+        self.assertEqual(sorted(email.to[0] for email in mail.outbox), ['admin1@example.com', 'admin2@example.com'])
+
+    def test_query_count_does_not_grow_with_admins(self):
+        self.make_admin('admin1')
+        with CaptureQueriesContext(connection) as queries:
+            self.register('first')
+        baseline = len(queries)
+        for n in range(5):
+            self.make_admin(f'extra{n}')
+        with CaptureQueriesContext(connection) as queries:
+            self.register('second')
+        self.assertEqual(len(queries), baseline)
+        self.assertEqual(Notification.objects.filter(title='New Member Registration').count(), 1 + 6)
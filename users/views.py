@@ -13,7 +13,7 @@ from shared.responses import (
 )
 
 User = get_user_model()
-from notifications.models import Notification
+from notifications.utils import notify
 
 from .serializers import UserSerializer, RegisterSerializer, AdminRegisterSerializer
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
@@ -64,13 +64,11 @@ class RegisterView(APIView):
             token, _ = Token.objects.get_or_create(user=user)
             
             # Notify all admins about new registration
-            admins = User.objects.filter(role='admin')
-            for admin in admins:
-                Notification.objects.create(
-                    recipient=admin,
-                    title="New Member Registration",
-                    message=f"A new member has signed up: {user.get_full_name()} ({user.email})."
-                )
+            notify(
+                User.objects.filter(role='admin'),
+                title="New Member Registration",
+                message=f"A new member has signed up: {user.get_full_name()} ({user.email})."
+            )
 
             return  handle_success(
                 data={